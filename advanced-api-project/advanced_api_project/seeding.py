@@ -0,0 +1,25 @@
+"""
+Sampling helpers for the seed management command.
+
+A few authors write most books, so seeded books are assigned to authors
+with Zipf weights rather than uniformly.
+"""
+
+import itertools
+import random
+
+
+def zipf_cum_weights(n, s=1.1):
+    """
+    Cumulative Zipf weights for ranks 1..n, for use with random.choices().
+    """
+    return list(itertools.accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+
+
+def batched(iterable, size):
+    """
+    Yield lists of up to size items from iterable.
+    """
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
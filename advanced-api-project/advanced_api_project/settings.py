@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'advanced_api_project.query_budget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -121,6 +122,16 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Query budgets
+# Per-request SQL instrumentation, see advanced_api_project/query_budget.py.
+# QUERY_BUDGETS maps URL names to the maximum number of queries allowed.
+# QUERY_BUDGET_RAISE makes over-budget views raise; tests enable it
+# with override_settings.
+
+QUERY_BUDGETS = {}
+QUERY_BUDGET_DEFAULT = None
+QUERY_BUDGET_RAISE = False
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,84 @@
+"""
+Seed the database with synthetic authors and books.
+
+Books per author follow a power law, so a few prolific authors own most of
+the catalogue, and publication years skew towards recent years. Rows are
+inserted with bulk_create in batches, each batch in its own transaction.
+
+    python manage.py seed --authors 10000 --books 1000000
+"""
+
+import random
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import Author, Book
+from advanced_api_project.seeding import zipf_cum_weights, batched
+
+WORDS = (
+    'night river house garden city shadow light winter summer story secret '
+    'journey stone queen king war peace island forest sea letter memory dream'
+).split()
+NAMES = 'Ada Alan Grace Linus Barbara Ken Margaret Dennis Edsger Donald Frances Niklaus'.split()
+SURNAMES = 'Lovelace Turing Hopper Torvalds Liskov Thompson Hamilton Ritchie Dijkstra Knuth Allen Wirth'.split()
+
+
+class Command(BaseCommand):
+    help = 'Seed the database with synthetic authors and books for benchmarking.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=1000)
+        parser.add_argument('--books', type=int, default=20000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--random-seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        random.seed(options['random_seed'])
+        self.batch_size = options['batch_size']
+        started = time.perf_counter()
+
+        author_ids = self.create_authors(options['authors'])
+        random.shuffle(author_ids)
+        self.create_books(author_ids, options['books'])
+
+        self.stdout.write(self.style.SUCCESS(
+            'Seeded in %.1fs.' % (time.perf_counter() - started)
+        ))
+
+    def insert(self, model, items, build, label):
+        """
+        Insert model rows built from items in batches, one transaction per batch.
+        """
+        count = 0
+        for batch in batched(items, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(build(batch), batch_size=self.batch_size)
+            count += len(batch)
+        self.stdout.write('  %s: %d' % (label, count))
+        return count
+
+    def create_authors(self, count):
+        last_id = Author.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        self.insert(Author, range(count), lambda batch: [
+            Author(name='%s %s %d' % (random.choice(NAMES), random.choice(SURNAMES), i))
+            for i in batch
+        ], 'authors')
+        return list(Author.objects.filter(id__gt=last_id).values_list('id', flat=True))
+
+    def create_books(self, author_ids, total):
+        if not author_ids:
+            return
+        current_year = datetime.now().year
+        authors = random.choices(author_ids, cum_weights=zipf_cum_weights(len(author_ids)), k=total)
+        self.insert(Book, authors, lambda batch: [
+            Book(
+                title=' '.join(random.choices(WORDS, k=random.randint(1, 5))).title(),
+                # Most books are recent; the tail reaches back a couple of centuries.
+                publication_year=max(1800, current_year - int(random.expovariate(1 / 15))),
+                author_id=author,
+            )
+            for author in batch
+        ], 'books')
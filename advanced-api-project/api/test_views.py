@@ -117,3 +117,13 @@ class BookAPITests(APITestCase):
         self.assertEqual(len(response.data), 2)
         self.assertEqual(response.data[0]['title'], "A New Book")
         self.assertEqual(response.data[1]['title'], "Test Book")
+
+from io import StringIO
+from django.core.management import call_command
+
+class SeedCommandTests(APITestCase):
+    def test_seed_creates_rows(self):
+        call_command('seed', authors=20, books=200, random_seed=1, stdout=StringIO())
+        self.assertEqual(Author.objects.count(), 20)
+        self.assertEqual(Book.objects.count(), 200)
+        self.assertFalse(Book.objects.filter(publication_year__gt=datetime.now().year).exists())
@@ -0,0 +1,177 @@
+"""
+Per-request SQL query budget instrumentation.
+
+QueryBudgetMiddleware records every query run while a request is handled
+and reports the query count, total SQL time and duplicate statements as a
+``Server-Timing`` header and a structured ``query_budget`` log record.
+
+A view declares its budget with a ``query_budget`` attribute on the view
+function or class.
+``settings.QUERY_BUDGETS`` overrides budgets per URL name and
+``settings.QUERY_BUDGET_DEFAULT`` applies to views without one. When
+``settings.QUERY_BUDGET_RAISE`` is True a view that goes over budget
+raises QueryBudgetExceeded.
+
+Install by adding
+'LibraryProject.query_budget.QueryBudgetMiddleware'
+near the top of MIDDLEWARE.
+"""
+
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('query_budget')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Raised when a view runs more queries than its declared budget.
+    """
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper collecting (sql, params, duration) per query.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.queries.append((sql, params, duration))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_time(self):
+        """Total SQL time in milliseconds."""
+        return sum(duration for _, _, duration in self.queries) * 1000
+
+    def duplicates(self):
+        """
+        Return {sql: times_run} for statements run more than once with
+        identical parameters, summed over each statement's parameter sets.
+        """
+        return {sql: sum(counts) for sql, counts in self._repeats().items()}
+
+    def duplicate_count(self):
+        return sum(n - 1 for counts in self._repeats().values() for n in counts)
+
+    def _repeats(self):
+        """
+        Return {normalized sql: [times_run, ...]}, one entry per parameter
+        set run more than once.
+        """
+        counts = Counter((' '.join(sql.split()), repr(params)) for sql, params, _ in self.queries)
+        repeats = {}
+        for (sql, _), n in counts.items():
+            if n > 1:
+                repeats.setdefault(sql, []).append(n)
+        return repeats
+
+    def server_timing(self):
+        return 'db;dur=%.2f;desc="%d queries, %d duplicates"' % (
+            self.total_time, self.count, self.duplicate_count(),
+        )
+
+
+@contextmanager
+def record_queries(using=None):
+    """
+    Record the queries run inside the block on the given database aliases
+    (all configured databases by default).
+    """
+    recorder = QueryRecorder()
+    aliases = [using] if using else list(connections)
+    with ExitStack() as stack:
+        for alias in aliases:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        yield recorder
+
+
+def get_view_budget(request, view_func):
+    """
+    Resolve the query budget for a view, or None when it has none.
+    """
+    match = getattr(request, 'resolver_match', None)
+    url_name = match.url_name if match else None
+    # Settings win so a budget can be tightened without touching the view.
+    budget = getattr(settings, 'QUERY_BUDGETS', {}).get(url_name)
+    if budget is None:
+        budget = getattr(view_func, 'query_budget', None)
+    if budget is None:
+        view_class = getattr(view_func, 'view_class', None)
+        budget = getattr(view_class, 'query_budget', None)
+    if budget is None:
+        budget = getattr(settings, 'QUERY_BUDGET_DEFAULT', None)
+    return budget
+
+
+def check_budget(recorder, budget, label):
+    """
+    Raise QueryBudgetExceeded when the recorder went over budget.
+    """
+    if budget is None or recorder.count <= budget:
+        return
+    lines = ['%s ran %d queries, budget is %d.' % (label, recorder.count, budget)]
+    for sql, n in recorder.duplicates().items():
+        lines.append('  %dx %s' % (n, sql))
+    raise QueryBudgetExceeded('\n'.join(lines))
+
+
+class QueryBudgetMiddleware:
+    """
+    Middleware measuring the SQL cost of every request against its budget.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.query_budget = None
+        with record_queries() as recorder:
+            response = self.get_response(request)
+
+        budget = request.query_budget
+        over_budget = budget is not None and recorder.count > budget
+
+        timing = recorder.server_timing()
+        if response.has_header('Server-Timing'):
+            timing = '%s, %s' % (response['Server-Timing'], timing)
+        response['Server-Timing'] = timing
+
+        log = logger.warning if over_budget else logger.debug
+        log(
+            '%s %s: %d queries in %.2fms (%d duplicates, budget %s)',
+            request.method, request.path, recorder.count,
+            recorder.total_time, recorder.duplicate_count(), budget,
+            extra={
+                'path': request.path,
+                'method': request.method,
+                'status_code': response.status_code,
+                'queries': recorder.count,
+                'db_time_ms': round(recorder.total_time, 2),
+                'duplicates': recorder.duplicate_count(),
+                'budget': budget,
+            },
+        )
+
+        if over_budget and getattr(settings, 'QUERY_BUDGET_RAISE', False):
+            check_budget(recorder, budget, '%s %s' % (request.method, request.path))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_view_budget(request, view_func)
+        return None
@@ -46,7 +46,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'LibraryProject.query_budget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -124,6 +126,14 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Content-hashed, gzip/brotli precompressed files served with far-future
+# immutable cache headers, see LibraryProject/static_files.py.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'LibraryProject.static_files.StaticFilesStorage'},
+}
 
 # Media files (User uploads)
 MEDIA_URL = 'media/'
@@ -132,6 +142,16 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # Custom User Model
 AUTH_USER_MODEL = 'bookshelf.CustomUser'
 
+# Query budgets
+# Per-request SQL instrumentation, see LibraryProject/query_budget.py.
+# QUERY_BUDGETS maps URL names to the maximum number of queries allowed.
+# QUERY_BUDGET_RAISE makes over-budget views raise; tests enable it
+# with override_settings.
+
+QUERY_BUDGETS = {}
+QUERY_BUDGET_DEFAULT = None
+QUERY_BUDGET_RAISE = False
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
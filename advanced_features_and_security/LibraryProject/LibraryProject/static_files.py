@@ -0,0 +1,22 @@
+"""
+Static file storage for the admin and bookshelf assets.
+
+collectstatic writes content-hashed copies to STATIC_ROOT with .gz
+variants, and .br ones when brotli is installed. WhiteNoiseMiddleware
+serves them with immutable cache headers. Files missing from the
+manifest, as before the first collectstatic, are linked under their
+plain names instead of raising.
+"""
+
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+class StaticFilesStorage(CompressedManifestStaticFilesStorage):
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # In neither the manifest nor STATIC_ROOT: collectstatic has not run.
+            return name
@@ -0,0 +1,170 @@
+"""
+Seed the database with synthetic users, authors, books and libraries.
+
+Books per author follow a power law and popular books are stocked by many
+libraries, so the relationship queries in query_samples.py see realistic
+skew. Rows are inserted with bulk_create in batches, each batch in its own
+transaction. The Library.books M2M through rows and the UserProfile rows
+(normally created by the post_save signal, which bulk_create skips) are
+inserted directly.
+
+    python manage.py seed --users 10000 --authors 5000 --books 500000 --libraries 200
+"""
+
+import random
+import time
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from bookshelf.models import Book as ShelfBook
+from relationship_app.models import Author, Book, Library, Librarian, UserProfile
+from LibraryProject.seeding import zipf_cum_weights, power_law_degree, sample_distinct, batched
+
+User = get_user_model()
+
+WORDS = (
+    'night river house garden city shadow light winter summer story secret '
+    'journey stone queen king war peace island forest sea letter memory dream'
+).split()
+NAMES = 'Ada Alan Grace Linus Barbara Ken Margaret Dennis Edsger Donald Frances Niklaus'.split()
+SURNAMES = 'Lovelace Turing Hopper Torvalds Liskov Thompson Hamilton Ritchie Dijkstra Knuth Allen Wirth'.split()
+# Most users are members; a few librarians and admins.
+ROLES = (('Member', 90), ('Librarian', 9), ('Admin', 1))
+
+
+def person():
+    return '%s %s' % (random.choice(NAMES), random.choice(SURNAMES))
+
+
+def title():
+    return ' '.join(random.choices(WORDS, k=random.randint(1, 5))).title()
+
+
+class Command(BaseCommand):
+    help = 'Seed the database with synthetic library data for benchmarking.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--authors', type=int, default=500)
+        parser.add_argument('--books', type=int, default=10000)
+        parser.add_argument('--libraries', type=int, default=20)
+        parser.add_argument('--books-per-library', type=int, default=2000,
+                            help='Mean number of books stocked per library.')
+        parser.add_argument('--shelf-books', type=int, default=1000,
+                            help='Number of bookshelf.Book rows.')
+        parser.add_argument('--prefix', default='seed',
+                            help='Username prefix; users are named <prefix>_<n>.')
+        parser.add_argument('--password', default='password123',
+                            help='Password set on every seeded user.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--random-seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        random.seed(options['random_seed'])
+        self.batch_size = options['batch_size']
+        started = time.perf_counter()
+
+        self.create_users(options['users'], options['prefix'], options['password'])
+        author_ids = self.create_authors(options['authors'])
+        book_ids = self.create_books(author_ids, options['books'])
+        self.create_libraries(book_ids, options['libraries'], options['books_per_library'])
+        self.create_shelf_books(options['shelf_books'])
+
+        self.stdout.write(self.style.SUCCESS(
+            'Seeded in %.1fs.' % (time.perf_counter() - started)
+        ))
+
+    def insert(self, model, items, build, label, **kwargs):
+        """
+        Insert model rows built from items in batches, one transaction per batch.
+        """
+        count = 0
+        for batch in batched(items, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(build(batch), batch_size=self.batch_size, **kwargs)
+            count += len(batch)
+        self.stdout.write('  %s: %d' % (label, count))
+        return count
+
+    def new_ids(self, model, last_id):
+        return list(model.objects.filter(id__gt=last_id).values_list('id', flat=True))
+
+    def last_id(self, model):
+        return model.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+    def create_users(self, count, prefix, password):
+        # Hashing is deliberately slow, so every seeded user shares one hash.
+        password_hash = make_password(password)
+        start = User.objects.filter(username__startswith=prefix + '_').count()
+        last_id = self.last_id(User)
+        self.insert(User, range(start, start + count), lambda batch: [
+            User(
+                username='%s_%d' % (prefix, i),
+                email='%s_%d@example.com' % (prefix, i),
+                password=password_hash,
+            )
+            for i in batch
+        ], 'users')
+        roles, weights = zip(*ROLES)
+        self.insert(UserProfile, self.new_ids(User, last_id), lambda batch: [
+            UserProfile(user_id=user_id, role=random.choices(roles, weights=weights)[0])
+            for user_id in batch
+        ], 'user profiles')
+
+    def create_authors(self, count):
+        last_id = self.last_id(Author)
+        self.insert(Author, range(count), lambda batch: [
+            Author(name=person()) for _ in batch
+        ], 'authors')
+        author_ids = self.new_ids(Author, last_id)
+        random.shuffle(author_ids)
+        return author_ids
+
+    def create_books(self, author_ids, total):
+        if not author_ids:
+            return []
+        last_id = self.last_id(Book)
+        authors = random.choices(author_ids, cum_weights=zipf_cum_weights(len(author_ids)), k=total)
+        self.insert(Book, authors, lambda batch: [
+            Book(title=title(), author_id=author) for author in batch
+        ], 'books')
+        return self.new_ids(Book, last_id)
+
+    def create_libraries(self, book_ids, count, mean):
+        last_id = self.last_id(Library)
+        self.insert(Library, range(count), lambda batch: [
+            Library(name='%s Library %d' % (random.choice(WORDS).title(), i)) for i in batch
+        ], 'libraries')
+        library_ids = self.new_ids(Library, last_id)
+        self.insert(Librarian, library_ids, lambda batch: [
+            Librarian(name=person(), library_id=library_id) for library_id in batch
+        ], 'librarians')
+        if not book_ids:
+            return
+        Stock = Library.books.through
+        book_weights = zipf_cum_weights(len(book_ids), s=0.8)
+        pairs = (
+            (library_id, book_id)
+            for library_id in library_ids
+            for book_id in sample_distinct(
+                book_ids, book_weights, power_law_degree(mean, len(book_ids))
+            )
+        )
+        self.insert(Stock, pairs, lambda batch: [
+            Stock(library_id=library_id, book_id=book_id) for library_id, book_id in batch
+        ], 'library books', ignore_conflicts=True)
+
+    def create_shelf_books(self, count):
+        current_year = datetime.now().year
+        self.insert(ShelfBook, range(count), lambda batch: [
+            ShelfBook(
+                title=title(),
+                author=person(),
+                publication_year=max(1800, current_year - int(random.expovariate(1 / 15))),
+            )
+            for _ in batch
+        ], 'shelf books')
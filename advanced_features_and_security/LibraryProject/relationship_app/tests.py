@@ -1,3 +1,27 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
 
-# Create your tests here.
+from bookshelf.models import Book as ShelfBook
+from .models import Author, Book, Library, Librarian, UserProfile
+
+
+class SeedCommandTests(TestCase):
+    def test_seed_creates_rows(self):
+        call_command('seed', users=5, authors=4, books=30, libraries=3, books_per_library=5,
+                     shelf_books=7, batch_size=10, random_seed=1, stdout=StringIO())
+        self.assertEqual(get_user_model().objects.count(), 5)
+        self.assertEqual(UserProfile.objects.count(), 5)
+        self.assertEqual(Author.objects.count(), 4)
+        self.assertEqual(Book.objects.count(), 30)
+        self.assertEqual(Library.objects.count(), 3)
+        self.assertEqual(Librarian.objects.count(), 3)
+        self.assertTrue(Library.books.through.objects.exists())
+        self.assertEqual(ShelfBook.objects.count(), 7)
+
+    def test_rerun_adds_new_users(self):
+        call_command('seed', users=2, authors=1, books=1, libraries=1, shelf_books=0, stdout=StringIO())
+        call_command('seed', users=2, authors=1, books=1, libraries=1, shelf_books=0, stdout=StringIO())
+        self.assertEqual(get_user_model().objects.count(), 4)
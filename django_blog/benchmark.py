@@ -0,0 +1,195 @@
+"""
+Benchmark the blog list and detail pages with and without the indexes
+the list queries use: the partial indexes on the published posts'
+published_date (blog/migrations/0009, made partial in 0014). Comments are
+listed through the Comment(post, path) index, which stays in place.
+
+Seeds a separate SQLite database (the project database is never touched),
+then for each state drops or creates the indexes as the current models
+define them with DROP/CREATE INDEX, runs ANALYZE and times the
+home page, a deep home page, a tag page and the detail page of the most
+commented post through the full Django stack with caching disabled. The
+query plan of the home page query is printed for each state, so the
+sorted scan of the whole posts table is visible next to its cost.
+
+    python benchmark.py --posts 1000000 --comments 10000000   # the big run
+    python benchmark.py --posts 20000 --comments 200000 --requests 20
+    python benchmark.py --reuse --output benchmark-results.json
+
+Seeding 1M posts and 10M comments takes a while and several GB of disk;
+pass --reuse to benchmark an already seeded --database again.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+INDEXES = (
+    ('blog.Post', 'blog_post_live_idx'),
+    ('blog.Post', 'blog_post_author_live_idx'),
+)
+# (state, whether INDEXES exist)
+STATES = (
+    ('before', False),
+    ('after', True),
+)
+
+
+def percentile(sorted_values, pct):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def setup_django(database):
+    sys.path.insert(0, BASE_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_blog.settings')
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = database
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+    settings.ALLOWED_HOSTS = ['testserver']
+    settings.QUERY_BUDGET_RAISE = False
+    import django
+    django.setup()
+
+
+def targets():
+    """
+    Return (name, url) pairs for the pages to time.
+    """
+    from django.db.models import Count
+    from django.urls import reverse
+    from blog.models import Post
+    from blog.views import PostListView
+    from taggit.models import Tag
+
+    pages = (Post.objects.count() + PostListView.paginate_by - 1) // PostListView.paginate_by
+    hot_post = (Post.objects.annotate(comment_count=Count('comments'))
+                .order_by('-comment_count').values_list('pk', flat=True).first())
+    tag = Tag.objects.annotate(uses=Count('taggit_taggeditem_items')).order_by('-uses').first()
+    urls = [('home', reverse('home')), ('home deep page', '%s?page=%d' % (reverse('home'), max(1, pages // 2)))]
+    if tag:
+        urls.append(('tag page', reverse('post-by-tag', kwargs={'tag_slug': tag.slug})))
+    if hot_post:
+        urls.append(('detail', reverse('post-detail', kwargs={'pk': hot_post})))
+    return urls
+
+
+def set_indexes(present):
+    """
+    Create or drop INDEXES, whichever of them are not in that state yet.
+    """
+    from django.apps import apps
+    from django.db import connection
+
+    with connection.schema_editor() as editor:
+        for label, name in INDEXES:
+            model = apps.get_model(label)
+            index = next(index for index in model._meta.indexes if index.name == name)
+            with connection.cursor() as cursor:
+                exists = name in connection.introspection.get_constraints(cursor, model._meta.db_table)
+            if present and not exists:
+                editor.add_index(model, index)
+            elif exists and not present:
+                editor.remove_index(model, index)
+
+
+def home_query_plan():
+    from django.db import connection
+    from blog.models import Post
+
+    queryset = Post.objects.published().order_by('-published_date')[:10]
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def time_pages(urls, requests):
+    from django.test import Client
+
+    client = Client()
+    results = {}
+    for name, url in urls:
+        client.get(url)  # Warm the OS page cache and SQLite's.
+        latencies = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = client.get(url)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise SystemExit('%s returned %d' % (url, response.status_code))
+        latencies.sort()
+        results[name] = {
+            'url': url,
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'max_ms': round(latencies[-1], 2),
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--database', default=os.path.join(BASE_DIR, 'benchmark.sqlite3'))
+    parser.add_argument('--reuse', action='store_true',
+                        help='Benchmark the existing --database without seeding it.')
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--comments', type=int, default=10000000)
+    parser.add_argument('--tags', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=50, help='Timed requests per page.')
+    parser.add_argument('--output', help='Write the results to this JSON file.')
+    args = parser.parse_args(argv)
+
+    if not args.reuse and os.path.exists(args.database):
+        os.remove(args.database)
+    setup_django(args.database)
+
+    from django.core.management import call_command
+    from django.db import connection
+
+    call_command('migrate', verbosity=0)
+    if not args.reuse:
+        print('Seeding %d posts and %d comments into %s ...' % (args.posts, args.comments, args.database))
+        call_command('seed', users=args.users, posts=args.posts, comments=args.comments,
+                     tags=args.tags, random_seed=1)
+
+    urls = targets()
+    results = {}
+    for state, present in STATES:
+        set_indexes(present)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        plan = home_query_plan()
+        pages = time_pages(urls, args.requests)
+        results[state] = {'indexes': present, 'home_query_plan': plan, 'pages': pages}
+
+        print('\n%s (indexes %s)' % (state, 'created' if present else 'dropped'))
+        print('  home query plan: %s' % '; '.join(plan))
+        for name, page in pages.items():
+            print('  %-16s p50 %9.2f ms  p95 %9.2f ms  max %9.2f ms' % (
+                name, page['p50_ms'], page['p95_ms'], page['max_ms'],
+            ))
+
+    print()
+    for name in results['before']['pages']:
+        before = results['before']['pages'][name]['p50_ms']
+        after = results['after']['pages'][name]['p50_ms']
+        print('%-16s p50 %9.2f -> %9.2f ms  (%.1fx)' % (name, before, after, before / after if after else 0))
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""
+Benchmark the per-request cost of each session engine for logged-in users,
+and the chunked cleanup of expired sessions.
+
+Uses a separate SQLite database (the project database is never touched)
+with --sessions other users' live sessions in django_session. For each
+engine it logs a user in and times authenticated requests for the profile
+page through the full Django stack, counting the queries each one makes,
+so the session lookup shows up next to its cost. It then fills the table
+with --expired expired sessions and times SessionStore.clear_expired from
+django_blog/sessions.py, reporting the slowest DELETE, the longest the
+table is locked at a time.
+
+    python benchmark_sessions.py
+    python benchmark_sessions.py --sessions 100000 --expired 500000 --requests 500
+    python benchmark_sessions.py --output benchmark-results.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import timedelta
+
+from benchmark import percentile
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ENGINES = (
+    ('db', 'django.contrib.sessions.backends.db'),
+    ('cached_db', 'django.contrib.sessions.backends.cached_db'),
+    ('signed_cookies', 'django.contrib.sessions.backends.signed_cookies'),
+    ('hybrid', 'django_blog.sessions'),
+)
+
+
+def setup_django(database):
+    sys.path.insert(0, BASE_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_blog.settings')
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = database
+    # cached_db and the hybrid engine need a real cache.
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    settings.ALLOWED_HOSTS = ['testserver']
+    settings.QUERY_BUDGET_RAISE = False
+    # Fast hashing for the throwaway users; login is not what is measured.
+    settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+    import django
+    django.setup()
+
+
+def fill_sessions(count, expired):
+    """
+    Insert count sessions, expired ones when expired is true.
+    """
+    from django.contrib.sessions.models import Session
+    from django.utils import timezone
+    from django.utils.crypto import get_random_string
+
+    expire_date = timezone.now() + (timedelta(days=-1) if expired else timedelta(days=14))
+    for start in range(0, count, 5000):
+        Session.objects.bulk_create([
+            Session(session_key=get_random_string(32), session_data='e30:1:x', expire_date=expire_date)
+            for _ in range(min(5000, count - start))
+        ])
+
+
+def time_engine(engine, user, url, requests):
+    from django.conf import settings
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    settings.SESSION_ENGINE = engine
+    cache.clear()
+    client = Client()
+    client.force_login(user)
+    client.get(url)  # Warm the caches and SQLite's.
+    latencies = []
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = client.get(url)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise SystemExit('%s returned %d with %s' % (url, response.status_code, engine))
+    latencies.sort()
+    return {
+        'engine': engine,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'queries_per_request': round(len(queries) / requests, 2),
+        'cookie_bytes': len(client.cookies[settings.SESSION_COOKIE_NAME].value),
+    }
+
+
+def time_cleanup(batch_size):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from django_blog.sessions import SessionStore
+
+    started = time.perf_counter()
+    with CaptureQueriesContext(connection) as queries:
+        deleted = SessionStore.clear_expired(batch_size)
+    total = time.perf_counter() - started
+    deletes = [float(query['time']) * 1000 for query in queries if query['sql'].startswith('DELETE')]
+    return {
+        'deleted': deleted,
+        'batch_size': batch_size,
+        'batches': len(deletes),
+        'total_s': round(total, 3),
+        'slowest_delete_ms': round(max(deletes, default=0.0), 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--database', default=os.path.join(BASE_DIR, 'benchmark.sqlite3'))
+    parser.add_argument('--sessions', type=int, default=20000, help='Live sessions of other users.')
+    parser.add_argument('--expired', type=int, default=100000, help='Expired sessions to clean up.')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=200, help='Timed requests per engine.')
+    parser.add_argument('--output', help='Write the results to this JSON file.')
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.database):
+        os.remove(args.database)
+    setup_django(args.database)
+
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.urls import reverse
+
+    call_command('migrate', verbosity=0)
+    user = User.objects.create_user('benchmark', password='benchmark')
+    fill_sessions(args.sessions, expired=False)
+
+    results = {'engines': {}}
+    url = reverse('profile')
+    for name, engine in ENGINES:
+        results['engines'][name] = result = time_engine(engine, user, url, args.requests)
+        print('%-15s p50 %7.3f ms  p95 %7.3f ms  %5.2f queries/request  cookie %4d bytes' % (
+            name, result['p50_ms'], result['p95_ms'], result['queries_per_request'], result['cookie_bytes'],
+        ))
+
+    fill_sessions(args.expired, expired=True)
+    results['cleanup'] = cleanup = time_cleanup(args.batch_size)
+    print('\nDeleted %d expired sessions in %.3fs: %d batches of %d, slowest DELETE %.3f ms.' % (
+        cleanup['deleted'], cleanup['total_s'], cleanup['batches'], cleanup['batch_size'],
+        cleanup['slowest_delete_ms'],
+    ))
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
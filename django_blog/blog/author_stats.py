@@ -0,0 +1,45 @@
+"""
+Per-author post and comment counts for the author archive pages. Only
+published posts count.
+
+Counting an author's posts and comments on every page view means two
+aggregates over the posts and comments tables. Instead the counts live in
+the AuthorStat table and are adjusted by the save and delete handlers in
+blog/signals.py. ``manage.py rebuild_author_stats`` recomputes the table
+after bulk loads that bypass the signals, or after posts or comments are
+moved to another author, which the handlers do not follow.
+"""
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import AuthorStat, Comment, Post
+
+
+def adjust(user_id, field, delta):
+    """
+    Add delta, which may be negative, to one of a user's counts.
+    """
+    if delta > 0:
+        AuthorStat.objects.bulk_create([AuthorStat(user_id=user_id)], ignore_conflicts=True)
+    AuthorStat.objects.filter(user_id=user_id, **{field + '__gte': -delta}).update(
+        **{field: F(field) + delta},
+    )
+
+
+def rebuild():
+    """
+    Recompute every AuthorStat row from the posts and comments tables.
+    """
+    def counts(queryset):
+        return dict(queryset.order_by().values('author_id').annotate(total=Count('pk'))
+                    .values_list('author_id', 'total'))
+
+    posts, comments = counts(Post.objects.published()), counts(Comment.objects.all())
+    with transaction.atomic():
+        AuthorStat.objects.all().delete()
+        AuthorStat.objects.bulk_create([
+            AuthorStat(user_id=user_id, post_count=posts.get(user_id, 0),
+                       comment_count=comments.get(user_id, 0))
+            for user_id in posts.keys() | comments.keys()
+        ], batch_size=1000)
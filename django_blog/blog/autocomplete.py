@@ -0,0 +1,166 @@
+"""
+Search-as-you-type suggestions for tag names and post titles.
+
+Suggestions come from PrefixIndex objects held in each process's memory:
+sorted lists of casefolded keys searched with bisect, so a lookup is a
+binary search and a short scan and never touches the database. Every word
+of a name or title starts a key of its own, so "dja" suggests "Deploying
+Django" as well as "Django tips".
+
+Building the indexes takes one query for the tags and one for the posts.
+The signal handlers in blog/signals.py call invalidate() when a published
+title, a post's status or a tag changes, which moves a version token in the
+cache. Each process compares the token before answering, and when it has
+moved rebuilds its indexes on a background thread while it keeps answering
+from the old ones, so a request never waits for a rebuild nor touches the
+database. Until a process's first build finishes its suggestions are
+empty. Changes reach every process sharing the cache.
+
+Settings:
+    AUTOCOMPLETE_LIMIT  suggestions of each kind, default 10
+    AUTOCOMPLETE_ASYNC  rebuild in the background, default True
+"""
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from taggit.models import Tag
+
+from .models import Post
+
+VERSION_KEY = 'blog:autocomplete:version'
+KINDS = ('tags', 'posts')
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='autocomplete')
+_lock = threading.Lock()
+_indexes = None
+_rebuilding = False
+
+
+def normalize(text):
+    return ' '.join(text.casefold().split())
+
+
+class PrefixIndex:
+    """
+    Sorted keys for prefix lookups. entries is an iterable of (text, value)
+    pairs; values must be hashable and are returned at most once per search.
+    """
+
+    def __init__(self, entries):
+        pairs = []
+        for text, value in entries:
+            words = normalize(text).split(' ')
+            for start in range(len(words)):
+                pairs.append((' '.join(words[start:]), value))
+        pairs.sort(key=lambda pair: pair[0])
+        self.keys = [key for key, value in pairs]
+        self.values = [value for key, value in pairs]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def search(self, prefix, limit):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        results, seen = [], set()
+        for index in range(bisect_left(self.keys, prefix), len(self.keys)):
+            if not self.keys[index].startswith(prefix) or len(results) == limit:
+                break
+            value = self.values[index]
+            if value not in seen:
+                seen.add(value)
+                results.append(value)
+        return results
+
+
+def _bump():
+    cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def invalidate():
+    """
+    Make every process rebuild its indexes before the next suggestion.
+
+    Bumped again on commit, so an index built from the old rows in the
+    meantime does not stay current.
+    """
+    _bump()
+    transaction.on_commit(_bump)
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+EMPTY = {kind: PrefixIndex([]) for kind in KINDS}
+
+
+def build():
+    return {
+        'tags': PrefixIndex((name, (name, slug)) for name, slug in Tag.objects.values_list('name', 'slug')),
+        'posts': PrefixIndex((title, (pk, title)) for pk, title in
+                             Post.objects.published().values_list('pk', 'title').iterator()),
+    }
+
+
+def _rebuild():
+    global _indexes, _rebuilding
+    try:
+        # Read first: an invalidation during the build schedules another.
+        version = current_version()
+        indexes = build()
+        with _lock:
+            _indexes = (version, indexes)
+    except Exception:
+        logger.exception('Rebuilding the autocomplete indexes failed')
+    finally:
+        with _lock:
+            _rebuilding = False
+        # The worker thread opened its own connections.
+        connections.close_all()
+
+
+def get_indexes():
+    """
+    Return this process's indexes. Out of date ones are returned as they
+    are and rebuilt in the background, unless AUTOCOMPLETE_ASYNC is off.
+    """
+    global _indexes, _rebuilding
+    version = current_version()
+    indexes = _indexes
+    if indexes is not None and indexes[0] == version:
+        return indexes[1]
+    if not getattr(settings, 'AUTOCOMPLETE_ASYNC', True):
+        with _lock:
+            if _indexes is None or _indexes[0] != version:
+                _indexes = (version, build())
+            return _indexes[1]
+    with _lock:
+        if not _rebuilding:
+            _rebuilding = True
+            _executor.submit(_rebuild)
+    return indexes[1] if indexes is not None else EMPTY
+
+
+def suggest(prefix, kinds=KINDS, limit=None):
+    """
+    Return {kind: [value, ...]} for the given kinds: (name, slug) pairs for
+    tags and (pk, title) pairs for posts.
+    """
+    limit = limit or getattr(settings, 'AUTOCOMPLETE_LIMIT', 10)
+    indexes = get_indexes()
+    return {kind: indexes[kind].search(prefix, limit) for kind in kinds}
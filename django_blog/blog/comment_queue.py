@@ -0,0 +1,159 @@
+"""
+Write-behind queue for comments posted through the AJAX endpoint.
+
+During busy live posts, saving each comment on its own means an insert, a
+path update, a count update and a page cache invalidation per comment, and
+the invalidations keep orphaning the post's cached comment fragment.
+Instead enqueue() buffers comments in the process and flush() writes them
+together: one bulk_create, one bulk_update for the thread paths, one count
+update per author and a single invalidation of each post and author page
+touched.
+
+A flush runs on a timer thread COMMENT_QUEUE_FLUSH_INTERVAL seconds after
+the first comment of a batch is queued, or at once when
+COMMENT_QUEUE_BATCH_SIZE comments are waiting, so requests never wait for
+the writes. Each process has its own queue, and comments still queued
+when a process is killed outright are lost, so keep the interval short.
+As with blog.view_counts, nothing flushes at exit on its own: the gunicorn
+worker_exit hook in gunicorn.conf.py and the blog tests call flush().
+
+bulk_create sends no signals, so flush() does the work of the Comment
+save handlers in blog/signals.py itself.
+
+Settings:
+    COMMENT_QUEUE_BATCH_SIZE      comments per flush, default 100
+    COMMENT_QUEUE_FLUSH_INTERVAL  seconds a comment may wait, default 1.0;
+                                  0 writes every comment straight away
+"""
+
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+
+from . import author_stats, page_cache
+from .models import MAX_DEPTH, PATH_STEP, Comment, Post, path_segment
+
+_lock = threading.Lock()
+_pending = []
+_timer = None
+
+
+def get_batch_size():
+    return getattr(settings, 'COMMENT_QUEUE_BATCH_SIZE', 100)
+
+
+def get_flush_interval():
+    return getattr(settings, 'COMMENT_QUEUE_FLUSH_INTERVAL', 1.0)
+
+
+def enqueue(comment):
+    """
+    Queue an unsaved comment for the next flush, or write it straight away
+    when the flush interval is 0.
+    """
+    global _timer
+    interval = get_flush_interval()
+    if interval <= 0:
+        # A parent the caller has just read can be used as it is.
+        parent = comment.parent if Comment.parent.is_cached(comment) else None
+        write([comment], {parent.pk: parent} if parent else None)
+        return
+    with _lock:
+        _pending.append(comment)
+        if len(_pending) >= get_batch_size():
+            if _timer is not None:
+                _timer.cancel()
+            _timer = _start_timer(0)
+        elif _timer is None:
+            _timer = _start_timer(interval)
+
+
+def _start_timer(delay):
+    timer = threading.Timer(delay, _flush_from_timer)
+    timer.daemon = True
+    timer.start()
+    return timer
+
+
+def pending():
+    with _lock:
+        return len(_pending)
+
+
+def flush():
+    """
+    Write every queued comment. Returns how many were written.
+    """
+    global _timer
+    with _lock:
+        batch = _pending[:]
+        del _pending[:]
+        if _timer is not None:
+            _timer.cancel()
+            _timer = None
+    if batch:
+        post_ids = set(Post.objects.filter(pk__in={comment.post_id for comment in batch})
+                       .values_list('pk', flat=True))
+        # Posts may have been deleted while their comments waited.
+        write([comment for comment in batch if comment.post_id in post_ids])
+    return len(batch)
+
+
+def _flush_from_timer():
+    try:
+        flush()
+    finally:
+        # The timer thread opened its own connections.
+        connections.close_all()
+
+
+def _thread_prefix(comment, parents):
+    """
+    Return the path prefix for a comment, moving replies past MAX_DEPTH up
+    to their ancestor at that depth as Comment.save() does.
+    """
+    parent = parents.get(comment.parent_id)
+    if parent is None:
+        comment.parent = None
+        return ''
+    if parent.depth < MAX_DEPTH:
+        return parent.path
+    # The path holds every ancestor's id, so no further query is needed.
+    prefix = parent.path[:MAX_DEPTH * PATH_STEP]
+    comment.parent_id = int(prefix[-PATH_STEP:])
+    return prefix
+
+
+def write(comments, parents=None):
+    """
+    Insert comments in one batch and do what their save signals would.
+    Their posts must exist. parents maps ids to parent comments already
+    loaded with their path and depth; the others are read here.
+    """
+    if not comments:
+        return
+    parents = dict(parents or {})
+    missing = {comment.parent_id for comment in comments if comment.parent_id} - parents.keys()
+    if missing:
+        parents.update(Comment.objects.only('path', 'depth').in_bulk(missing))
+    prefixes = [_thread_prefix(comment, parents) for comment in comments]
+    with transaction.atomic():
+        created = Comment.objects.bulk_create(comments)
+        for comment, prefix in zip(created, prefixes):
+            comment.path = prefix + path_segment(comment.pk)
+            comment.depth = len(comment.path) // PATH_STEP - 1
+        Comment.objects.bulk_update(created, ['path', 'depth'])
+        authors = Counter(comment.author_id for comment in created)
+        for author_id, count in authors.items():
+            author_stats.adjust(author_id, 'comment_count', count)
+    # Comments from the API carry their author, so usually no query is needed.
+    loaded = {comment.author for comment in created if Comment.author.is_cached(comment)}
+    usernames = {author.username for author in loaded}
+    missing = authors.keys() - {author.pk for author in loaded}
+    if missing:
+        usernames.update(User.objects.filter(pk__in=missing).values_list('username', flat=True))
+    page_cache.invalidate(*('post:%s' % post_id for post_id in {comment.post_id for comment in created}),
+                          *('author:%s' % username for username in usernames))
@@ -0,0 +1,132 @@
+"""
+RSS and Atom feeds for all posts and for each tag.
+
+Feed readers poll the same URL every few minutes, almost always for an
+unchanged feed. The serialized feed is therefore cached under the page
+cache generations of the posts it lists (see blog/page_cache.py), so it is
+rebuilt only after one of those posts changes, and every response carries
+an ETag and a Last-Modified date so most polls end in a 304 without
+touching the database or re-sending the body.
+
+Settings:
+    BLOG_FEED_ITEMS  number of posts in a feed, default 20
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.http import http_date, parse_http_date_safe
+from taggit.models import Tag
+
+from . import page_cache
+from .models import Post
+
+FEED_PREFIX = 'blog:feed:'
+
+
+class LatestPostsFeed(Feed):
+    title = 'Django Blog'
+    description = 'The latest posts on Django Blog.'
+
+    def link(self):
+        return reverse('home')
+
+    def get_posts(self, obj):
+        return Post.objects.published()
+
+    def items(self, obj):
+        return (self.get_posts(obj).select_related('author').prefetch_related('tags')
+                .order_by('-published_date')[:getattr(settings, 'BLOG_FEED_ITEMS', 20)])
+
+    def item_title(self, item):
+        return item.title
+
+    def item_description(self, item):
+        return item.content_html
+
+    def item_author_name(self, item):
+        return item.author.username
+
+    def item_pubdate(self, item):
+        return item.published_date
+
+    def item_updateddate(self, item):
+        return item.updated_at
+
+    def item_categories(self, item):
+        return [tag.name for tag in item.tags.all()]
+
+
+class LatestPostsAtomFeed(LatestPostsFeed):
+    feed_type = Atom1Feed
+    subtitle = LatestPostsFeed.description
+
+
+class TagFeed(LatestPostsFeed):
+    def get_object(self, request, tag_slug):
+        return get_object_or_404(Tag, slug=tag_slug)
+
+    def title(self, obj):
+        return 'Django Blog: posts tagged %s' % obj.name
+
+    def description(self, obj):
+        return 'The latest posts tagged %s on Django Blog.' % obj.name
+
+    def link(self, obj):
+        return reverse('post-by-tag', kwargs={'tag_slug': obj.slug})
+
+    def get_posts(self, obj):
+        # The same filter as PostByTagListView.
+        return Post.objects.published().filter(tags__slug=obj.slug)
+
+
+class TagAtomFeed(TagFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return self.description(obj)
+
+
+def cached_feed(feed_class, *namespaces):
+    """
+    Wrap a feed in a view serving it from the cache with conditional GET.
+
+    namespaces are page cache namespaces, formatted with the URL kwargs.
+    """
+    feed = feed_class()
+
+    def view(request, **kwargs):
+        generation = page_cache.generation([namespace.format(**kwargs) for namespace in namespaces])
+        key = FEED_PREFIX + hashlib.md5(
+            ('%s %s' % (generation, request.path)).encode(), usedforsecurity=False,
+        ).hexdigest()
+        cached = cache.get(key)
+        if cached is None:
+            response = feed(request, **kwargs)
+            if response.status_code != 200:
+                return response
+            cached = {
+                'content': response.content,
+                'content_type': response['Content-Type'],
+                'etag': '"%s"' % hashlib.md5(response.content, usedforsecurity=False).hexdigest(),
+                'last_modified': parse_http_date_safe(response.get('Last-Modified', '')),
+            }
+            cache.set(key, cached, page_cache.get_timeout())
+
+        not_modified = get_conditional_response(
+            request, etag=cached['etag'], last_modified=cached['last_modified'],
+        )
+        response = not_modified or HttpResponse(cached['content'], content_type=cached['content_type'])
+        response['ETag'] = cached['etag']
+        if cached['last_modified']:
+            response['Last-Modified'] = http_date(cached['last_modified'])
+        return response
+
+    return view
@@ -2,6 +2,9 @@ from django import forms
 from taggit.forms import TagWidget
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
+from django.urls import reverse_lazy
+from django.utils import timezone
+from django.utils.text import format_lazy
 
 class CustomUserCreationForm(UserCreationForm):
     email = forms.EmailField(required=True)
@@ -17,7 +20,7 @@ class UserUpdateForm(forms.ModelForm):
         model = User
         fields = ['username', 'email']
 
-from .models import Post, Comment
+from .models import Post, PostImage, Comment
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -27,10 +30,70 @@ class CommentForm(forms.ModelForm):
             'content': forms.Textarea(attrs={'class': 'form-control', 'rows': 3, 'placeholder': 'Add a comment...'}),
         }
 
+class MultipleImageInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+class MultipleImageField(forms.ImageField):
+    """
+    An image field accepting several files; cleans to a list.
+    """
+    widget = MultipleImageInput
+
+    def clean(self, data, initial=None):
+        clean_one = super().clean
+        if isinstance(data, (list, tuple)):
+            return [clean_one(image, initial) for image in data]
+        return [clean_one(data, initial)] if data else []
+
 class PostForm(forms.ModelForm):
+    images = MultipleImageField(
+        required=False, label='Add images',
+        help_text='Shown below the post, resized to suit each screen.',
+    )
+    publish_at = forms.DateTimeField(
+        required=False, label='Publish at',
+        help_text='When a scheduled post goes live.',
+        widget=forms.DateTimeInput(attrs={'type': 'datetime-local'}, format='%Y-%m-%dT%H:%M'),
+    )
+
     class Meta:
         model = Post
-        fields = ['title', 'content', 'tags']
+        fields = ['title', 'content', 'tags', 'status']
         widgets = {
-            'tags': TagWidget(),
+            # Suggestions for the tag after the last comma, filled in by scripts.js.
+            'tags': TagWidget(attrs={
+                'data-autocomplete': format_lazy('{}?type=tags', reverse_lazy('autocomplete')),
+                'data-autocomplete-multiple': '',
+            }),
         }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.status == Post.Status.SCHEDULED:
+            self.initial.setdefault('publish_at', timezone.localtime(self.instance.published_date))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('status') == Post.Status.SCHEDULED:
+            publish_at = cleaned_data.get('publish_at')
+            if publish_at is None:
+                self.add_error('publish_at', 'Choose when to publish the post.')
+            elif publish_at <= timezone.now():
+                self.add_error('publish_at', 'The publication time must be in the future.')
+        return cleaned_data
+
+    def save(self, commit=True):
+        post = self.instance
+        if post.status == Post.Status.SCHEDULED:
+            post.published_date = self.cleaned_data['publish_at']
+        elif post.is_published() and not post.was_published():
+            # Dated when it goes live, not when the draft was started.
+            post.published_date = timezone.now()
+        return super().save(commit)
+
+    def _save_m2m(self):
+        super()._save_m2m()
+        # Runs from save(), or from save_m2m() after save(commit=False).
+        position = self.instance.images.count()
+        for offset, image in enumerate(self.cleaned_data.get('images') or ()):
+            PostImage.objects.create(post=self.instance, image=image, position=position + offset)
@@ -0,0 +1,192 @@
+"""
+Responsive size variants of post images.
+
+Post images are shown through ``<img srcset>``, so each browser downloads
+the width it needs rather than the uploaded original. The widths offered
+are the configured POST_IMAGE_WIDTHS narrower than the image, plus the
+image's own width, each in WebP and JPEG.
+
+Nothing is resized at upload time. A variant is rendered the first time it
+is requested (see the post_image view) and stored on disk next to the
+original, where every later request finds it. A variant is written under a
+temporary name and moved into place, so it is never seen half written;
+this needs a storage with local paths. Rendering runs on a small
+background thread pool, and the request that triggered it is answered with
+the original, uncached, so a page never waits for the resizing and sizes
+nobody asks for are never rendered. Variant names derive from the
+original's, which is unique per upload, so a stored variant never changes
+and is served with far-future cache headers.
+
+Settings:
+    POST_IMAGE_WIDTHS   widths in pixels, default (320, 640, 960, 1280, 1920)
+    POST_IMAGE_FORMATS  output formats, default ('webp', 'jpeg')
+    POST_IMAGE_SIZES    the sizes attribute, default '(max-width: 800px) 100vw, 800px'
+    POST_IMAGE_ASYNC    render in the background, default True
+"""
+
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.urls import reverse
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+CONTENT_TYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+SAVE_OPTIONS = {
+    'webp': {'quality': 80, 'method': 4},
+    'jpeg': {'quality': 82, 'optimize': True, 'progressive': True},
+}
+# EXIF orientations that turn the image on its side.
+ROTATED = {5, 6, 7, 8}
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='post-images')
+_lock = threading.Lock()
+_rendering = set()
+
+
+def get_widths():
+    return sorted(getattr(settings, 'POST_IMAGE_WIDTHS', (320, 640, 960, 1280, 1920)))
+
+
+def get_formats():
+    formats = getattr(settings, 'POST_IMAGE_FORMATS', ('webp', 'jpeg'))
+    return [fmt for fmt in formats if fmt != 'webp' or features.check('webp')]
+
+
+def dimensions(image_file):
+    """
+    Return the displayed (width, height) of an image, reading only its header.
+    """
+    with Image.open(image_file) as image:
+        width, height = image.size
+        if image.getexif().get(0x0112) in ROTATED:
+            width, height = height, width
+    return width, height
+
+
+def available_widths(post_image):
+    return [width for width in get_widths() if width < post_image.width] + [post_image.width]
+
+
+def variant_name(source_name, width, fmt):
+    directory, filename = os.path.split(source_name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, 'variants', '%s_%d.%s' % (stem, width, EXTENSIONS[fmt]))
+
+
+def variant_names(post_image):
+    """
+    Every variant name an image may have, rendered or not.
+    """
+    return {variant_name(post_image.image.name, width, fmt)
+            for width in [*get_widths(), post_image.width] for fmt in EXTENSIONS}
+
+
+def render_variant(image_file, width, fmt):
+    """
+    Return the image scaled down to width pixels wide, encoded as fmt.
+    """
+    with Image.open(image_file) as source:
+        # JPEG can decode at a reduced scale, which saves most of the work.
+        # The draft size is in stored axes, before any EXIF rotation.
+        if source.getexif().get(0x0112) in ROTATED:
+            source.draft('RGB', (width * 2 * source.width // source.height, width * 2))
+        else:
+            source.draft('RGB', (width * 2, width * 2 * source.height // source.width))
+        image = ImageOps.exif_transpose(source)
+        image = image.convert('RGBA' if fmt == 'webp' and image.has_transparency_data else 'RGB')
+    if image.width > width:
+        image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+    buffer = BytesIO()
+    image.save(buffer, fmt.upper(), **SAVE_OPTIONS[fmt])
+    return buffer.getvalue()
+
+
+def store(storage, name, data):
+    """
+    Write data to name in one step: a temporary file in the same directory
+    is renamed over it, so readers see the whole file or none.
+    """
+    path = storage.path(name)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(descriptor, 'wb') as temporary_file:
+            temporary_file.write(data)
+        os.chmod(temporary, storage.file_permissions_mode or 0o644)
+        # Another worker may have stored the same variant; either copy will do.
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def generate_variant(post_image, width, fmt):
+    """
+    Render and store one variant unless it is already on disk. Returns its name.
+    """
+    storage = post_image.image.storage
+    name = variant_name(post_image.image.name, width, fmt)
+    if not storage.exists(name):
+        with storage.open(post_image.image.name, 'rb') as image_file:
+            data = render_variant(image_file, width, fmt)
+        store(storage, name, data)
+    return name
+
+
+def _generate_in_background(post_image, width, fmt):
+    try:
+        generate_variant(post_image, width, fmt)
+    except Exception:
+        logger.exception('Rendering variant %d.%s of post image %s failed', width, fmt, post_image.pk)
+    finally:
+        with _lock:
+            _rendering.discard((post_image.pk, width, fmt))
+
+
+def schedule_variant(post_image, width, fmt):
+    """
+    Render a variant on the thread pool, unless it is already being rendered.
+    Returns the variant's name when it was rendered straight away
+    (POST_IMAGE_ASYNC off), else None.
+    """
+    if not getattr(settings, 'POST_IMAGE_ASYNC', True):
+        return generate_variant(post_image, width, fmt)
+    key = (post_image.pk, width, fmt)
+    with _lock:
+        if key in _rendering:
+            return None
+        _rendering.add(key)
+    _executor.submit(_generate_in_background, post_image, width, fmt)
+    return None
+
+
+def srcsets(post_image):
+    """
+    Return {format: srcset} for an image, the preferred format first.
+    """
+    return {
+        fmt: ', '.join(
+            '%s %dw' % (reverse('post-image', kwargs={'pk': post_image.pk, 'width': width, 'fmt': fmt}), width)
+            for width in available_widths(post_image)
+        )
+        for fmt in get_formats()
+    }
+
+
+def delete_files(post_image):
+    """
+    Delete an image and whichever of its variants were rendered.
+    """
+    storage = post_image.image.storage
+    for name in [post_image.image.name, *variant_names(post_image)]:
+        if storage.exists(name):
+            storage.delete(name)
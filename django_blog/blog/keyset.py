@@ -0,0 +1,52 @@
+"""
+Keyset (seek) pagination.
+
+OFFSET pagination makes the database walk past every skipped row, so deep
+pages of a long comment thread get slower and slower. A keyset page instead
+asks for the rows after the last key already seen, which an index on the
+ordering key answers directly however deep the page is.
+"""
+
+from django.utils.functional import cached_property
+
+
+class KeysetPage:
+    """
+    One page of queryset ordered by key, starting after the key ``after``.
+
+    Evaluated lazily, so a template fragment served from the cache never
+    runs the query.
+    """
+
+    def __init__(self, queryset, key, after=None, per_page=50):
+        self.queryset = queryset
+        self.key = key
+        self.after = after
+        self.per_page = per_page
+
+    @cached_property
+    def _rows(self):
+        queryset = self.queryset.order_by(self.key)
+        if self.after:
+            queryset = queryset.filter(**{'%s__gt' % self.key: self.after})
+        # One extra row tells whether there is a next page.
+        return list(queryset[:self.per_page + 1])
+
+    @property
+    def object_list(self):
+        return self._rows[:self.per_page]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return len(self._rows) > self.per_page
+
+    @property
+    def next_key(self):
+        if self.has_next():
+            return getattr(self.object_list[-1], self.key)
+        return None
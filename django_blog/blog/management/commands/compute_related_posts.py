@@ -0,0 +1,98 @@
+"""
+Refresh the RelatedPost lookup table (see blog/related.py).
+
+Only stale posts, and the posts whose related lists they now enter or
+leave, are recomputed unless --full is given. Run it from cron:
+
+    python manage.py compute_related_posts --top-k 5
+"""
+
+import time
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+from taggit.models import TaggedItem
+
+from blog import page_cache, related
+from blog.models import Post, RelatedPost
+
+
+class Command(BaseCommand):
+    help = 'Compute the top related posts of each post into the RelatedPost table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=5)
+        parser.add_argument('--tag-weight', type=float, default=0.5,
+                            help='Weight of tag overlap against text similarity, 0 to 1.')
+        parser.add_argument('--full', action='store_true', help='Recompute every post.')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Posts scored per sparse matrix product.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        computed_at = timezone.now()
+        self.top_k = options['top_k']
+        self.chunk_size = options['chunk_size']
+
+        corpus = related.Corpus(
+            Post.objects.published().order_by('pk').values_list('pk', 'title', 'content').iterator(),
+            TaggedItem.objects.filter(
+                content_type=ContentType.objects.get_for_model(Post),
+            ).values_list('object_id', 'tag_id').iterator(),
+            tag_weight=options['tag_weight'],
+        )
+        if options['full']:
+            post_ids = set(corpus.ids)
+        else:
+            stale = set(Post.objects.published().filter(
+                Q(related_computed_at__isnull=True) | Q(updated_at__gt=F('related_computed_at')),
+            ).values_list('pk', flat=True))
+            post_ids = stale | self.affected_by(corpus, stale)
+
+        rows = sorted(corpus.row[post_id] for post_id in post_ids if post_id in corpus.row)
+        for start in range(0, len(rows), self.chunk_size):
+            self.store(corpus.top_related(rows[start:start + self.chunk_size], self.top_k), computed_at)
+
+        self.stdout.write(self.style.SUCCESS('Computed related posts for %d of %d posts in %.1fs%s.' % (
+            len(rows), len(corpus), time.perf_counter() - started,
+            '' if related.np is not None else ' (NumPy/SciPy not installed, used the pure Python path)',
+        )))
+
+    def affected_by(self, corpus, stale):
+        """
+        Return the other posts whose stored related lists a stale post
+        belongs in or currently sits in.
+        """
+        affected = set(RelatedPost.objects.filter(related_id__in=stale).values_list('post_id', flat=True))
+        thresholds = {
+            post_id: (lowest if count >= self.top_k else 0.0)
+            for post_id, lowest, count in RelatedPost.objects.values('post_id')
+            .annotate(lowest=Min('score'), count=Count('pk')).values_list('post_id', 'lowest', 'count')
+        }
+        rows = sorted(corpus.row[post_id] for post_id in stale if post_id in corpus.row)
+        for start in range(0, len(rows), self.chunk_size):
+            # Scores are symmetric, so a stale post's row also gives its score
+            # in every other post's list.
+            for row, scores in corpus.scores(rows[start:start + self.chunk_size]):
+                for other, score in scores.items():
+                    post_id = corpus.ids[other]
+                    if other != row and score > thresholds.get(post_id, 0.0):
+                        affected.add(post_id)
+        return affected - stale
+
+    def store(self, results, computed_at):
+        results = list(results)
+        post_ids = [post_id for post_id, best in results]
+        with transaction.atomic():
+            RelatedPost.objects.filter(post_id__in=post_ids).delete()
+            RelatedPost.objects.bulk_create([
+                RelatedPost(post_id=post_id, related_id=related_id, rank=rank, score=score)
+                for post_id, best in results
+                for rank, (related_id, score) in enumerate(best)
+            ])
+            # update() leaves updated_at alone, so edits made during the run stay stale.
+            Post.objects.filter(pk__in=post_ids).update(related_computed_at=computed_at)
+        page_cache.invalidate(*('post:%d' % post_id for post_id in post_ids))
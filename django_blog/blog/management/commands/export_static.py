@@ -0,0 +1,219 @@
+"""
+Export the public blog pages as a static HTML tree.
+
+Renders the home list, every post, every tag's list and the tag index as an
+anonymous visitor sees them, into --output (default BLOG_STATIC_EXPORT_DIR
+or <project>/static_site). Each URL becomes <path>/index.html; the
+``?page=N`` and ``?after=KEY`` pagination links are rewritten to
+``page/N/`` and ``after/KEY/`` directories so the tree can be served with
+no Django involvement. Serve STATIC_ROOT (after collectstatic) at
+STATIC_URL alongside it, and proxy the remaining URLs (login, posting,
+search) to Django.
+
+Builds are incremental. A manifest in the output directory records a
+fingerprint of every post (its updated_at and tags, and the count and
+latest updated_at of its comments); the next run re-renders only the pages
+those changes touch:
+
+* a new comment or an edited comment re-renders that post's pages only;
+* an edited post re-renders its pages, its home list page and its tags'
+  lists;
+* new, deleted or retagged posts change the tag counts shown on every list,
+  so all list pages and the tag index are re-rendered.
+
+    python manage.py export_static            # incremental
+    python manage.py export_static --full     # everything
+"""
+
+import json
+import math
+import os
+import re
+import shutil
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Max
+from django.test import RequestFactory
+from django.urls import reverse
+from taggit.models import TaggedItem
+
+from blog.models import Comment, Post, TagStat
+from blog.views import PostByTagListView, PostDetailView, PostListView, TagListView
+
+MANIFEST_NAME = '.export-manifest.json'
+MANIFEST_VERSION = 1
+
+PAGE_LINK_RE = re.compile(r'href="\?page=(\d+)"')
+AFTER_LINK_RE = re.compile(r'href="\?after=(\d+)"')
+FIRST_LINK_RE = re.compile(r'href="\?"')
+
+
+def rewrite_links(html, base):
+    """
+    Point the query string pagination links of the page at base to the
+    exported page directories.
+    """
+    def page(match):
+        number = int(match.group(1))
+        return 'href="%s"' % (base if number == 1 else '%spage/%d/' % (base, number))
+
+    html = PAGE_LINK_RE.sub(page, html)
+    html = AFTER_LINK_RE.sub(lambda match: 'href="%safter/%s/"' % (base, match.group(1)), html)
+    return FIRST_LINK_RE.sub('href="%s"' % base, html)
+
+
+class Command(BaseCommand):
+    help = 'Render the public blog pages to static HTML, re-rendering only what changed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None,
+                            help='Output directory; defaults to BLOG_STATIC_EXPORT_DIR.')
+        parser.add_argument('--full', action='store_true',
+                            help='Ignore the manifest and re-render every page.')
+
+    def handle(self, *args, **options):
+        self.output = os.path.abspath(options['output'] or getattr(
+            settings, 'BLOG_STATIC_EXPORT_DIR', os.path.join(settings.BASE_DIR, 'static_site'),
+        ))
+        self.factory = RequestFactory()
+        self.rendered = 0
+        started = time.perf_counter()
+
+        previous = {} if options['full'] else self.load_manifest()
+        old_posts = previous.get('posts', {})
+        posts = self.post_state()
+
+        removed = set(old_posts) - set(posts)
+        changed_details = {pk for pk, state in posts.items()
+                           if old_posts.get(pk, {}).get('detail') != state['detail']}
+        changed_lists = {pk for pk, state in posts.items()
+                         if old_posts.get(pk, {}).get('list') != state['list']}
+        retagged = removed | {pk for pk in changed_lists
+                              if old_posts.get(pk, {}).get('tags') != posts[pk]['tags']}
+
+        for pk in removed:
+            shutil.rmtree(self.path_for(reverse('post-detail', kwargs={'pk': int(pk)})),
+                          ignore_errors=True)
+        for pk in sorted(changed_details, key=int):
+            self.export_post(int(pk))
+
+        ordered = [str(pk) for pk in Post.objects.published().order_by('-published_date')
+                   .values_list('pk', flat=True)]
+        tag_counts = dict(TagStat.objects.filter(post_count__gt=0).values_list('tag__slug', 'post_count'))
+        if retagged or not previous:
+            # Tag counts changed, and every list page shows them in the cloud.
+            self.export_list(PostListView, reverse('home'), len(ordered))
+            for slug in set(previous.get('tags', {})) - set(tag_counts):
+                shutil.rmtree(self.path_for(reverse('post-by-tag', kwargs={'tag_slug': slug})),
+                              ignore_errors=True)
+            for slug, count in tag_counts.items():
+                self.export_list(PostByTagListView, reverse('post-by-tag', kwargs={'tag_slug': slug}),
+                                 count, tag_slug=slug)
+            self.export_list(TagListView, reverse('tag-list'), len(tag_counts))
+        else:
+            per_page = PostListView.paginate_by
+            position = {pk: index for index, pk in enumerate(ordered)}
+            home_pages = {position[pk] // per_page + 1 for pk in changed_lists}
+            self.export_list(PostListView, reverse('home'), len(ordered), pages=home_pages)
+            for slug in {slug for pk in changed_lists for slug in posts[pk]['tags']}:
+                self.export_list(PostByTagListView, reverse('post-by-tag', kwargs={'tag_slug': slug}),
+                                 tag_counts.get(slug, 0), tag_slug=slug)
+
+        self.save_manifest({'version': MANIFEST_VERSION, 'posts': posts, 'tags': tag_counts})
+        self.stdout.write(self.style.SUCCESS('Rendered %d pages to %s in %.1fs.' % (
+            self.rendered, self.output, time.perf_counter() - started,
+        )))
+
+    def load_manifest(self):
+        try:
+            with open(os.path.join(self.output, MANIFEST_NAME)) as manifest:
+                data = json.load(manifest)
+        except (OSError, ValueError):
+            return {}
+        return data if data.get('version') == MANIFEST_VERSION else {}
+
+    def save_manifest(self, data):
+        os.makedirs(self.output, exist_ok=True)
+        path = os.path.join(self.output, MANIFEST_NAME)
+        with open(path + '.tmp', 'w') as manifest:
+            json.dump(data, manifest)
+        os.replace(path + '.tmp', path)
+
+    def post_state(self):
+        """
+        Fingerprint every post with two queries, whatever the number of posts.
+        """
+        tags = {}
+        for post_id, slug in TaggedItem.objects.filter(
+            content_type=ContentType.objects.get_for_model(Post),
+        ).values_list('object_id', 'tag__slug'):
+            tags.setdefault(str(post_id), []).append(slug)
+
+        state = {}
+        rows = Post.objects.published().annotate(
+            comment_count=Count('comments'), last_comment=Max('comments__updated_at'),
+        ).values_list('pk', 'updated_at', 'comment_count', 'last_comment')
+        for pk, updated_at, comment_count, last_comment in rows.iterator():
+            pk = str(pk)
+            post_tags = sorted(tags.get(pk, []))
+            state[pk] = {
+                'detail': '%s|%d|%s' % (updated_at.isoformat(), comment_count,
+                                        last_comment.isoformat() if last_comment else ''),
+                'list': '%s|%s' % (updated_at.isoformat(), ','.join(post_tags)),
+                'tags': post_tags,
+            }
+        return state
+
+    def path_for(self, url):
+        return os.path.join(self.output, url.lstrip('/'))
+
+    def write(self, url, html):
+        directory = self.path_for(url)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, 'index.html')
+        with open(path + '.tmp', 'w', encoding='utf-8') as page:
+            page.write(html)
+        os.replace(path + '.tmp', path)
+        self.rendered += 1
+
+    def render(self, view_class, url, params, **kwargs):
+        request = self.factory.get(url, params)
+        request.user = AnonymousUser()
+        initkwargs = {'count_views': False} if view_class is PostDetailView else {}
+        response = view_class.as_view(**initkwargs)(request, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response.content.decode(response.charset)
+
+    def export_post(self, pk):
+        url = reverse('post-detail', kwargs={'pk': pk})
+        self.write(url, rewrite_links(self.render(PostDetailView, url, {}, pk=pk), url))
+        # The keys the detail page's "More comments" links will point at.
+        per_page = PostDetailView.comments_paginate_by
+        paths = list(Comment.objects.filter(post_id=pk).order_by('path').values_list('path', flat=True))
+        shutil.rmtree(os.path.join(self.path_for(url), 'after'), ignore_errors=True)
+        for after in paths[per_page - 1:-1:per_page]:
+            html = self.render(PostDetailView, url, {'after': after}, pk=pk)
+            self.write('%safter/%s/' % (url, after), rewrite_links(html, url))
+
+    def export_list(self, view_class, url, count, pages=None, **kwargs):
+        """
+        Render the given pages (default all) of a paginated list at url and
+        drop pages beyond the end of the list.
+        """
+        num_pages = max(1, math.ceil(count / view_class.paginate_by))
+        for number in sorted(range(1, num_pages + 1) if pages is None else pages):
+            if number > num_pages:
+                continue
+            page_url = url if number == 1 else '%spage/%d/' % (url, number)
+            html = self.render(view_class, url, {'page': number} if number > 1 else {}, **kwargs)
+            self.write(page_url, rewrite_links(html, url))
+        page_root = os.path.join(self.path_for(url), 'page')
+        if os.path.isdir(page_root):
+            for name in os.listdir(page_root):
+                if not name.isdigit() or int(name) > num_pages:
+                    shutil.rmtree(os.path.join(page_root, name), ignore_errors=True)
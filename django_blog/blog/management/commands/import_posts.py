@@ -0,0 +1,233 @@
+"""
+Bulk import Markdown posts from a directory or an archive.
+
+Each file is a Markdown body with an optional front-matter block:
+
+    ---
+    title: Deploying Django
+    author: alice
+    date: 2021-03-04 10:00
+    tags: [django, deployment]
+    ---
+    The body, in Markdown.
+
+``tags`` may also be a comma separated string or a ``- tag`` list. Missing
+titles fall back to the first heading or the file name, and missing or
+unknown authors to --author.
+
+Files are streamed from a directory (recursively), a .zip or a .tar(.gz)
+archive and imported --batch-size posts at a time: one bulk_create for the
+posts, one query to resolve the batch's tags by slug, one bulk_create for
+the missing tags and one for the tagged items. The search index, tag and
+author statistics and page caches, which the per-row signals normally keep
+up to date, are refreshed once at the end.
+
+    python manage.py import_posts archive.zip --author admin
+"""
+
+import itertools
+import os
+import tarfile
+import time
+import zipfile
+from datetime import datetime
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from taggit.models import Tag, TaggedItem
+
+from blog import author_stats, page_cache, search, tag_stats
+from blog.models import Post
+
+EXTENSIONS = ('.md', '.markdown')
+DATE_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d')
+
+
+def read_sources(source):
+    """
+    Yield (name, bytes) for every Markdown file under source.
+    """
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for filename in sorted(files):
+                if filename.lower().endswith(EXTENSIONS):
+                    path = os.path.join(root, filename)
+                    with open(path, 'rb') as handle:
+                        yield os.path.relpath(path, source), handle.read()
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and info.filename.lower().endswith(EXTENSIONS):
+                    yield info.filename, archive.read(info)
+    elif tarfile.is_tarfile(source):
+        # Stream mode reads the archive front to back without seeking.
+        with tarfile.open(source, 'r|*') as archive:
+            for member in archive:
+                if member.isfile() and member.name.lower().endswith(EXTENSIONS):
+                    yield member.name, archive.extractfile(member).read()
+    else:
+        raise CommandError('%s is not a directory, zip or tar archive.' % source)
+
+
+def parse_list(value):
+    value = value.strip()
+    if value.startswith('[') and value.endswith(']'):
+        value = value[1:-1]
+    return [item.strip().strip('\'"') for item in value.split(',') if item.strip()]
+
+
+def parse_front_matter(text):
+    """
+    Split text into (metadata, body). Only the simple ``key: value`` and
+    ``- item`` forms used for post metadata are understood.
+    """
+    lines = text.split('\n')
+    if not lines or lines[0].strip() != '---':
+        return {}, text
+    metadata = {}
+    key = None
+    for index, line in enumerate(lines[1:], start=1):
+        stripped = line.strip()
+        if stripped in ('---', '...'):
+            return metadata, '\n'.join(lines[index + 1:])
+        if stripped.startswith('- ') and isinstance(metadata.get(key), list):
+            metadata[key].append(stripped[2:].strip().strip('\'"'))
+        elif ':' in stripped and not stripped.startswith('#'):
+            key, value = stripped.split(':', 1)
+            key, value = key.strip().lower(), value.strip()
+            if not value:
+                # A "- item" list may follow on the next lines.
+                metadata[key] = []
+            elif value.startswith('['):
+                metadata[key] = parse_list(value)
+            else:
+                metadata[key] = value.strip('\'"')
+    # No closing marker: treat the whole file as the body.
+    return {}, text
+
+
+def parse_date(value):
+    for date_format in DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+        return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+    return None
+
+
+def parse_post(name, data, encoding):
+    text = data.decode(encoding).replace('\r\n', '\n').lstrip('\ufeff')
+    metadata, body = parse_front_matter(text)
+
+    def scalar(key):
+        value = metadata.get(key) or ''
+        return ', '.join(value) if isinstance(value, list) else value
+
+    title = scalar('title')
+    if not title:
+        heading = next((line for line in body.split('\n') if line.startswith('# ')), None)
+        title = heading[2:].strip() if heading else os.path.splitext(os.path.basename(name))[0]
+    tags = metadata.get('tags') or []
+    if isinstance(tags, str):
+        tags = parse_list(tags)
+    return {
+        'title': title[:200],
+        'content': body.strip('\n'),
+        'author': scalar('author') or None,
+        'date': parse_date(scalar('date')),
+        'tags': [tag[:100] for tag in tags if tag],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Import Markdown posts with front-matter tags from a directory or archive in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Directory, .zip or .tar(.gz) archive of Markdown files.')
+        parser.add_argument('--author', required=True,
+                            help='Username for posts without a known front-matter author.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--encoding', default='utf-8')
+
+    def handle(self, *args, **options):
+        try:
+            self.default_author = User.objects.get(username=options['author'])
+        except User.DoesNotExist:
+            raise CommandError('Unknown user %r.' % options['author'])
+        self.post_type = ContentType.objects.get_for_model(Post)
+        self.slugify = Tag().slugify
+        self.slugs = set()
+        self.usernames = {self.default_author.username}
+        started = time.perf_counter()
+
+        total = 0
+        posts = (parse_post(name, data, options['encoding'])
+                 for name, data in read_sources(options['source']))
+        while True:
+            batch = list(itertools.islice(posts, options['batch_size']))
+            if not batch:
+                break
+            with transaction.atomic():
+                self.import_batch(batch)
+            total += len(batch)
+            self.stdout.write('  posts: %d' % total)
+
+        search.rebuild_index()
+        tag_stats.rebuild()
+        author_stats.rebuild()
+        page_cache.invalidate('posts', 'tags', 'sitemap', *('tag:%s' % slug for slug in self.slugs),
+                              *('author:%s' % username for username in self.usernames))
+        self.stdout.write(self.style.SUCCESS(
+            'Imported %d posts in %.1fs.' % (total, time.perf_counter() - started)
+        ))
+
+    def resolve_authors(self, batch):
+        usernames = {entry['author'] for entry in batch if entry['author']}
+        users = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+        self.usernames.update(users)
+        return [users.get(entry['author'], self.default_author.pk) for entry in batch]
+
+    def resolve_tags(self, batch):
+        """
+        Return {slug: tag id} for every tag in the batch, creating missing tags.
+        """
+        names = {}
+        for entry in batch:
+            for name in entry['tags']:
+                names.setdefault(self.slugify(name), name)
+        tag_ids = dict(Tag.objects.filter(slug__in=names).values_list('slug', 'id'))
+        missing = [slug for slug in names if slug not in tag_ids]
+        if missing:
+            Tag.objects.bulk_create([Tag(name=names[slug], slug=slug) for slug in missing],
+                                    ignore_conflicts=True)
+            tag_ids.update(Tag.objects.filter(slug__in=missing).values_list('slug', 'id'))
+        return tag_ids
+
+    def import_batch(self, batch):
+        authors = self.resolve_authors(batch)
+        now = timezone.now()
+        posts = [
+            Post(title=entry['title'], content=entry['content'], author_id=author,
+                 published_date=entry['date'] or now)
+            for entry, author in zip(batch, authors)
+        ]
+        # bulk_create skips Post.save(), which renders the Markdown.
+        for post in posts:
+            post.render_content()
+        created = Post.objects.bulk_create(posts)
+
+        tag_ids = self.resolve_tags(batch)
+        self.slugs.update(tag_ids)
+        tagged_items = []
+        for post, entry in zip(created, batch):
+            for slug in {self.slugify(name) for name in entry['tags']}:
+                if slug in tag_ids:
+                    tagged_items.append(TaggedItem(
+                        tag_id=tag_ids[slug], content_type=self.post_type, object_id=post.pk,
+                    ))
+        TaggedItem.objects.bulk_create(tagged_items, ignore_conflicts=True)
@@ -0,0 +1,34 @@
+"""
+Publish the scheduled posts that are due (see blog/publishing.py).
+
+Run it from cron, or keep it running next to the web processes so posts
+go live within --interval seconds of their time:
+
+    python manage.py publish_scheduled --loop --interval 30
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog import publishing
+
+
+class Command(BaseCommand):
+    help = 'Publish due scheduled posts in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Posts published per batch, default PUBLISH_BATCH_SIZE.')
+        parser.add_argument('--loop', action='store_true', help='Keep publishing until interrupted.')
+        parser.add_argument('--interval', type=float, default=30.0,
+                            help='Seconds between checks with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            published = publishing.publish_all_due(batch_size=options['batch_size'])
+            if published or not options['loop']:
+                self.stdout.write(self.style.SUCCESS('Published %d scheduled posts.' % published))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
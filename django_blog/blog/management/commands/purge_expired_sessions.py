@@ -0,0 +1,41 @@
+"""
+Delete expired database sessions in bounded batches (see
+django_blog/sessions.py), so the sessions table is never locked for long.
+
+Run it from cron, or keep it running next to the web processes:
+
+    python manage.py purge_expired_sessions --loop --interval 300
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from django_blog.sessions import SessionStore
+
+
+class Command(BaseCommand):
+    help = 'Delete expired sessions in small batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Rows deleted per query, default SESSION_CLEANUP_BATCH_SIZE.')
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Seconds to sleep between batches.')
+        parser.add_argument('--loop', action='store_true', help='Keep purging until interrupted.')
+        parser.add_argument('--interval', type=float, default=300.0,
+                            help='Seconds between runs with --loop.')
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE != SessionStore.__module__:
+            raise CommandError('SESSION_ENGINE is %r; use clearsessions instead.' % settings.SESSION_ENGINE)
+        while True:
+            started = time.perf_counter()
+            deleted = SessionStore.clear_expired(options['batch_size'], options['pause'])
+            self.stdout.write(self.style.SUCCESS('Deleted %d expired sessions in %.1fs.' % (
+                deleted, time.perf_counter() - started,
+            )))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,19 @@
+"""
+Recompute the per-author post and comment counts in AuthorStat.
+
+The signal handlers in blog/signals.py keep the counts current for normal
+edits; run this after bulk loads or raw SQL that bypass them.
+"""
+
+from django.core.management.base import BaseCommand
+
+from blog import author_stats
+from blog.models import AuthorStat
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized per-author post and comment counts.'
+
+    def handle(self, *args, **options):
+        author_stats.rebuild()
+        self.stdout.write(self.style.SUCCESS('Rebuilt statistics for %d authors.' % AuthorStat.objects.count()))
@@ -0,0 +1,28 @@
+"""
+Repopulate the full-text search index from the blog_post table.
+
+The signal handlers in blog/signals.py keep the index current for normal
+edits; run this after bulk loads or raw SQL that bypass them.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from blog.search import create_index, get_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for blog posts.'
+
+    def handle(self, *args, **options):
+        if get_backend() is None:
+            self.stdout.write('No search index for the %s backend.' % connection.vendor)
+            return
+        started = time.perf_counter()
+        with transaction.atomic():
+            create_index(connection)
+        self.stdout.write(self.style.SUCCESS(
+            'Rebuilt search index in %.1fs.' % (time.perf_counter() - started)
+        ))
@@ -0,0 +1,19 @@
+"""
+Recompute the per-tag post counts in TagStat from taggit's TaggedItem.
+
+The signal handlers in blog/signals.py keep the counts current for normal
+edits; run this after bulk loads or raw SQL that bypass them.
+"""
+
+from django.core.management.base import BaseCommand
+
+from blog import tag_stats
+from blog.models import TagStat
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized tag statistics used by the tag cloud.'
+
+    def handle(self, *args, **options):
+        tag_stats.rebuild()
+        self.stdout.write(self.style.SUCCESS('Rebuilt statistics for %d tags.' % TagStat.objects.count()))
@@ -0,0 +1,51 @@
+"""
+Re-render Post.content_html and Post.excerpt from the Markdown content.
+
+Saves keep the columns current; run this after changing the renderer
+(bump blog.rendering.RENDERER_VERSION) or after writing content with raw
+SQL. Only posts whose content hash is out of date are rendered unless
+--force is given.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from blog import page_cache
+from blog.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Re-render the stored HTML and excerpts of blog posts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Render every post, even if its hash is current.')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        rendered = 0
+        last_id = 0
+        fields = ['content_html', 'excerpt', 'content_hash', 'updated_at']
+        while True:
+            posts = list(
+                Post.objects.filter(pk__gt=last_id).order_by('pk')
+                .only('id', 'content', 'content_hash')[:options['batch_size']]
+            )
+            if not posts:
+                break
+            last_id = posts[-1].pk
+            now = timezone.now()
+            changed = []
+            for post in posts:
+                if post.render_content(force=options['force']):
+                    # Marks the post changed for export_static.
+                    post.updated_at = now
+                    changed.append(post)
+            with transaction.atomic():
+                Post.objects.bulk_update(changed, fields)
+            page_cache.invalidate(*('post:%d' % post.pk for post in changed))
+            rendered += len(changed)
+        if rendered:
+            page_cache.invalidate('posts', 'tags')
+        self.stdout.write(self.style.SUCCESS('Rendered %d posts.' % rendered))
@@ -0,0 +1,163 @@
+"""
+Seed the database with synthetic users, posts, tags and comments.
+
+Post authorship follows a power law and tags are drawn from a Zipfian
+vocabulary so a few tags cover most posts, like a real blog. Rows are
+inserted with bulk_create in batches, each batch in its own transaction,
+and taggit's TaggedItem through rows are inserted directly instead of
+going through post.tags.add().
+
+    python manage.py seed --users 1000 --posts 100000 --tags 500 --comments 1000000
+"""
+
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.text import slugify
+from taggit.models import Tag, TaggedItem
+
+from blog.models import Post, Comment
+from blog import author_stats, tag_stats
+from blog.search import rebuild_index
+from django_blog.seeding import zipf_cum_weights, power_law_degree, sample_distinct, batched
+
+WORDS = (
+    'django python web blog post tag comment template view model query index '
+    'cache page author static form test deploy release design code data api '
+    'search feed performance database migration server client request response'
+).split()
+
+
+def sentence(words):
+    return ' '.join(random.choices(WORDS, k=words)).capitalize()
+
+
+def rendered(post):
+    # bulk_create skips Post.save(), which renders the body.
+    post.render_content()
+    return post
+
+
+class Command(BaseCommand):
+    help = 'Seed the database with synthetic blog data for benchmarking.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--tags', type=int, default=200,
+                            help='Size of the tag vocabulary.')
+        parser.add_argument('--tags-per-post', type=int, default=3,
+                            help='Mean number of tags per post.')
+        parser.add_argument('--comments', type=int, default=20000,
+                            help='Approximate number of comments.')
+        parser.add_argument('--prefix', default='seed',
+                            help='Username prefix; users are named <prefix>_<n>.')
+        parser.add_argument('--password', default='password123',
+                            help='Password set on every seeded user.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--random-seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        random.seed(options['random_seed'])
+        self.batch_size = options['batch_size']
+        started = time.perf_counter()
+
+        user_ids = self.create_users(options['users'], options['prefix'], options['password'])
+        random.shuffle(user_ids)
+        user_weights = zipf_cum_weights(len(user_ids))
+
+        tag_ids = self.create_tags(options['tags'])
+        post_ids = self.create_posts(user_ids, user_weights, options['posts'])
+        self.tag_posts(post_ids, tag_ids, options['tags_per_post'])
+        self.create_comments(user_ids, user_weights, post_ids, options['comments'])
+        # bulk_create skips the signals that keep the search index and counts current.
+        rebuild_index()
+        tag_stats.rebuild()
+        author_stats.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(
+            'Seeded in %.1fs.' % (time.perf_counter() - started)
+        ))
+
+    def insert(self, model, items, build, label, **kwargs):
+        """
+        Insert model rows built from items in batches, one transaction per batch.
+        """
+        count = 0
+        for batch in batched(items, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(build(batch), batch_size=self.batch_size, **kwargs)
+            count += len(batch)
+        self.stdout.write('  %s: %d' % (label, count))
+        return count
+
+    def create_users(self, count, prefix, password):
+        # Hashing is deliberately slow, so every seeded user shares one hash.
+        password_hash = make_password(password)
+        start = User.objects.filter(username__startswith=prefix + '_').count()
+        self.insert(User, range(start, start + count), lambda batch: [
+            User(
+                username='%s_%d' % (prefix, i),
+                email='%s_%d@example.com' % (prefix, i),
+                password=password_hash,
+            )
+            for i in batch
+        ], 'users')
+        return list(
+            User.objects.filter(username__startswith=prefix + '_').values_list('id', flat=True)
+        )
+
+    def create_tags(self, count):
+        names = ['%s-%d' % (random.choice(WORDS), i) for i in range(count)]
+        self.insert(Tag, names, lambda batch: [
+            Tag(name=name, slug=slugify(name)) for name in batch
+        ], 'tags', ignore_conflicts=True)
+        # Ordered by id so the Zipf head is the same tags on every run.
+        return list(Tag.objects.filter(name__in=names).order_by('id').values_list('id', flat=True))
+
+    def create_posts(self, user_ids, user_weights, total):
+        authors = random.choices(user_ids, cum_weights=user_weights, k=total)
+        last_id = Post.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        self.insert(Post, authors, lambda batch: [
+            rendered(Post(author_id=author, title=sentence(6), content=sentence(random.randint(50, 400))))
+            for author in batch
+        ], 'posts')
+        return list(Post.objects.filter(id__gt=last_id).values_list('id', flat=True))
+
+    def tag_posts(self, post_ids, tag_ids, mean):
+        if not tag_ids:
+            return
+        post_type = ContentType.objects.get_for_model(Post)
+        tag_weights = zipf_cum_weights(len(tag_ids))
+        pairs = (
+            (post_id, tag_id)
+            for post_id in post_ids
+            for tag_id in sample_distinct(
+                tag_ids, tag_weights, max(1, power_law_degree(mean, len(tag_ids)))
+            )
+        )
+        self.insert(TaggedItem, pairs, lambda batch: [
+            TaggedItem(tag_id=tag_id, content_type=post_type, object_id=post_id)
+            for post_id, tag_id in batch
+        ], 'tagged items', ignore_conflicts=True)
+
+    def create_comments(self, user_ids, user_weights, post_ids, total):
+        if not post_ids:
+            return
+        # A few hot posts collect most of the comments.
+        post_weights = zipf_cum_weights(len(post_ids), s=0.9)
+        posts = random.choices(post_ids, cum_weights=post_weights, k=total)
+        self.insert(Comment, posts, lambda batch: [
+            Comment(
+                post_id=post_id,
+                author_id=random.choices(user_ids, cum_weights=user_weights)[0],
+                content=sentence(random.randint(5, 40)),
+            )
+            for post_id in batch
+        ], 'comments')
+        Comment.objects.fill_paths()
@@ -0,0 +1,61 @@
+"""
+Render the most read pages into the page cache ahead of traffic.
+
+Warms the first --list-pages pages of the home list and the detail pages
+of the --top posts with the most comments, as an anonymous visitor would
+see them. Run it after a deploy or a cache flush:
+
+    python manage.py warm_page_cache --top 100
+"""
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.http import Http404
+from django.test import RequestFactory
+from django.urls import reverse
+
+from blog.models import Post
+from blog.views import PostDetailView, PostListView
+
+
+class Command(BaseCommand):
+    help = 'Pre-render the home list and the most commented posts into the page cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=100,
+                            help='Number of most commented posts to warm.')
+        parser.add_argument('--list-pages', type=int, default=1,
+                            help='Number of home list pages to warm.')
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        list_view = PostListView.as_view()
+        detail_view = PostDetailView.as_view(count_views=False)
+        warmed = 0
+
+        for page in range(1, options['list_pages'] + 1):
+            if self.warm(factory, list_view, reverse('home'), {'page': page} if page > 1 else {}):
+                warmed += 1
+
+        post_ids = (
+            Post.objects.published().annotate(comment_count=Count('comments'))
+            .order_by('-comment_count', '-published_date')
+            .values_list('pk', flat=True)[:options['top']]
+        )
+        for pk in post_ids:
+            if self.warm(factory, detail_view, reverse('post-detail', kwargs={'pk': pk}), {}, pk=pk):
+                warmed += 1
+
+        self.stdout.write(self.style.SUCCESS('Warmed %d pages.' % warmed))
+
+    def warm(self, factory, view, path, params, **kwargs):
+        request = factory.get(path, params)
+        request.user = AnonymousUser()
+        try:
+            response = view(request, **kwargs)
+        except Http404:
+            return False
+        if hasattr(response, 'render'):
+            response.render()
+        return response.status_code == 200
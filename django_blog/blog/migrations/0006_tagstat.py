@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+
+
+def backfill_tag_stats(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    TaggedItem = apps.get_model('taggit', 'TaggedItem')
+    Post = apps.get_model('blog', 'Post')
+    TagStat = apps.get_model('blog', 'TagStat')
+    post_type = ContentType.objects.filter(app_label='blog', model='post').first()
+    if post_type is None:
+        return
+    latest_post = Post.objects.filter(pk=OuterRef('object_id')).values('published_date')
+    rows = (
+        TaggedItem.objects.filter(content_type=post_type)
+        .values('tag_id')
+        .annotate(post_count=Count('id'), last_used=Max(Subquery(latest_post)))
+    )
+    TagStat.objects.bulk_create([TagStat(**row) for row in rows.iterator()], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_post_search_index'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagStat',
+            fields=[
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stat', serialize=False, to='taggit.tag')),
+                ('post_count', models.PositiveIntegerField(db_index=True, default=0)),
+                ('last_used', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_tag_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:35
+
+from django.db import migrations, models
+
+from blog import rendering
+
+
+def render_posts(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    batch = []
+    for post in Post.objects.only('id', 'content').iterator(chunk_size=500):
+        post.content_html, post.excerpt = rendering.render(post.content)
+        post.content_hash = rendering.content_hash(post.content)
+        batch.append(post)
+        if len(batch) == 500:
+            Post.objects.bulk_update(batch, ['content_html', 'excerpt', 'content_hash'])
+            batch = []
+    Post.objects.bulk_update(batch, ['content_html', 'excerpt', 'content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_post_published_date_comment_created_at_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='content_html',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(render_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_author_stats(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    Comment = apps.get_model('blog', 'Comment')
+    AuthorStat = apps.get_model('blog', 'AuthorStat')
+
+    def counts(model):
+        return dict(model.objects.order_by().values('author_id').annotate(total=Count('pk'))
+                    .values_list('author_id', 'total'))
+
+    posts, comments = counts(Post), counts(Comment)
+    AuthorStat.objects.bulk_create([
+        AuthorStat(user_id=user_id, post_count=posts.get(user_id, 0),
+                   comment_count=comments.get(user_id, 0))
+        for user_id in posts.keys() | comments.keys()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('blog', '0011_related_posts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStat',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='author_stat', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('post_count', models.PositiveIntegerField(default=0)),
+                ('comment_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'published_date'], name='blog_post_author_published_idx'),
+        ),
+        migrations.RunPython(backfill_author_stats, migrations.RunPython.noop),
+    ]
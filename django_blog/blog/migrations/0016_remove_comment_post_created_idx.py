@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:14
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0015_post_images'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='blog_comment_post_created_idx',
+        ),
+    ]
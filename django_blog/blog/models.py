@@ -1,27 +1,249 @@
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Cast, LPad
 from django.contrib.auth.models import User
+from django.utils import timezone
 from taggit.managers import TaggableManager
+from taggit.models import Tag
+from . import images, rendering
+
+class PostQuerySet(models.QuerySet):
+    def published(self):
+        """
+        Posts readers can see. Public list queries start here, so they match
+        the condition of the partial indexes on Post.
+        """
+        return self.filter(status=Post.Status.PUBLISHED)
+
+    def due(self, now=None):
+        """
+        Scheduled posts whose publication time has come.
+        """
+        return self.filter(status=Post.Status.SCHEDULED, published_date__lte=now or timezone.now())
+
 
 class Post(models.Model):
+    class Status(models.TextChoices):
+        DRAFT = 'draft', 'Draft'
+        # Published by publish_scheduled once published_date has passed.
+        SCHEDULED = 'scheduled', 'Scheduled'
+        PUBLISHED = 'published', 'Published'
+
     title = models.CharField(max_length=200)
     content = models.TextField()
-    published_date = models.DateTimeField(auto_now_add=True)
+    # Rendered from content on save by blog.rendering.
+    content_html = models.TextField(blank=True, default='', editable=False)
+    excerpt = models.TextField(blank=True, default='', editable=False)
+    content_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PUBLISHED)
+    # When the post went or goes live; set when it is published or scheduled.
+    published_date = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    # When compute_related_posts last refreshed this post's RelatedPost rows.
+    related_computed_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Written in batches by blog.view_counts; read the live count from there.
+    view_count = models.PositiveBigIntegerField(default=0, editable=False)
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     tags = TaggableManager()
 
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        # Partial indexes: drafts and scheduled posts stay out of the list scans.
+        indexes = [
+            # The home page, tag pages and feeds all sort by -published_date.
+            models.Index(fields=['published_date'], name='blog_post_live_idx',
+                         condition=models.Q(status='published')),
+            # Author archive pages filter by author and sort or range by date.
+            models.Index(fields=['author', 'published_date'], name='blog_post_author_live_idx',
+                         condition=models.Q(status='published')),
+            # publish_scheduled looks for the scheduled posts that are due.
+            models.Index(fields=['published_date'], name='blog_post_scheduled_idx',
+                         condition=models.Q(status='scheduled')),
+        ]
+
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'status' in instance.__dict__:
+            instance._saved_status = instance.status
+        if 'title' in instance.__dict__:
+            instance._saved_title = instance.title
+        return instance
+
+    def save(self, *args, **kwargs):
+        if self.render_content() and kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'content_html', 'excerpt', 'content_hash'}
+        super().save(*args, **kwargs)
+        # After the save signals, which compare them with the fields to spot
+        # publishing and retitling.
+        self._saved_status = self.status
+        self._saved_title = self.title
+
+    def was_published(self):
+        """
+        Whether the post was published when last loaded or saved, and so is
+        counted in the tag and author stats.
+        """
+        if hasattr(self, '_saved_status'):
+            return self._saved_status == self.Status.PUBLISHED
+        # A new post, or one loaded without its status (left unchanged then).
+        return not self._state.adding and self.status == self.Status.PUBLISHED
+
+    def is_published(self):
+        return self.status == self.Status.PUBLISHED
+
+    def title_changed(self):
+        """
+        Whether the title differs from when the post was last loaded or
+        saved, or that is not known.
+        """
+        return getattr(self, '_saved_title', None) != self.title
+
+    def render_content(self, force=False):
+        """
+        Render content into content_html and excerpt unless it is unchanged
+        since the last render. Returns whether it rendered.
+        """
+        content_hash = rendering.content_hash(self.content)
+        if content_hash == self.content_hash and not force:
+            return False
+        self.content_html, self.excerpt = rendering.render(self.content)
+        self.content_hash = content_hash
+        return True
+
     def get_absolute_url(self):
         from django.urls import reverse
         return reverse('post-detail', kwargs={'pk': self.pk})
 
+# Each comment's path is its ancestors' ids and its own, zero padded to
+# PATH_STEP digits each, so ordering by path lists threads depth first and
+# a subtree is the range of paths starting with its root's path.
+PATH_STEP = 10
+MAX_DEPTH = 10
+
+
+def path_segment(pk):
+    return str(pk).zfill(PATH_STEP)
+
+
+class CommentQuerySet(models.QuerySet):
+    def fill_paths(self):
+        """
+        Set the path of top-level comments created without one, e.g. by
+        bulk_create.
+        """
+        return self.filter(path='', parent__isnull=True).update(
+            path=LPad(Cast('id', models.CharField()), PATH_STEP, Value('0')),
+        )
+
+
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
     author = models.ForeignKey(User, on_delete=models.CASCADE)
+    parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='replies')
     content = models.TextField()
+    path = models.CharField(max_length=255, default='', editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CommentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'path']),
+        ]
+
     def __str__(self):
         return f'Comment by {self.author} on {self.post}'
+
+    def save(self, *args, **kwargs):
+        creating = self._state.adding and not self.path
+        if creating:
+            # Replies past MAX_DEPTH join their parent's thread instead.
+            while self.parent is not None and self.parent.depth >= MAX_DEPTH:
+                self.parent = self.parent.parent
+        super().save(*args, **kwargs)
+        if creating:
+            # The path needs the new id, so it is written straight after the insert.
+            self.path = (self.parent.path if self.parent else '') + path_segment(self.pk)
+            self.depth = len(self.path) // PATH_STEP - 1
+            Comment.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+
+    def subtree(self):
+        """
+        This comment and all its replies, as one range scan of the
+        (post, path) index.
+        """
+        # '~' sorts after every digit, so it bounds all paths below this one.
+        return Comment.objects.filter(post_id=self.post_id, path__gte=self.path, path__lt=self.path + '~')
+
+class TagStat(models.Model):
+    """
+    Materialized post count per tag, maintained by blog.tag_stats.
+    """
+    tag = models.OneToOneField(Tag, on_delete=models.CASCADE, primary_key=True, related_name='stat')
+    post_count = models.PositiveIntegerField(default=0, db_index=True)
+    last_used = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.tag} ({self.post_count})'
+
+
+class AuthorStat(models.Model):
+    """
+    Materialized post and comment counts per user, maintained by blog.author_stats.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='author_stat')
+    post_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.user} ({self.post_count} posts, {self.comment_count} comments)'
+
+
+class RelatedPost(models.Model):
+    """
+    One of the top related posts of a post, maintained by compute_related_posts.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='related_links')
+    related = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'rank'], name='blog_relatedpost_post_rank_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.related} related to {self.post} ({self.score:.2f})'
+
+
+class PostImage(models.Model):
+    """
+    An image attached to a post, shown in responsive sizes by blog.images.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='images')
+    image = models.ImageField(upload_to='post_images/%Y/%m/')
+    alt = models.CharField(max_length=200, blank=True)
+    # As displayed, after any EXIF rotation; set on save.
+    width = models.PositiveIntegerField(default=0, editable=False)
+    height = models.PositiveIntegerField(default=0, editable=False)
+    position = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['post', 'position'])]
+
+    def __str__(self):
+        return f'{self.image.name} on {self.post}'
+
+    def save(self, *args, **kwargs):
+        if self.image and not self.width:
+            self.width, self.height = images.dimensions(self.image)
+        super().save(*args, **kwargs)
@@ -0,0 +1,115 @@
+"""
+Page and fragment caching for the post list, tag and detail views.
+
+Each cached page depends on a few namespaces: ``post:<pk>`` for a post's
+detail page, ``posts`` for the home list, ``tag:<slug>`` for a tag's list
+and ``tags`` for anything showing the tag cloud. Every namespace has a
+generation token in the cache and cache keys include the tokens of the
+namespaces they depend on, so invalidating a namespace (see blog/signals.py)
+only orphans the pages that actually show the changed data. A new comment
+invalidates one detail page, not the whole site. The tokens live in the
+default cache, so an invalidation reaches every worker process only when
+that cache is shared between them (REDIS_URL in settings).
+
+Anonymous visitors get the whole rendered page from the cache. Logged in
+users see per-user links, so they get the page rendered fresh around
+cached fragments instead (the ``{% cache %}`` blocks in the templates,
+keyed on ``page_cache_generation``).
+
+Settings:
+    BLOG_PAGE_CACHE_TIMEOUT  seconds to keep pages and fragments, default 600
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+
+GENERATION_PREFIX = 'blog:generation:'
+PAGE_PREFIX = 'blog:page:'
+
+
+def get_timeout():
+    return getattr(settings, 'BLOG_PAGE_CACHE_TIMEOUT', 600)
+
+
+def generation(namespaces):
+    """
+    Return a string identifying the current generation of the namespaces.
+    """
+    keys = [GENERATION_PREFIX + namespace for namespace in namespaces]
+    tokens = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in tokens}
+    if missing:
+        # An evicted token must not fall back to an old value, so start anew.
+        cache.set_many(missing, None)
+        tokens.update(missing)
+    return '|'.join('%s=%s' % (namespace, tokens[key]) for namespace, key in zip(namespaces, keys))
+
+
+def _bump(namespaces):
+    token = time.time_ns()
+    cache.set_many({GENERATION_PREFIX + namespace: token for namespace in namespaces}, None)
+
+
+def invalidate(*namespaces):
+    """
+    Orphan every page and fragment cached for the given namespaces.
+
+    The bump is repeated once the current transaction commits, so a request
+    that read the old rows in the meantime cannot cache them for long.
+    """
+    if not namespaces:
+        return
+    _bump(namespaces)
+    transaction.on_commit(lambda: _bump(namespaces))
+
+
+def page_key(request, page_generation):
+    digest = hashlib.md5(
+        ('%s %s' % (page_generation, request.get_full_path())).encode(), usedforsecurity=False,
+    ).hexdigest()
+    return PAGE_PREFIX + digest
+
+
+class PageCacheMixin:
+    """
+    Cache whole pages for anonymous GET requests and expose the generation
+    to templates for fragment caching.
+
+    page_cache_namespaces are formatted with the URL kwargs, e.g. 'post:{pk}'.
+    """
+    page_cache_namespaces = ()
+
+    def get_page_cache_namespaces(self):
+        return [namespace.format(**self.kwargs) for namespace in self.page_cache_namespaces]
+
+    def dispatch(self, request, *args, **kwargs):
+        self.page_cache_generation = generation(self.get_page_cache_namespaces())
+        if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+            return super().dispatch(request, *args, **kwargs)
+
+        key = page_key(request, self.page_cache_generation)
+        cached = cache.get(key)
+        if cached is not None:
+            content_type, content = cached
+            return HttpResponse(content, content_type=content_type)
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and not response.cookies:
+            def store(response):
+                cache.set(key, (response['Content-Type'], response.content), get_timeout())
+            if getattr(response, 'is_rendered', True):
+                store(response)
+            else:
+                response.add_post_render_callback(store)
+        return response
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['page_cache_generation'] = self.page_cache_generation
+        context['page_cache_timeout'] = get_timeout()
+        return context
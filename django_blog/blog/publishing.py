@@ -0,0 +1,98 @@
+"""
+Scheduled publishing.
+
+A post is a draft, scheduled or published (Post.Status), and readers only
+ever see published posts: every public query starts from
+Post.objects.published(), whose filter is the condition of the partial
+indexes on Post, so drafts and scheduled posts never enter the list scans.
+
+A scheduled post's published_date is the time it goes live.
+``manage.py publish_scheduled --loop`` calls publish_due() every few
+seconds, which publishes the due posts PUBLISH_BATCH_SIZE at a time with a
+single UPDATE per batch. update() sends no signals, so publish_due() does
+the work of the Post save handlers in blog/signals.py itself, once per
+batch: the tag and author counts, the search index, one invalidation of
+the page cache (home, tag and author lists, their feeds, the posts'
+detail pages and the sitemaps) and one of the autocomplete indexes.
+
+Settings:
+    PUBLISH_BATCH_SIZE  posts published per batch, default 100
+"""
+
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from taggit.models import TaggedItem
+
+from . import author_stats, autocomplete, page_cache, search, sitemaps, tag_stats
+from .models import Post
+
+
+def get_batch_size():
+    return getattr(settings, 'PUBLISH_BATCH_SIZE', 100)
+
+
+def publish_due(now=None, batch_size=None):
+    """
+    Publish one batch of the scheduled posts due by now, the earliest
+    first. Returns the published posts.
+    """
+    batch_size = batch_size or get_batch_size()
+    with transaction.atomic():
+        # skip_locked lets several publishers share the work where the
+        # database supports it.
+        posts = list(Post.objects.due(now).select_for_update(skip_locked=True)
+                     .only('pk', 'title', 'content', 'author_id', 'status')
+                     .order_by('published_date', 'pk')[:batch_size])
+        if not posts:
+            return []
+        post_ids = [post.pk for post in posts]
+        # The posts enter the related posts corpus on the next compute_related_posts.
+        Post.objects.filter(pk__in=post_ids).update(status=Post.Status.PUBLISHED, related_computed_at=None)
+
+        tagged = defaultdict(list)
+        tag_counts = Counter()
+        for post_id, tag_id, name, slug in TaggedItem.objects.filter(
+            content_type=ContentType.objects.get_for_model(Post), object_id__in=post_ids,
+        ).values_list('object_id', 'tag_id', 'tag__name', 'tag__slug'):
+            tagged[post_id].append((name, slug))
+            tag_counts[tag_id] += 1
+        tags_by_count = defaultdict(list)
+        for tag_id, count in tag_counts.items():
+            tags_by_count[count].append(tag_id)
+        for count, tag_ids in tags_by_count.items():
+            tag_stats.add_posts(tag_ids, count=count)
+        for author_id, count in Counter(post.author_id for post in posts).items():
+            author_stats.adjust(author_id, 'post_count', count)
+
+        for post in posts:
+            post.status = Post.Status.PUBLISHED
+            search.index_post(post, tags=[name for name, slug in tagged[post.pk]])
+
+    usernames = User.objects.filter(pk__in={post.author_id for post in posts}).values_list('username', flat=True)
+    page_cache.invalidate(
+        'posts', 'tags',
+        *('post:%d' % post_id for post_id in post_ids),
+        *('author:%s' % username for username in usernames),
+        *{'tag:%s' % slug for tags in tagged.values() for name, slug in tags},
+        *sitemaps.namespaces('posts', *post_ids),
+        *sitemaps.namespaces('tags', *tag_counts),
+    )
+    autocomplete.invalidate()
+    return posts
+
+
+def publish_all_due(now=None, batch_size=None):
+    """
+    Publish batches until no scheduled post is due. Returns how many were published.
+    """
+    batch_size = batch_size or get_batch_size()
+    published = 0
+    while True:
+        batch = publish_due(now, batch_size)
+        published += len(batch)
+        if len(batch) < batch_size:
+            return published
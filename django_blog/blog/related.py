@@ -0,0 +1,175 @@
+"""
+Related posts, computed offline.
+
+Two posts are related by a weighted sum of the Jaccard overlap of their
+tag sets and the cosine similarity of their TF-IDF vectors (title words
+count twice). ``manage.py compute_related_posts`` stores the top K
+related posts of each post in the RelatedPost table, so the detail page
+reads them with one indexed query instead of self-joining taggit's tables
+per request.
+
+With NumPy and SciPy installed the similarities are computed as sparse
+matrix products, a chunk of posts at a time; without them a pure Python
+inverted index gives the same scores, only slower.
+
+Refreshes are incremental. A post needs recomputing when it has never been
+computed, was edited since (updated_at) or was retagged or had a related
+post deleted (the signals in blog/signals.py clear related_computed_at).
+Besides those posts, any post whose stored list a changed post now enters
+or leaves is recomputed too. Document frequencies still drift as posts
+change, so run with --full now and then.
+"""
+
+import math
+import re
+from collections import Counter, defaultdict
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = sparse = None
+
+TOKEN_RE = re.compile(r'[^\W\d_]{3,}', re.UNICODE)
+STOP_WORDS = frozenset((
+    'about after all also and any are because been but can could did does for from had has '
+    'have her his how its into just more most not now one only other our out over she some '
+    'such than that the their them then there these they this those through very was were '
+    'what when where which while who will with would you your'
+).split())
+
+
+def tokenize(text):
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOP_WORDS]
+
+
+class Corpus:
+    """
+    Tag sets and TF-IDF weights of every post, and their pairwise scores.
+
+    posts is an iterable of (post id, title, content) and tags an iterable
+    of (post id, tag id).
+    """
+
+    def __init__(self, posts, tags, tag_weight=0.5, max_df=0.5):
+        self.tag_weight = tag_weight
+        self.ids = []
+        counts = []
+        for post_id, title, content in posts:
+            self.ids.append(post_id)
+            counts.append(Counter(tokenize(title) * 2 + tokenize(content)))
+        self.row = {post_id: row for row, post_id in enumerate(self.ids)}
+
+        self.tags = [set() for _ in self.ids]
+        for post_id, tag_id in tags:
+            if post_id in self.row:
+                self.tags[self.row[post_id]].add(tag_id)
+
+        document_frequency = Counter(term for terms in counts for term in terms)
+        total = len(self.ids)
+        # Terms in one post relate nothing, terms in most posts relate everything.
+        self.idf = {
+            term: math.log((1 + total) / (1 + frequency)) + 1
+            for term, frequency in document_frequency.items()
+            if 1 < frequency <= max(2, max_df * total)
+        }
+        self.vectors = []
+        for terms in counts:
+            vector = {term: (1 + math.log(count)) * self.idf[term]
+                      for term, count in terms.items() if term in self.idf}
+            norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+            self.vectors.append({term: weight / norm for term, weight in vector.items()})
+
+        if np is not None:
+            self._build_matrices()
+        else:
+            self._build_index()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _build_matrices(self):
+        columns = {term: column for column, term in enumerate(self.idf)}
+        rows, cols, data = [], [], []
+        for row, vector in enumerate(self.vectors):
+            for term, weight in vector.items():
+                rows.append(row)
+                cols.append(columns[term])
+                data.append(weight)
+        shape = (len(self.ids), len(columns))
+        self.text_matrix = sparse.csr_matrix((data, (rows, cols)), shape=shape, dtype=np.float32)
+        self.text_matrix_t = self.text_matrix.T.tocsr()
+
+        tag_columns = {}
+        rows, cols = [], []
+        for row, tags in enumerate(self.tags):
+            for tag_id in tags:
+                rows.append(row)
+                cols.append(tag_columns.setdefault(tag_id, len(tag_columns)))
+        shape = (len(self.ids), max(1, len(tag_columns)))
+        self.tag_matrix = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=shape,
+        )
+        self.tag_matrix_t = self.tag_matrix.T.tocsr()
+        self.tag_sizes = np.asarray(self.tag_matrix.sum(axis=1), dtype=np.float32).ravel()
+
+    def _build_index(self):
+        self.term_index = defaultdict(list)
+        for row, vector in enumerate(self.vectors):
+            for term, weight in vector.items():
+                self.term_index[term].append((row, weight))
+        self.tag_index = defaultdict(list)
+        for row, tags in enumerate(self.tags):
+            for tag_id in tags:
+                self.tag_index[tag_id].append(row)
+
+    def scores(self, rows, limit=None):
+        """
+        Yield (row, {other row: score}) for the given rows, skipping zeros.
+        With limit, the matrix path keeps only about the limit best scores.
+        """
+        if np is not None:
+            yield from self._matrix_scores(rows, limit)
+        else:
+            yield from self._index_scores(rows)
+
+    def _matrix_scores(self, rows, limit):
+        rows = np.asarray(rows)
+        text = (self.text_matrix[rows] @ self.text_matrix_t).tocsr()
+        overlap = (self.tag_matrix[rows] @ self.tag_matrix_t).tocoo()
+        union = self.tag_sizes[rows[overlap.row]] + self.tag_sizes[overlap.col] - overlap.data
+        jaccard = sparse.csr_matrix(
+            (overlap.data / union, (overlap.row, overlap.col)), shape=text.shape,
+        )
+        combined = (jaccard * self.tag_weight + text * (1 - self.tag_weight)).tocsr()
+        for index, row in enumerate(rows):
+            start, end = combined.indptr[index], combined.indptr[index + 1]
+            indices, data = combined.indices[start:end], combined.data[start:end]
+            if limit is not None and len(data) > limit:
+                best = np.argpartition(-data, limit)[:limit]
+                indices, data = indices[best], data[best]
+            yield int(row), dict(zip(indices.tolist(), data.tolist()))
+
+    def _index_scores(self, rows):
+        for row in rows:
+            text = defaultdict(float)
+            for term, weight in self.vectors[row].items():
+                for other, other_weight in self.term_index[term]:
+                    text[other] += weight * other_weight
+            overlap = Counter(other for tag_id in self.tags[row] for other in self.tag_index[tag_id])
+            combined = {other: score * (1 - self.tag_weight) for other, score in text.items()}
+            for other, shared in overlap.items():
+                union = len(self.tags[row]) + len(self.tags[other]) - shared
+                combined[other] = combined.get(other, 0.0) + self.tag_weight * shared / union
+            yield row, combined
+
+    def top_related(self, rows, k):
+        """
+        Yield (post id, [(related post id, score), ...]) with the k best
+        scores for each of the given rows.
+        """
+        # One extra, since a post always scores highest against itself.
+        for row, scores in self.scores(rows, limit=k + 1):
+            scores.pop(row, None)
+            best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+            yield self.ids[row], [(self.ids[other], score) for other, score in best if score > 0]
@@ -0,0 +1,79 @@
+"""
+Markdown rendering for post bodies.
+
+Posts are rendered once, when they are saved, into Post.content_html and
+Post.excerpt; templates output those columns and do no text processing per
+request. Post.content_hash records what was rendered, so saves that leave
+the content alone skip the work. Bump RENDERER_VERSION when the output of
+render() changes and run ``manage.py render_posts`` to refresh old rows.
+
+Rendering uses the Markdown package when it is installed and falls back to
+escaped text with paragraphs and line breaks otherwise. Raw HTML in the
+source is escaped rather than passed through, and links and images may only
+use http(s), mailto or relative URLs.
+"""
+
+import hashlib
+from html import unescape
+
+from django.utils.html import escape, linebreaks, strip_tags
+from django.utils.text import Truncator
+
+try:
+    import markdown
+    from markdown.extensions import Extension
+    from markdown.treeprocessors import Treeprocessor
+except ImportError:
+    markdown = None
+
+RENDERER_VERSION = 2
+EXCERPT_WORDS = 50
+EXTENSIONS = ['fenced_code', 'tables', 'sane_lists']
+SAFE_SCHEMES = ('http:', 'https:', 'mailto:')
+
+
+def content_hash(content):
+    return hashlib.sha256(('%d:%s' % (RENDERER_VERSION, content)).encode()).hexdigest()
+
+
+def is_safe_url(url):
+    url = url.strip().lower()
+    if ':' not in url.split('/', 1)[0]:
+        return True
+    return url.startswith(SAFE_SCHEMES)
+
+
+if markdown is not None:
+    class SafeURLTreeprocessor(Treeprocessor):
+        def run(self, root):
+            for element in root.iter():
+                for attribute in ('href', 'src'):
+                    if attribute in element.attrib and not is_safe_url(element.attrib[attribute]):
+                        del element.attrib[attribute]
+
+    class SafeExtension(Extension):
+        """
+        Escape raw HTML and drop unsafe link and image URLs.
+        """
+
+        def extendMarkdown(self, md):
+            md.preprocessors.deregister('html_block')
+            md.inlinePatterns.deregister('html')
+            md.treeprocessors.register(SafeURLTreeprocessor(md), 'safe_urls', 0)
+
+
+def render_html(content):
+    if markdown is None:
+        return linebreaks(escape(content))
+    return markdown.markdown(content, extensions=EXTENSIONS + [SafeExtension()])
+
+
+def render(content):
+    """
+    Return (html, excerpt) for a post body.
+    """
+    html = render_html(content)
+    # The excerpt is plain text, escaped by the templates, so entities in the
+    # HTML are decoded rather than escaped a second time.
+    excerpt = Truncator(unescape(strip_tags(html)).replace('\n', ' ')).words(EXCERPT_WORDS)
+    return html, excerpt
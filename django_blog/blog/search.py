@@ -0,0 +1,280 @@
+"""
+Full-text search index for blog posts.
+
+Searching with ``icontains`` across title, content and tag names is a full
+table scan plus a join through taggit on every query. Instead each post
+is mirrored into a side index table that the database can search and rank
+directly:
+
+* SQLite: an FTS5 virtual table ``blog_post_fts`` ranked with bm25().
+* PostgreSQL: a ``blog_post_search`` table with a weighted tsvector column
+  and a GIN index, ranked with ts_rank().
+
+Other databases fall back to the old ``icontains`` query. Every search
+term is matched as a prefix, so "djan" finds "django". Only published
+posts are indexed. The index is kept current by the signal handlers in blog/signals.py; ``manage.py
+rebuild_search_index`` repopulates it after bulk loads.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Post
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+# Relative weight of matches in each column: title, tags, content.
+TITLE_WEIGHT, TAGS_WEIGHT, CONTENT_WEIGHT = 10.0, 5.0, 1.0
+
+
+def _post_tags_sql(aggregate):
+    return (
+        "SELECT {aggregate} FROM taggit_taggeditem ti "
+        "JOIN taggit_tag t ON t.id = ti.tag_id "
+        "JOIN django_content_type ct ON ct.id = ti.content_type_id "
+        "WHERE ct.app_label = 'blog' AND ct.model = 'post' AND ti.object_id = p.id"
+    ).format(aggregate=aggregate)
+
+
+def _published_sql(published_only):
+    return " WHERE p.status = 'published'" if published_only else ''
+
+
+class SQLiteBackend:
+    """
+    FTS5 index with the post id as rowid.
+    """
+
+    def create(self, cursor):
+        cursor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS blog_post_fts USING fts5("
+            "title, tags, content, tokenize = 'porter unicode61')"
+        )
+
+    def drop(self, cursor):
+        cursor.execute('DROP TABLE IF EXISTS blog_post_fts')
+
+    def rebuild(self, cursor, published_only=True):
+        cursor.execute('DELETE FROM blog_post_fts')
+        cursor.execute(
+            'INSERT INTO blog_post_fts (rowid, title, tags, content) '
+            'SELECT p.id, p.title, COALESCE((%s), \'\'), p.content FROM blog_post p%s'
+            % (_post_tags_sql("group_concat(t.name, ' ')"), _published_sql(published_only))
+        )
+
+    def index(self, cursor, post_id, title, tags, content):
+        cursor.execute(
+            'INSERT OR REPLACE INTO blog_post_fts (rowid, title, tags, content) '
+            'VALUES (%s, %s, %s, %s)',
+            [post_id, title, tags, content],
+        )
+
+    def remove(self, cursor, post_id):
+        cursor.execute('DELETE FROM blog_post_fts WHERE rowid = %s', [post_id])
+
+    def match_expression(self, terms):
+        return ' '.join('"%s"*' % term for term in terms)
+
+    def count(self, cursor, terms):
+        cursor.execute(
+            'SELECT COUNT(*) FROM blog_post_fts WHERE blog_post_fts MATCH %s',
+            [self.match_expression(terms)],
+        )
+        return cursor.fetchone()[0]
+
+    def ranked_ids(self, cursor, terms, limit, offset):
+        # bm25() is lower for better matches.
+        cursor.execute(
+            'SELECT rowid FROM blog_post_fts WHERE blog_post_fts MATCH %s '
+            'ORDER BY bm25(blog_post_fts, %s, %s, %s) LIMIT %s OFFSET %s',
+            [self.match_expression(terms), TITLE_WEIGHT, TAGS_WEIGHT, CONTENT_WEIGHT,
+             limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+class PostgreSQLBackend:
+    """
+    Weighted tsvector per post in a side table with a GIN index.
+    """
+
+    DOCUMENT_SQL = (
+        "setweight(to_tsvector('english', coalesce(%s, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(%s, '')), 'B') || "
+        "setweight(to_tsvector('english', coalesce(%s, '')), 'D')"
+    )
+
+    def create(self, cursor):
+        cursor.execute(
+            'CREATE TABLE IF NOT EXISTS blog_post_search ('
+            'post_id bigint PRIMARY KEY REFERENCES blog_post (id) ON DELETE CASCADE, '
+            'document tsvector NOT NULL)'
+        )
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS blog_post_search_document_gin '
+            'ON blog_post_search USING GIN (document)'
+        )
+
+    def drop(self, cursor):
+        cursor.execute('DROP TABLE IF EXISTS blog_post_search')
+
+    def rebuild(self, cursor, published_only=True):
+        cursor.execute('TRUNCATE blog_post_search')
+        cursor.execute(
+            'INSERT INTO blog_post_search (post_id, document) SELECT p.id, %s FROM blog_post p%s'
+            % (self.DOCUMENT_SQL % ('p.title', '(%s)' % _post_tags_sql("string_agg(t.name, ' ')"),
+                                    'p.content'), _published_sql(published_only))
+        )
+
+    def index(self, cursor, post_id, title, tags, content):
+        cursor.execute(
+            'INSERT INTO blog_post_search (post_id, document) VALUES (%%s, %s) '
+            'ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document'
+            % (self.DOCUMENT_SQL % ('%s', '%s', '%s')),
+            [post_id, title, tags, content],
+        )
+
+    def remove(self, cursor, post_id):
+        cursor.execute('DELETE FROM blog_post_search WHERE post_id = %s', [post_id])
+
+    def tsquery(self, terms):
+        return ' & '.join('%s:*' % term for term in terms)
+
+    def count(self, cursor, terms):
+        cursor.execute(
+            "SELECT COUNT(*) FROM blog_post_search "
+            "WHERE document @@ to_tsquery('english', %s)",
+            [self.tsquery(terms)],
+        )
+        return cursor.fetchone()[0]
+
+    def ranked_ids(self, cursor, terms, limit, offset):
+        cursor.execute(
+            "SELECT post_id FROM blog_post_search, to_tsquery('english', %s) query "
+            "WHERE document @@ query "
+            # Weights are listed D, C, B, A: content, unused, tags, title.
+            "ORDER BY ts_rank(ARRAY[%s, 0, %s, %s]::float4[], document, query) DESC, "
+            "post_id DESC "
+            "LIMIT %s OFFSET %s",
+            [self.tsquery(terms), CONTENT_WEIGHT / TITLE_WEIGHT, TAGS_WEIGHT / TITLE_WEIGHT, 1.0,
+             limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+BACKENDS = {
+    'sqlite': SQLiteBackend,
+    'postgresql': PostgreSQLBackend,
+}
+
+
+def get_backend(using=None):
+    """
+    Return the index backend for a connection, or None if it has none.
+    """
+    conn = using or connection
+    backend_class = BACKENDS.get(conn.vendor)
+    return backend_class() if backend_class else None
+
+
+def create_index(conn):
+    backend = get_backend(conn)
+    if backend:
+        with conn.cursor() as cursor:
+            backend.create(cursor)
+            # Run by migration 0005, from before posts had a status, when
+            # every post was published.
+            backend.rebuild(cursor, published_only=False)
+
+
+def drop_index(conn):
+    backend = get_backend(conn)
+    if backend:
+        with conn.cursor() as cursor:
+            backend.drop(cursor)
+
+
+def rebuild_index():
+    backend = get_backend()
+    if backend:
+        with connection.cursor() as cursor:
+            backend.rebuild(cursor)
+
+
+def index_post(post, tags=None):
+    """
+    Index a published post, or drop any other from the index. tags are the
+    post's tag names, read from the database when not given.
+    """
+    if not post.is_published():
+        remove_post(post.pk)
+        return
+    backend = get_backend()
+    if backend:
+        tags = ' '.join(post.tags.values_list('name', flat=True) if tags is None else tags)
+        with connection.cursor() as cursor:
+            backend.index(cursor, post.pk, post.title, tags, post.content)
+
+
+def remove_post(post_id):
+    backend = get_backend()
+    if backend:
+        with connection.cursor() as cursor:
+            backend.remove(cursor, post_id)
+
+
+def parse_terms(query):
+    return TERM_RE.findall(query or '')[:16]
+
+
+class SearchResults:
+    """
+    Lazy, ranked search results that a Paginator can slice.
+
+    Only the ids for the requested page are fetched from the index, then
+    the posts for those ids are loaded with their authors and tags.
+    """
+
+    def __init__(self, query):
+        self.terms = parse_terms(query)
+        self.backend = get_backend()
+        self._count = None
+
+    def fallback_queryset(self):
+        query = ' '.join(self.terms)
+        return Post.objects.published().filter(
+            Q(title__icontains=query) |
+            Q(content__icontains=query) |
+            Q(tags__name__icontains=query)
+        ).distinct().order_by('-published_date')
+
+    def count(self):
+        if self._count is None:
+            if not self.terms:
+                self._count = 0
+            elif self.backend is None:
+                self._count = self.fallback_queryset().count()
+            else:
+                with connection.cursor() as cursor:
+                    self._count = self.backend.count(cursor, self.terms)
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        if not self.terms:
+            return []
+        posts = Post.objects.select_related('author').prefetch_related('tags').defer('content', 'content_html')
+        if self.backend is None:
+            return list(posts.filter(pk__in=self.fallback_queryset().values('pk'))
+                        .order_by('-published_date')[key])
+        start = key.start or 0
+        with connection.cursor() as cursor:
+            ids = self.backend.ranked_ids(cursor, self.terms, key.stop - start, start)
+        by_id = posts.in_bulk(ids)
+        return [by_id[pk] for pk in ids if pk in by_id]
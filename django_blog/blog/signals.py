@@ -0,0 +1,267 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from taggit.models import Tag
+from .models import Comment, Post, PostImage, RelatedPost
+from . import author_stats, autocomplete, images, page_cache, search, sitemaps, tag_stats
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, raw=False, **kwargs):
+    """
+    Keep the search index in step with post edits.
+    """
+    if not raw:
+        search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def remove_deleted_post(sender, instance, **kwargs):
+    search.remove_post(instance.pk)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def index_retagged_post(sender, instance, action, **kwargs):
+    """
+    Re-index a post when tags are added to, removed from or cleared on it.
+    """
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, Post):
+        search.index_post(instance)
+
+
+@receiver(post_save, sender=Tag)
+def index_renamed_tag(sender, instance, created, raw=False, **kwargs):
+    """
+    Re-index the posts carrying a tag when the tag itself is renamed.
+    """
+    if created or raw:
+        return
+    for post in Post.objects.published().filter(tags=instance):
+        search.index_post(post)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def update_tag_stats(sender, instance, action, pk_set, **kwargs):
+    """
+    Adjust the per-tag post counts by the tags actually added or removed.
+    Drafts and scheduled posts are counted when they are published.
+    """
+    if not isinstance(instance, Post):
+        return
+    if action == 'pre_clear':
+        # clear() reports no pk_set, so note the tags before they go.
+        instance._cleared_tag_ids = list(instance.tags.values_list('id', flat=True))
+    elif not instance.was_published():
+        return
+    elif action == 'post_add':
+        tag_stats.add_posts(pk_set)
+    elif action == 'post_remove':
+        tag_stats.remove_posts(pk_set)
+    elif action == 'post_clear':
+        tag_stats.remove_posts(getattr(instance, '_cleared_tag_ids', None))
+
+
+@receiver(pre_delete, sender=Post)
+def uncount_deleted_post(sender, instance, **kwargs):
+    # The tagged items go through a generic relation, which sends no m2m_changed.
+    if instance.was_published():
+        tag_stats.remove_posts(list(instance.tags.values_list('id', flat=True)))
+
+
+@receiver(post_save, sender=Post)
+def count_published_post(sender, instance, created, raw=False, **kwargs):
+    """
+    Count a post in its author's and tags' stats when it is published, and
+    out of them when it goes back to draft.
+    """
+    was_published = not created and instance.was_published()
+    if raw or was_published == instance.is_published():
+        return
+    delta = 1 if instance.is_published() else -1
+    author_stats.adjust(instance.author_id, 'post_count', delta)
+    if not created:
+        # A new post is saved before its tags are added.
+        tag_ids = list(instance.tags.values_list('id', flat=True))
+        (tag_stats.add_posts if delta > 0 else tag_stats.remove_posts)(tag_ids)
+        sitemaps.invalidate_tags(*tag_ids)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tag_cloud(sender, **kwargs):
+    tag_stats.invalidate_cloud()
+
+
+def _tag_namespaces(post):
+    return ['tag:%s' % slug for slug in post.tags.values_list('slug', flat=True)]
+
+
+def _author_namespace(instance):
+    return 'author:%s' % instance.author.username
+
+
+@receiver(post_save, sender=Post)
+def invalidate_saved_post_pages(sender, instance, raw=False, **kwargs):
+    """
+    Orphan the cached pages that show the post: its detail page, the home
+    list, its author's archive and the lists of its tags.
+    """
+    if not raw:
+        page_cache.invalidate('post:%s' % instance.pk, 'posts', _author_namespace(instance),
+                              *_tag_namespaces(instance))
+
+
+@receiver(pre_delete, sender=Post)
+def invalidate_deleted_post_pages(sender, instance, **kwargs):
+    page_cache.invalidate('post:%s' % instance.pk, 'posts', 'tags', _author_namespace(instance),
+                          *_tag_namespaces(instance))
+
+
+@receiver(post_save, sender=Post)
+@receiver(pre_delete, sender=Post)
+def invalidate_related_post_pages(sender, instance, raw=False, created=False, **kwargs):
+    """
+    Orphan the detail pages listing the post among their related posts when
+    its title or status changes or it is deleted. Only published related
+    posts are shown, and a new post is in no list yet.
+    """
+    if raw or created or not (instance.was_published() or instance.is_published()):
+        return
+    if (kwargs['signal'] is post_save and instance.was_published() == instance.is_published()
+            and not instance.title_changed()):
+        return
+    post_ids = RelatedPost.objects.filter(related=instance).values_list('post_id', flat=True)
+    page_cache.invalidate(*('post:%s' % post_id for post_id in post_ids))
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def invalidate_retagged_post_pages(sender, instance, action, pk_set, **kwargs):
+    """
+    Tag changes alter the post's badges on every list showing it, and the
+    tag counts in the cloud.
+    """
+    if not isinstance(instance, Post):
+        return
+    if action in ('pre_add', 'pre_remove', 'pre_clear'):
+        instance._page_cache_namespaces = _tag_namespaces(instance)
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        namespaces = set(getattr(instance, '_page_cache_namespaces', []))
+        namespaces.update(_tag_namespaces(instance))
+        page_cache.invalidate('posts', 'tags', *namespaces)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_post_page(sender, instance, raw=False, **kwargs):
+    # The commenter's archive shows their comment count.
+    if not raw:
+        page_cache.invalidate('post:%s' % instance.post_id, _author_namespace(instance))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tag_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        page_cache.invalidate('tags', 'tag:%s' % instance.slug)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def mark_retagged_post_related_stale(sender, instance, action, **kwargs):
+    # Tag changes do not touch updated_at, so flag the post for compute_related_posts.
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, Post):
+        Post.objects.filter(pk=instance.pk).update(related_computed_at=None)
+
+
+@receiver(pre_delete, sender=Post)
+def mark_related_lists_stale(sender, instance, **kwargs):
+    """
+    Flag the posts listing a deleted post, whose lists are about to shrink.
+    """
+    Post.objects.filter(
+        pk__in=RelatedPost.objects.filter(related=instance).values('post_id'),
+    ).update(related_computed_at=None)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, raw=False, **kwargs):
+    # Posts are counted by count_published_post.
+    if created and not raw:
+        author_stats.adjust(instance.author_id, 'comment_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_deleted_comment(sender, instance, **kwargs):
+    author_stats.adjust(instance.author_id, 'comment_count', -1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_deleted_author_post(sender, instance, **kwargs):
+    if instance.was_published():
+        author_stats.adjust(instance.author_id, 'post_count', -1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_autocomplete(sender, instance, raw=False, **kwargs):
+    """
+    Rebuild the suggestion indexes when a post enters or leaves them or its
+    published title changes, not on every edit.
+    """
+    if raw or not (instance.was_published() or instance.is_published()):
+        return
+    if (kwargs.get('signal') is post_delete or instance.was_published() != instance.is_published()
+            or instance.title_changed()):
+        autocomplete.invalidate()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tag_autocomplete(sender, raw=False, **kwargs):
+    if not raw:
+        autocomplete.invalidate()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_sitemap(sender, instance, raw=False, **kwargs):
+    if not raw:
+        sitemaps.invalidate_posts(instance.pk)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def invalidate_retagged_tag_sitemaps(sender, instance, action, pk_set, **kwargs):
+    """
+    Tagging moves a tag's lastmod and can add it to or drop it from the tag
+    sitemap; update_tag_stats notes the tag ids of a clear().
+    """
+    if not isinstance(instance, Post):
+        return
+    if action in ('post_add', 'post_remove'):
+        sitemaps.invalidate_tags(*pk_set)
+    elif action == 'post_clear':
+        sitemaps.invalidate_tags(*getattr(instance, '_cleared_tag_ids', None) or ())
+
+
+@receiver(pre_delete, sender=Post)
+def invalidate_deleted_post_tag_sitemaps(sender, instance, **kwargs):
+    sitemaps.invalidate_tags(*instance.tags.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tag_sitemap(sender, instance, raw=False, **kwargs):
+    if not raw:
+        sitemaps.invalidate_tags(instance.pk)
+
+
+@receiver(post_save, sender=PostImage)
+@receiver(post_delete, sender=PostImage)
+def invalidate_post_image_page(sender, instance, raw=False, **kwargs):
+    if not raw:
+        page_cache.invalidate('post:%s' % instance.post_id)
+
+
+@receiver(post_delete, sender=PostImage)
+def delete_post_image_files(sender, instance, **kwargs):
+    # Only once the row is surely gone.
+    transaction.on_commit(lambda: images.delete_files(instance))
@@ -0,0 +1,165 @@
+"""
+Sitemaps for the post and tag pages, split into chunks of fixed id ranges.
+
+Django's sitemap framework renders a section by paginating a queryset, so
+every request for a page loads a full page of model instances, counts the
+whole table and re-renders the XML. Here /sitemap.xml is an index of
+chunks, and chunk N of a section lists the rows with ids from
+N * SITEMAP_CHUNK_SIZE + 1 to (N + 1) * SITEMAP_CHUNK_SIZE. A chunk is
+read by keyset iteration over the id, BATCH_SIZE rows of
+(id, lastmod) at a time, and its XML is cached.
+
+Because a row's chunk follows from its id, the signal handlers in
+blog/signals.py invalidate only the chunk of a changed post or tag (the
+page cache namespaces ``sitemap:posts:<chunk>`` and ``sitemap:tags:<chunk>``)
+along with the index, whose lastmod dates move. Bulk loads invalidate the
+``sitemap`` namespace, which every sitemap depends on. Like the feeds,
+responses carry an ETag so unchanged sitemaps are answered with a 304.
+
+Settings:
+    SITEMAP_CHUNK_SIZE     ids per chunk, default 5000 (the limit is 50000)
+    SITEMAP_CACHE_TIMEOUT  seconds to keep a chunk, default 86400
+"""
+
+import hashlib
+import io
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Max
+from django.http import Http404, HttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.xmlutils import SimplerXMLGenerator
+
+from . import page_cache
+from .models import Post, TagStat
+
+SITEMAP_PREFIX = 'blog:sitemap:'
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+BATCH_SIZE = 1000
+
+
+def get_chunk_size():
+    return getattr(settings, 'SITEMAP_CHUNK_SIZE', 5000)
+
+
+def chunk_of(pk):
+    return (pk - 1) // get_chunk_size()
+
+
+def post_rows():
+    return Post.objects.published().values_list('id', 'updated_at'), 'id'
+
+
+def tag_rows():
+    return (TagStat.objects.filter(post_count__gt=0)
+            .values_list('tag_id', 'last_used', 'tag__slug'), 'tag_id')
+
+
+# section: (rows, location of a row)
+SECTIONS = {
+    'posts': (post_rows, lambda row: reverse('post-detail', kwargs={'pk': row[0]})),
+    'tags': (tag_rows, lambda row: reverse('post-by-tag', kwargs={'tag_slug': row[2]})),
+}
+
+
+def namespaces(section, *pks):
+    """
+    The page cache namespaces to invalidate when rows of a section change.
+    """
+    return ['sitemap:index', *{'sitemap:%s:%d' % (section, chunk_of(pk)) for pk in pks}]
+
+
+def invalidate_posts(*post_ids):
+    page_cache.invalidate(*namespaces('posts', *post_ids))
+
+
+def invalidate_tags(*tag_ids):
+    page_cache.invalidate(*namespaces('tags', *tag_ids))
+
+
+def keyset(queryset, key, start, end):
+    """
+    Yield the rows with start < key <= end in key order, BATCH_SIZE per query.
+    """
+    last = start
+    while True:
+        rows = list(queryset.filter(**{key + '__gt': last, key + '__lte': end}).order_by(key)[:BATCH_SIZE])
+        yield from rows
+        if len(rows) < BATCH_SIZE:
+            return
+        last = rows[-1][0]
+
+
+def write_xml(root, entries):
+    """
+    Serialize (tag, location, lastmod) entries under a root element.
+    """
+    output = io.StringIO()
+    xml = SimplerXMLGenerator(output, 'utf-8')
+    xml.startDocument()
+    xml.startElement(root, {'xmlns': SITEMAP_NS})
+    for tag, location, lastmod in entries:
+        xml.startElement(tag, {})
+        xml.addQuickElement('loc', location)
+        if lastmod:
+            xml.addQuickElement('lastmod', lastmod.date().isoformat())
+        xml.endElement(tag)
+    xml.endElement(root)
+    xml.endDocument()
+    return output.getvalue().encode()
+
+
+def render_index(request):
+    size = get_chunk_size()
+    entries = []
+    for section, queryset, key, lastmod in (
+        ('posts', Post.objects.published(), 'id', 'updated_at'),
+        ('tags', TagStat.objects.filter(post_count__gt=0), 'tag_id', 'last_used'),
+    ):
+        chunks = (queryset.annotate(chunk=(F(key) - 1) / size).values('chunk')
+                  .annotate(lastmod=Max(lastmod)).order_by('chunk').values_list('chunk', 'lastmod'))
+        for chunk, modified in chunks:
+            location = reverse('sitemap-%s' % section, kwargs={'chunk': chunk})
+            entries.append(('sitemap', request.build_absolute_uri(location), modified))
+    return write_xml('sitemapindex', entries)
+
+
+def render_chunk(request, section, chunk):
+    rows, location = SECTIONS[section]
+    queryset, key = rows()
+    size = get_chunk_size()
+    entries = [
+        ('url', request.build_absolute_uri(location(row)), row[1])
+        for row in keyset(queryset, key, chunk * size, (chunk + 1) * size)
+    ]
+    return write_xml('urlset', entries) if entries else None
+
+
+def cached_sitemap(request, namespaces, render):
+    generation = page_cache.generation(['sitemap', *namespaces])
+    key = SITEMAP_PREFIX + hashlib.md5(
+        ('%s %s' % (generation, request.build_absolute_uri())).encode(), usedforsecurity=False,
+    ).hexdigest()
+    cached = cache.get(key)
+    if cached is None:
+        content = render()
+        if content is None:
+            raise Http404('Empty sitemap.')
+        cached = {'content': content, 'etag': '"%s"' % hashlib.md5(content, usedforsecurity=False).hexdigest()}
+        cache.set(key, cached, getattr(settings, 'SITEMAP_CACHE_TIMEOUT', 86400))
+
+    response = (get_conditional_response(request, etag=cached['etag'])
+                or HttpResponse(cached['content'], content_type='application/xml'))
+    response['ETag'] = cached['etag']
+    return response
+
+
+def index(request):
+    return cached_sitemap(request, ['sitemap:index'], lambda: render_index(request))
+
+
+def section(request, section, chunk):
+    return cached_sitemap(request, ['sitemap:%s:%d' % (section, chunk)],
+                          lambda: render_chunk(request, section, chunk))
@@ -1 +1,82 @@
 console.log("Django Blog loaded!");
+
+// Post comment forms with a data-comment-endpoint to the JSON endpoint and
+// append the returned comment, instead of reloading the whole post page.
+document.addEventListener('submit', function (event) {
+    var form = event.target;
+    if (!form.dataset || !form.dataset.commentEndpoint || !window.fetch) {
+        return;
+    }
+    event.preventDefault();
+    var error = form.querySelector('.comment-error');
+    var button = form.querySelector('[type=submit]');
+    button.disabled = true;
+    fetch(form.dataset.commentEndpoint, {
+        method: 'POST',
+        body: new FormData(form),
+        credentials: 'same-origin',
+        headers: {'X-Requested-With': 'XMLHttpRequest'}
+    }).then(function (response) {
+        return response.json().then(function (data) {
+            if (!response.ok) {
+                throw new Error(data.error || 'The comment could not be posted.');
+            }
+            return data;
+        });
+    }).then(function (data) {
+        var list = document.getElementById(form.dataset.commentList);
+        var empty = list.querySelector('.no-comments');
+        if (empty) {
+            empty.remove();
+        }
+        list.insertAdjacentHTML('beforeend', data.html);
+        form.reset();
+        error.hidden = true;
+    }).catch(function (failure) {
+        error.textContent = failure.message;
+        error.hidden = false;
+    }).then(function () {
+        button.disabled = false;
+    });
+});
+
+// Fill a <datalist> with suggestions for inputs with a data-autocomplete
+// URL. With data-autocomplete-multiple only the text after the last comma
+// is completed, as in the comma separated tags field.
+document.querySelectorAll('input[data-autocomplete]').forEach(function (input) {
+    var list = document.createElement('datalist');
+    var multiple = input.hasAttribute('data-autocomplete-multiple');
+    var timer = null;
+    list.id = (input.id || input.name) + '-suggestions';
+    input.after(list);
+    input.setAttribute('list', list.id);
+    input.setAttribute('autocomplete', 'off');
+    input.addEventListener('input', function () {
+        clearTimeout(timer);
+        timer = setTimeout(function () {
+            var head = '';
+            var prefix = input.value;
+            if (multiple) {
+                var cut = prefix.lastIndexOf(',') + 1;
+                head = cut ? prefix.slice(0, cut) + ' ' : '';
+                prefix = prefix.slice(cut).trim();
+            }
+            if (!prefix || !window.fetch) {
+                list.innerHTML = '';
+                return;
+            }
+            var url = new URL(input.dataset.autocomplete, window.location.href);
+            url.searchParams.set('q', prefix);
+            fetch(url, {credentials: 'same-origin'}).then(function (response) {
+                return response.json();
+            }).then(function (data) {
+                list.innerHTML = '';
+                (data.tags || []).concat(data.posts || []).forEach(function (item) {
+                    var option = document.createElement('option');
+                    option.value = head + (item.name || item.title);
+                    list.appendChild(option);
+                });
+            });
+        }, 100);
+    });
+});
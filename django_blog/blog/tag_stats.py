@@ -0,0 +1,112 @@
+"""
+Per-tag post counts for the tag cloud and the /tags/ page.
+
+Counting posts per tag through taggit means aggregating TaggedItem joined
+to Post on every render. Instead the counts live in the TagStat table and
+are adjusted incrementally by the m2m_changed and delete handlers in
+blog/signals.py. Only published posts count. ``manage.py rebuild_tag_stats`` recomputes the table after
+bulk loads that bypass the signals.
+
+The tag cloud itself is cached and invalidated whenever a count changes.
+
+Settings:
+    TAG_CLOUD_SIZE     number of tags in the cloud, default 50
+    TAG_CLOUD_TIMEOUT  seconds to cache the cloud, default 600
+"""
+
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery
+from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
+from taggit.models import TaggedItem
+
+from .models import Post, TagStat
+
+CLOUD_CACHE_KEY = 'blog:tag_cloud'
+CLOUD_WEIGHTS = 5
+
+
+def invalidate_cloud():
+    cache.delete(CLOUD_CACHE_KEY)
+
+
+def add_posts(tag_ids, when=None, count=1):
+    """
+    Count count more posts for each tag in tag_ids.
+    """
+    if not tag_ids:
+        return
+    TagStat.objects.bulk_create([TagStat(tag_id=tag_id) for tag_id in tag_ids],
+                                ignore_conflicts=True)
+    TagStat.objects.filter(tag_id__in=tag_ids).update(
+        post_count=F('post_count') + count, last_used=when or timezone.now(),
+    )
+    invalidate_cloud()
+
+
+def remove_posts(tag_ids):
+    """
+    Count one post fewer for each tag in tag_ids.
+    """
+    if not tag_ids:
+        return
+    TagStat.objects.filter(tag_id__in=tag_ids, post_count__gt=0).update(
+        post_count=F('post_count') - 1,
+    )
+    invalidate_cloud()
+
+
+def rebuild():
+    """
+    Recompute every TagStat row from TaggedItem.
+    """
+    latest_post = Post.objects.filter(pk=OuterRef('object_id')).values('published_date')
+    rows = (
+        TaggedItem.objects.filter(content_type=ContentType.objects.get_for_model(Post),
+                                  object_id__in=Post.objects.published().values('pk'))
+        .values('tag_id')
+        .annotate(post_count=Count('id'), last_used=Max(Subquery(latest_post)))
+    )
+    with transaction.atomic():
+        TagStat.objects.all().delete()
+        TagStat.objects.bulk_create([TagStat(**row) for row in rows.iterator()], batch_size=1000)
+    invalidate_cloud()
+
+
+def weight(count, smallest, largest):
+    """
+    Map count onto 1..CLOUD_WEIGHTS on a log scale.
+    """
+    if largest == smallest:
+        return 1
+    scale = math.log(count / smallest) / math.log(largest / smallest)
+    return 1 + round(scale * (CLOUD_WEIGHTS - 1))
+
+
+def cloud():
+    """
+    Return the most used tags as dicts with name, slug, count and weight,
+    sorted by name.
+    """
+    entries = cache.get(CLOUD_CACHE_KEY)
+    if entries is None:
+        stats = list(
+            TagStat.objects.filter(post_count__gt=0).select_related('tag')
+            .order_by('-post_count', 'tag__name')[:getattr(settings, 'TAG_CLOUD_SIZE', 50)]
+        )
+        counts = [stat.post_count for stat in stats]
+        entries = sorted((
+            {
+                'name': stat.tag.name,
+                'slug': stat.tag.slug,
+                'count': stat.post_count,
+                'weight': weight(stat.post_count, min(counts), max(counts)),
+            }
+            for stat in stats
+        ), key=lambda entry: entry['name'].lower())
+        cache.set(CLOUD_CACHE_KEY, entries, getattr(settings, 'TAG_CLOUD_TIMEOUT', 600))
+    return entries
@@ -0,0 +1,40 @@
+from django import template
+
+from django.conf import settings
+from django.urls import reverse
+
+from blog import images, tag_stats
+
+register = template.Library()
+
+
+@register.inclusion_tag('blog/tag_cloud.html')
+def tag_cloud():
+    """
+    Render the cached cloud of the most used tags.
+    """
+    return {'tags': tag_stats.cloud()}
+
+
+@register.inclusion_tag('blog/post_image.html')
+def responsive_image(post_image):
+    """
+    Render a post image as a <picture> with a srcset per format, the last
+    format being the <img> fallback. Without any format (none configured or
+    supported) the original is shown as it is.
+    """
+    srcsets = images.srcsets(post_image)
+    sizes = getattr(settings, 'POST_IMAGE_SIZES', '(max-width: 800px) 100vw, 800px')
+    if not srcsets:
+        return {'image': post_image, 'sources': [], 'srcset': '', 'src': post_image.image.url, 'sizes': sizes}
+    fallback = list(srcsets)[-1]
+    widths = images.available_widths(post_image)
+    # For browsers without srcset: the first width fit for a full column.
+    src_width = next((width for width in widths if width >= 640), widths[-1])
+    return {
+        'image': post_image,
+        'sources': [(images.CONTENT_TYPES[fmt], srcset) for fmt, srcset in srcsets.items() if fmt != fallback],
+        'srcset': srcsets[fallback],
+        'src': reverse('post-image', kwargs={'pk': post_image.pk, 'width': src_width, 'fmt': fallback}),
+        'sizes': sizes,
+    }
@@ -125,3 +125,1392 @@ class CommentTests(TestCase):
         self.client.login(username='otheruser', password='password')
         response = self.client.post(reverse('comment-delete', kwargs={'pk': self.comment.pk}))
         self.assertEqual(response.status_code, 403)
+
+from django.test import override_settings
+from django_blog.query_budget import QueryBudgetExceeded, QueryBudgetTestMixin
+
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.post = Post.objects.create(title='Test Post', content='Test Content', author=self.user)
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('post-list'))
+        self.assertTrue(response['Server-Timing'].startswith('db;dur='))
+        self.assertIn('queries', response['Server-Timing'])
+
+    @override_settings(QUERY_BUDGETS={'post-list': 0}, QUERY_BUDGET_RAISE=True)
+    def test_over_budget_raises(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('post-list'))
+
+    @override_settings(QUERY_BUDGETS={'post-list': 0}, QUERY_BUDGET_RAISE=False)
+    def test_over_budget_without_raise(self):
+        response = self.client.get(reverse('post-list'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_assert_query_budget(self):
+        with self.assertQueryBudget(1) as recorder:
+            Post.objects.get(pk=self.post.pk)
+        self.assertEqual(recorder.count, 1)
+        with self.assertRaises(AssertionError):
+            with self.assertQueryBudget(1):
+                Post.objects.get(pk=self.post.pk)
+                Post.objects.get(pk=self.post.pk)
+
+    def test_duplicates_sum_parameter_sets(self):
+        other = Post.objects.create(title='Other Post', content='Test Content', author=self.user)
+        with self.assertQueryBudget(5) as recorder:
+            for pk in [self.post.pk, self.post.pk, other.pk, other.pk, other.pk]:
+                Post.objects.get(pk=pk)
+        self.assertEqual(list(recorder.duplicates().values()), [5])
+        self.assertEqual(recorder.duplicate_count(), 3)
+
+from io import StringIO
+from django.core.management import call_command
+from taggit.models import Tag
+
+class SeedCommandTests(TestCase):
+    def test_seed_creates_rows(self):
+        call_command('seed', users=10, posts=50, tags=20, comments=100,
+                     random_seed=1, stdout=StringIO())
+        self.assertEqual(User.objects.count(), 10)
+        self.assertEqual(Post.objects.count(), 50)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertEqual(Tag.objects.count(), 20)
+        self.assertTrue(all(post.tags.exists() for post in Post.objects.all()))
+
+from . import tag_stats
+
+class PostListQueryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+
+    def create_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(title='Post %d' % i, content='Content', author=self.user)
+            post.tags.add('django', 'tag%d' % i)
+
+    def test_home_page_query_count_is_constant(self):
+        self.create_posts(2)
+        tag_stats.cloud()
+        with self.assertNumQueries(3):
+            self.client.get(reverse('home'))
+        self.create_posts(20)
+        tag_stats.cloud()
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('home'))
+        self.assertEqual(len(response.context['posts']), 10)
+        self.assertTrue(response.context['is_paginated'])
+
+    def test_tag_page_query_count_is_constant(self):
+        self.create_posts(15)
+        tag_stats.cloud()
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('post-by-tag', kwargs={'tag_slug': 'django'}))
+        self.assertEqual(len(response.context['posts']), 10)
+        response = self.client.get(reverse('post-by-tag', kwargs={'tag_slug': 'django'}), {'page': 2})
+        self.assertEqual(len(response.context['posts']), 5)
+        self.assertContains(response, 'Post 0')
+
+    @override_settings(QUERY_BUDGET_RAISE=True)
+    def test_home_page_within_budget_when_logged_in(self):
+        self.create_posts(12)
+        self.client.login(username='testuser', password='password')
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.status_code, 200)
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password')
+
+    def search(self, query, **params):
+        return self.client.get(reverse('search'), {'q': query, **params})
+
+    def titles(self, response):
+        return [post.title for post in response.context['results']]
+
+    def test_title_match_ranks_above_content_match(self):
+        Post.objects.create(title='Notes', content='A short note on caching.', author=self.user)
+        Post.objects.create(title='Caching', content='Nothing else here.', author=self.user)
+        self.assertEqual(self.titles(self.search('caching')), ['Caching', 'Notes'])
+
+    def test_terms_match_prefixes_and_tags(self):
+        post = Post.objects.create(title='Deploying', content='Steps.', author=self.user)
+        post.tags.add('kubernetes')
+        self.assertEqual(self.titles(self.search('deplo')), ['Deploying'])
+        self.assertEqual(self.titles(self.search('kubern')), ['Deploying'])
+        self.assertEqual(self.titles(self.search('unrelated')), [])
+
+    def test_index_follows_edits_tags_and_deletes(self):
+        post = Post.objects.create(title='Old title', content='Body', author=self.user)
+        post.title = 'Fresh title'
+        post.save()
+        self.assertEqual(self.titles(self.search('old')), [])
+        self.assertEqual(self.titles(self.search('fresh')), ['Fresh title'])
+        post.tags.add('python')
+        self.assertEqual(self.titles(self.search('python')), ['Fresh title'])
+        post.tags.clear()
+        self.assertEqual(self.titles(self.search('python')), [])
+        post.delete()
+        self.assertEqual(self.titles(self.search('fresh')), [])
+
+    def test_results_are_paginated(self):
+        for i in range(12):
+            Post.objects.create(title='Django %d' % i, content='Body', author=self.user)
+        response = self.search('django')
+        self.assertEqual(len(response.context['results']), 10)
+        self.assertContains(response, '?q=django&amp;page=2')
+        response = self.search('django', page=2)
+        self.assertEqual(len(response.context['results']), 2)
+
+    def test_rebuild_command_indexes_bulk_created_posts(self):
+        Post.objects.bulk_create([Post(title='Bulk post', content='Body', author=self.user)])
+        self.assertEqual(self.titles(self.search('bulk')), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.titles(self.search('bulk')), ['Bulk post'])
+
+from django.core.cache import cache
+from .models import TagStat
+
+class TagStatTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='password')
+
+    def create_post(self, *tags):
+        post = Post.objects.create(title='Post', content='Content', author=self.user)
+        post.tags.add(*tags)
+        return post
+
+    def counts(self):
+        return dict(TagStat.objects.values_list('tag__name', 'post_count'))
+
+    def test_counts_follow_tag_changes(self):
+        first = self.create_post('django', 'python')
+        second = self.create_post('django')
+        self.assertEqual(self.counts(), {'django': 2, 'python': 1})
+        first.tags.add('django')
+        self.assertEqual(self.counts(), {'django': 2, 'python': 1})
+        first.tags.remove('python')
+        self.assertEqual(self.counts(), {'django': 2, 'python': 0})
+        first.tags.set(['python', 'testing'])
+        self.assertEqual(self.counts(), {'django': 1, 'python': 1, 'testing': 1})
+        second.tags.clear()
+        self.assertEqual(self.counts(), {'django': 0, 'python': 1, 'testing': 1})
+        first.delete()
+        self.assertEqual(self.counts(), {'django': 0, 'python': 0, 'testing': 0})
+
+    def test_rebuild_matches_incremental_counts(self):
+        self.create_post('django', 'python')
+        self.create_post('django')
+        expected = self.counts()
+        TagStat.objects.all().delete()
+        call_command('rebuild_tag_stats', stdout=StringIO())
+        self.assertEqual(self.counts(), expected)
+        self.assertTrue(all(TagStat.objects.values_list('last_used', flat=True)))
+
+    def test_cloud_is_cached_and_invalidated(self):
+        self.create_post('django', 'python')
+        self.create_post('django')
+        self.assertEqual([(tag['name'], tag['weight']) for tag in tag_stats.cloud()],
+                         [('django', 5), ('python', 1)])
+        with self.assertNumQueries(0):
+            tag_stats.cloud()
+        self.create_post('testing')
+        self.assertIn('testing', [tag['name'] for tag in tag_stats.cloud()])
+
+    def test_tag_list_page(self):
+        self.create_post('django', 'python')
+        self.create_post('django')
+        self.create_post('unused').tags.clear()
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('tag-list'))
+        self.assertEqual([stat.tag.name for stat in response.context['tags']],
+                         ['django', 'python'])
+        self.assertContains(response, reverse('post-by-tag', kwargs={'tag_slug': 'python'}))
+
+# A view count flush falling due mid-request would add an UPDATE to the counts.
+@override_settings(VIEW_COUNT_FLUSH_INTERVAL=3600)
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.post = Post.objects.create(title='Cached post', content='Content', author=self.user)
+        self.post.tags.add('django')
+        self.other = Post.objects.create(title='Other post', content='Content', author=self.user)
+        self.detail_url = reverse('post-detail', kwargs={'pk': self.post.pk})
+
+    def test_anonymous_detail_page_is_cached(self):
+        Comment.objects.create(post=self.post, author=self.user, content='First comment')
+        self.client.get(self.detail_url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url)
+        self.assertContains(response, 'First comment')
+
+    def test_comment_invalidates_only_its_post(self):
+        other_url = reverse('post-detail', kwargs={'pk': self.other.pk})
+        self.client.get(self.detail_url)
+        self.client.get(other_url)
+        self.client.get(reverse('home'))
+        Comment.objects.create(post=self.post, author=self.user, content='New comment')
+        self.assertContains(self.client.get(self.detail_url), 'New comment')
+        with self.assertNumQueries(0):
+            self.client.get(other_url)
+            self.client.get(reverse('home'))
+
+    def test_post_edit_invalidates_detail_list_and_tag_pages(self):
+        tag_url = reverse('post-by-tag', kwargs={'tag_slug': 'django'})
+        for url in (self.detail_url, reverse('home'), tag_url):
+            self.client.get(url)
+        self.post.title = 'Renamed post'
+        self.post.save()
+        for url in (self.detail_url, reverse('home'), tag_url):
+            self.assertContains(self.client.get(url), 'Renamed post')
+
+    def test_tag_change_invalidates_tag_pages(self):
+        tag_url = reverse('post-by-tag', kwargs={'tag_slug': 'python'})
+        self.assertNotContains(self.client.get(tag_url), 'Other post')
+        self.other.tags.add('python')
+        self.assertContains(self.client.get(tag_url), 'Other post')
+        self.assertContains(self.client.get(reverse('home')), 'python')
+
+    def test_logged_in_users_get_fresh_pages_with_cached_fragments(self):
+        Comment.objects.create(post=self.post, author=self.user, content='My comment')
+        self.client.login(username='testuser', password='password')
+        response = self.client.get(self.detail_url)
+        self.assertContains(response, reverse('post-update', kwargs={'pk': self.post.pk}))
+        self.assertContains(response, 'My comment')
+        # User and post; the session is in the cookie and the comments come
+        # from the fragment cache.
+        with self.assertNumQueries(2):
+            response = self.client.get(self.detail_url)
+        self.assertContains(response, reverse('post-update', kwargs={'pk': self.post.pk}))
+        self.assertContains(response, 'My comment')
+        self.client.logout()
+        self.assertNotContains(self.client.get(self.detail_url), 'Update')
+
+    def test_warm_page_cache_command(self):
+        call_command('warm_page_cache', top=1, stdout=StringIO())
+        with self.assertNumQueries(0):
+            self.client.get(reverse('home'))
+
+# A view count flush falling due mid-request would add an UPDATE to the counts.
+@override_settings(VIEW_COUNT_FLUSH_INTERVAL=3600)
+class CommentThreadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.post = Post.objects.create(title='Test Post', content='Test Content', author=self.user)
+        self.detail_url = reverse('post-detail', kwargs={'pk': self.post.pk})
+
+    def comment(self, content, parent=None):
+        return Comment.objects.create(post=self.post, author=self.user, content=content, parent=parent)
+
+    def test_paths_order_threads_depth_first(self):
+        first = self.comment('first')
+        second = self.comment('second')
+        reply = self.comment('reply', parent=first)
+        nested = self.comment('nested', parent=reply)
+        self.assertEqual((first.depth, reply.depth, nested.depth), (0, 1, 2))
+        self.assertTrue(nested.path.startswith(reply.path) and reply.path.startswith(first.path))
+        self.assertEqual([c.content for c in self.post.comments.order_by('path')],
+                         ['first', 'reply', 'nested', 'second'])
+        self.assertEqual([c.content for c in first.subtree().order_by('path')],
+                         ['first', 'reply', 'nested'])
+        self.assertEqual(list(second.subtree()), [second])
+
+    def test_replies_past_max_depth_join_the_parent_thread(self):
+        from .models import MAX_DEPTH
+        comment = self.comment('root')
+        for i in range(MAX_DEPTH + 2):
+            comment = self.comment('reply %d' % i, parent=comment)
+        self.assertEqual(comment.depth, MAX_DEPTH)
+
+    def test_detail_page_paginates_comments_by_keyset(self):
+        for i in range(55):
+            self.comment('Comment %02d' % i)
+        # The post, its images, its related posts and one page of comments.
+        with self.assertNumQueries(4):
+            response = self.client.get(self.detail_url)
+        page = response.context['comment_page']
+        self.assertEqual(len(page), 50)
+        self.assertContains(response, '?after=%s' % page.next_key)
+        response = self.client.get(self.detail_url, {'after': page.next_key})
+        self.assertEqual([c.content for c in response.context['comment_page']],
+                         ['Comment %02d' % i for i in range(50, 55)])
+        self.assertNotContains(response, 'More comments')
+
+    def test_reply_view_and_thread_view(self):
+        root = self.comment('root')
+        self.comment('elsewhere')
+        self.client.login(username='testuser', password='password')
+        response = self.client.post(reverse('comment-reply', kwargs={'pk': root.pk}), {'content': 'A reply'})
+        self.assertRedirects(response, reverse('comment-thread', kwargs={'pk': root.pk}))
+        reply = Comment.objects.get(content='A reply')
+        self.assertEqual((reply.parent, reply.post, reply.depth), (root, self.post, 1))
+        response = self.client.get(reverse('comment-thread', kwargs={'pk': root.pk}))
+        self.assertContains(response, 'A reply')
+        self.assertNotContains(response, 'elsewhere')
+
+    def test_fill_paths_after_bulk_create(self):
+        Comment.objects.bulk_create([Comment(post=self.post, author=self.user, content='bulk')])
+        Comment.objects.fill_paths()
+        comment = Comment.objects.get(content='bulk')
+        self.assertEqual(comment.path, str(comment.pk).zfill(10))
+
+import os
+import tempfile
+
+class ExportStaticTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.output = tempfile.mkdtemp()
+        self.addCleanup(__import__('shutil').rmtree, self.output)
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.posts = []
+        for i in range(12):
+            post = Post.objects.create(title='Post %d' % i, content='Content', author=self.user)
+            post.tags.add('django' if i % 2 else 'python')
+            self.posts.append(post)
+
+    def export(self, **options):
+        out = StringIO()
+        call_command('export_static', output=self.output, stdout=out, **options)
+        return int(out.getvalue().split()[1])
+
+    def read(self, *parts):
+        with open(os.path.join(self.output, *parts, 'index.html'), encoding='utf-8') as page:
+            return page.read()
+
+    def test_full_export_writes_tree_with_static_links(self):
+        # 12 posts, 2 home pages, 2 tag lists and the tag index.
+        self.assertEqual(self.export(), 17)
+        home = self.read()
+        self.assertIn('href="/page/2/"', home)
+        self.assertNotIn('?page=', home)
+        self.assertIn('Post 0', self.read('page', '2'))
+        self.assertIn('Post 1', self.read('tags', 'django'))
+        self.assertIn('Post 3', self.read('post', str(self.posts[3].pk)))
+        self.assertIn('django', self.read('tags'))
+
+    def test_comment_only_rerenders_its_post(self):
+        self.export()
+        self.assertEqual(self.export(), 0)
+        Comment.objects.create(post=self.posts[3], author=self.user, content='Fresh comment')
+        self.assertEqual(self.export(), 1)
+        self.assertIn('Fresh comment', self.read('post', str(self.posts[3].pk)))
+
+    def test_post_edit_rerenders_its_pages(self):
+        self.export()
+        post = self.posts[11]
+        post.title = 'Edited title'
+        post.save()
+        # Its detail page, the first home page and the django tag list.
+        self.assertEqual(self.export(), 3)
+        self.assertIn('Edited title', self.read())
+        self.assertIn('Edited title', self.read('tags', 'django'))
+
+    def test_deleted_post_and_emptied_pages_are_removed(self):
+        self.export()
+        self.posts[0].delete()
+        self.posts[1].delete()
+        self.posts[2].delete()
+        self.export()
+        self.assertFalse(os.path.exists(os.path.join(self.output, 'post', str(self.posts[0].pk))))
+        self.assertFalse(os.path.exists(os.path.join(self.output, 'page', '2')))
+
+    def test_long_comment_threads_export_keyset_pages(self):
+        post = self.posts[0]
+        for i in range(55):
+            Comment.objects.create(post=post, author=self.user, content='Comment %02d' % i)
+        self.export()
+        detail = self.read('post', str(post.pk))
+        after = Comment.objects.filter(post=post).order_by('path').values_list('path', flat=True)[49]
+        self.assertIn('href="/post/%d/after/%s/"' % (post.pk, after), detail)
+        self.assertIn('Comment 54', self.read('post', str(post.pk), 'after', after))
+
+class FeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.post = Post.objects.create(title='Tagged post', content='Body', author=self.user)
+        self.post.tags.add('django')
+        Post.objects.create(title='Untagged post', content='Body', author=self.user)
+
+    def test_site_feeds(self):
+        response = self.client.get(reverse('post-feed-rss'))
+        self.assertEqual(response['Content-Type'], 'application/rss+xml; charset=utf-8')
+        self.assertContains(response, 'Tagged post')
+        self.assertContains(response, 'Untagged post')
+        self.assertContains(response, '<category>django</category>')
+        response = self.client.get(reverse('post-feed-atom'))
+        self.assertEqual(response['Content-Type'], 'application/atom+xml; charset=utf-8')
+        self.assertContains(response, 'Tagged post')
+
+    def test_tag_feeds(self):
+        for name in ('tag-feed-rss', 'tag-feed-atom'):
+            response = self.client.get(reverse(name, kwargs={'tag_slug': 'django'}))
+            self.assertContains(response, 'Tagged post')
+            self.assertNotContains(response, 'Untagged post')
+        response = self.client.get(reverse('tag-feed-rss', kwargs={'tag_slug': 'missing'}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_repeated_polls_are_cached_and_conditional(self):
+        url = reverse('post-feed-rss')
+        response = self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).content, response.content)
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(not_modified.status_code, 304)
+            not_modified = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(not_modified.status_code, 304)
+
+    def test_new_post_refreshes_feed(self):
+        url = reverse('tag-feed-rss', kwargs={'tag_slug': 'django'})
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(title='Another post', content='Body', author=self.user).tags.add('django')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Another post')
+
+from django.db import connection
+
+class IndexTests(TestCase):
+    def query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return ' '.join(str(row[-1]) for row in cursor.fetchall())
+
+    def test_home_page_query_uses_published_date_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN is SQLite specific.')
+        plan = self.query_plan(Post.objects.published().order_by('-published_date')[:10])
+        self.assertIn('blog_post_live_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_due_posts_query_uses_scheduled_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN is SQLite specific.')
+        plan = self.query_plan(Post.objects.due().order_by('published_date')[:100])
+        self.assertIn('blog_post_scheduled_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_comment_page_query_uses_post_path_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN is SQLite specific.')
+        index = next(index for index in Comment._meta.indexes if index.fields == ['post', 'path'])
+        plan = self.query_plan(Comment.objects.filter(post_id=1, path__gt='0001').order_by('path')[:10])
+        self.assertIn(index.name, plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+import zipfile
+from django.core.management import CommandError
+from django.test.utils import CaptureQueriesContext
+
+class ImportPostsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.source = tempfile.mkdtemp()
+        self.addCleanup(__import__('shutil').rmtree, self.source)
+        self.admin = User.objects.create_user(username='admin', password='password')
+        self.alice = User.objects.create_user(username='alice', password='password')
+        Tag.objects.create(name='django', slug='django')
+
+    def write(self, name, text):
+        path = os.path.join(self.source, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as handle:
+            handle.write(text)
+
+    def test_import_directory(self):
+        self.write('one.md', '---\ntitle: First post\nauthor: alice\ndate: 2021-03-04 10:00\n'
+                             'tags: [django, Deployment]\n---\nBody of the *first* post.\n')
+        self.write('nested/two.markdown', '---\ntags:\n  - django\n  - testing\n---\n# Second post\n\nBody.\n')
+        self.write('nested/three.md', 'No front matter here.\n')
+        self.write('notes.txt', 'Not a post.')
+        call_command('import_posts', self.source, author='admin', batch_size=2, stdout=StringIO())
+
+        first = Post.objects.get(title='First post')
+        self.assertEqual(first.author, self.alice)
+        self.assertEqual(first.content, 'Body of the *first* post.')
+        self.assertEqual((first.published_date.year, first.published_date.month), (2021, 3))
+        self.assertEqual(sorted(first.tags.values_list('slug', flat=True)), ['deployment', 'django'])
+        second = Post.objects.get(title='Second post')
+        self.assertEqual(second.author, self.admin)
+        self.assertEqual(sorted(second.tags.names()), ['django', 'testing'])
+        self.assertTrue(Post.objects.filter(title='three', author=self.admin).exists())
+        self.assertEqual(Post.objects.count(), 3)
+        self.assertEqual(Tag.objects.filter(slug='django').count(), 1)
+        # The derived data the signals would have maintained is refreshed.
+        self.assertEqual(TagStat.objects.get(tag__slug='django').post_count, 2)
+        response = self.client.get(reverse('search'), {'q': 'deployment'})
+        self.assertEqual([post.title for post in response.context['results']], ['First post'])
+
+    def test_import_zip_batches_queries(self):
+        archive = os.path.join(self.source, 'posts.zip')
+        with zipfile.ZipFile(archive, 'w') as zipped:
+            for i in range(10):
+                zipped.writestr('post%d.md' % i, '---\ntitle: Post %d\ntags: django, tag%d\n---\nBody\n' % (i, i))
+        with CaptureQueriesContext(connection) as queries:
+            call_command('import_posts', archive, author='admin', batch_size=10, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 10)
+        self.assertEqual(Tag.objects.count(), 11)
+        inserts = [q for q in queries if q['sql'].startswith('INSERT INTO "blog_post"')]
+        self.assertEqual(len(inserts), 1)
+
+    def test_unknown_author_option(self):
+        with self.assertRaises(CommandError):
+            call_command('import_posts', self.source, author='nobody', stdout=StringIO())
+
+from unittest import mock, skipUnless
+from . import rendering
+
+requires_markdown = skipUnless(rendering.markdown, 'The Markdown package is not installed.')
+
+class RenderingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='password')
+
+    @requires_markdown
+    def test_content_is_rendered_on_save(self):
+        post = Post.objects.create(title='Markdown', author=self.user,
+                                   content='Some **bold** text.\n\n* one\n* two')
+        self.assertIn('<strong>bold</strong>', post.content_html)
+        self.assertIn('<li>one</li>', post.content_html)
+        self.assertEqual(post.excerpt, 'Some bold text. one two')
+        post.refresh_from_db()
+        self.assertIn('<strong>bold</strong>', post.content_html)
+
+    @requires_markdown
+    def test_unchanged_content_is_not_rerendered(self):
+        post = Post.objects.create(title='Markdown', content='Text', author=self.user)
+        with mock.patch.object(rendering, 'render', wraps=rendering.render) as render:
+            post.title = 'New title'
+            post.save()
+            render.assert_not_called()
+            post.content = 'New *text*'
+            post.save(update_fields=['content'])
+            render.assert_called_once()
+        post.refresh_from_db()
+        self.assertIn('<em>text</em>', post.content_html)
+
+    def test_raw_html_and_unsafe_links_are_neutralised(self):
+        html, excerpt = rendering.render('<script>alert(1)</script>\n\n[x](javascript:alert(1)) [y](/post/1/)')
+        self.assertNotIn('<script>', html)
+        self.assertNotIn('javascript:', html)
+        self.assertIn('href="/post/1/"', html)
+
+    def test_excerpt_is_truncated(self):
+        post = Post.objects.create(title='Long', content='word ' * 80, author=self.user)
+        self.assertEqual(len(post.excerpt.split()), rendering.EXCERPT_WORDS)
+
+    def test_excerpt_is_escaped_once(self):
+        post = Post.objects.create(title='Cartoons', content='Tom & Jerry say "hi" <b>', author=self.user)
+        self.assertEqual(post.excerpt, 'Tom & Jerry say "hi" <b>')
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Tom &amp; Jerry say &quot;hi&quot; &lt;b&gt;')
+
+    @requires_markdown
+    def test_pages_use_stored_html(self):
+        post = Post.objects.create(title='Markdown', content='Some **bold** text.', author=self.user)
+        response = self.client.get(reverse('post-detail', kwargs={'pk': post.pk}))
+        self.assertContains(response, '<strong>bold</strong>', html=True)
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Some bold text.')
+        self.assertNotContains(response, '**bold**')
+
+    @requires_markdown
+    def test_render_posts_command(self):
+        post = Post.objects.create(title='Markdown', content='Some **bold** text.', author=self.user)
+        Post.objects.filter(pk=post.pk).update(content_html='', content_hash='')
+        call_command('render_posts', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertIn('<strong>bold</strong>', post.content_html)
+
+from taggit.models import TaggedItem
+from . import related
+from .models import RelatedPost
+
+# A view count flush falling due mid-request would add an UPDATE to the counts.
+@override_settings(VIEW_COUNT_FLUSH_INTERVAL=3600)
+class RelatedPostsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.deploy = self.create('Deploying django with docker',
+                                  'Containers make deploying django applications repeatable.', 'django', 'docker')
+        self.docker = self.create('Docker images for python services',
+                                  'Deploying small docker images for python applications.', 'docker', 'python')
+        self.orm = self.create('Understanding the django ORM',
+                               'Querysets are lazy and django evaluates them on demand.', 'django', 'orm')
+        self.baking = self.create('Baking sourdough bread',
+                                  'Flour, water and patience give a good loaf.', 'baking')
+
+    def create(self, title, content, *tags):
+        post = Post.objects.create(title=title, content=content, author=self.user)
+        post.tags.add(*tags)
+        return post
+
+    def compute(self, **options):
+        out = StringIO()
+        call_command('compute_related_posts', stdout=out, **options)
+        return int(out.getvalue().split()[4])
+
+    def related_titles(self, post):
+        return [link.related.title for link in
+                RelatedPost.objects.filter(post=post).select_related('related').order_by('rank')]
+
+    def test_related_posts_ranked_by_tags_and_text(self):
+        self.assertEqual(self.compute(), 4)
+        self.assertEqual(self.related_titles(self.deploy)[0], self.docker.title)
+        self.assertNotIn(self.baking.title, self.related_titles(self.deploy))
+        self.assertEqual(self.related_titles(self.baking), [])
+        self.assertIn(self.deploy.title, self.related_titles(self.orm))
+
+    def test_pure_python_scores_match_matrix_scores(self):
+        if related.np is None:
+            self.skipTest('NumPy and SciPy are not installed.')
+        posts = list(Post.objects.order_by('pk').values_list('pk', 'title', 'content'))
+        tags = list(TaggedItem.objects.values_list('object_id', 'tag_id'))
+        expected = list(related.Corpus(posts, tags).top_related(range(len(posts)), 3))
+        with mock.patch.object(related, 'np', None):
+            actual = list(related.Corpus(posts, tags).top_related(range(len(posts)), 3))
+        self.assertEqual([[pk for pk, score in best] for post_id, best in actual],
+                         [[pk for pk, score in best] for post_id, best in expected])
+
+    def test_incremental_refresh(self):
+        self.compute()
+        self.assertEqual(self.compute(), 0)
+        self.baking.tags.add('docker')
+        # The retagged post and the posts it now relates to.
+        self.assertEqual(self.compute(), 3)
+        self.assertIn(self.baking.title, self.related_titles(self.docker))
+        self.orm.title = 'Understanding the django ORM again'
+        self.orm.save()
+        self.assertGreaterEqual(self.compute(), 1)
+        self.docker.delete()
+        self.compute()
+        self.assertNotIn('Docker images for python services', self.related_titles(self.deploy))
+
+    def test_detail_page_shows_related_posts(self):
+        self.compute()
+        # The post, its images, its related posts and its comments.
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('post-detail', kwargs={'pk': self.deploy.pk}))
+        self.assertContains(response, 'Related posts')
+        self.assertContains(response, reverse('post-detail', kwargs={'pk': self.docker.pk}))
+
+    def test_cached_pages_follow_related_post_changes(self):
+        self.compute()
+        url = reverse('post-detail', kwargs={'pk': self.deploy.pk})
+        docker_url = reverse('post-detail', kwargs={'pk': self.docker.pk})
+        self.assertContains(self.client.get(url), self.docker.title)
+        self.docker.title = 'Slim docker images'
+        self.docker.save()
+        self.assertContains(self.client.get(url), 'Slim docker images')
+        self.docker.status = Post.Status.DRAFT
+        self.docker.save()
+        self.assertNotContains(self.client.get(url), docker_url)
+        self.docker.status = Post.Status.PUBLISHED
+        self.docker.save()
+        self.assertContains(self.client.get(url), docker_url)
+        self.docker.delete()
+        self.assertNotContains(self.client.get(url), docker_url)
+
+from datetime import datetime
+from django.utils import timezone
+from .models import AuthorStat
+
+class AuthorArchiveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='alice', password='password')
+        self.other = User.objects.create_user(username='bob', password='password')
+
+    def create_post(self, title, author=None, date=None):
+        post = Post.objects.create(title=title, content='Content', author=author or self.user)
+        if date:
+            Post.objects.filter(pk=post.pk).update(published_date=timezone.make_aware(date))
+        return post
+
+    def counts(self):
+        return {stat.user.username: (stat.post_count, stat.comment_count)
+                for stat in AuthorStat.objects.select_related('user')}
+
+    def test_counts_follow_posts_and_comments(self):
+        post = self.create_post('First')
+        self.create_post('Second')
+        Comment.objects.create(post=post, author=self.other, content='Nice')
+        Comment.objects.create(post=post, author=self.user, content='Thanks')
+        self.assertEqual(self.counts(), {'alice': (2, 1), 'bob': (0, 1)})
+        post.delete()
+        self.assertEqual(self.counts(), {'alice': (1, 0), 'bob': (0, 0)})
+
+    def test_rebuild_matches_incremental_counts(self):
+        post = self.create_post('First')
+        Comment.objects.create(post=post, author=self.other, content='Nice')
+        expected = self.counts()
+        AuthorStat.objects.all().delete()
+        call_command('rebuild_author_stats', stdout=StringIO())
+        self.assertEqual(self.counts(), expected)
+
+    def test_author_page_lists_their_posts_with_cached_counts(self):
+        self.create_post('March post', date=datetime(2024, 3, 5))
+        self.create_post('May post', date=datetime(2024, 5, 1))
+        self.create_post('Not mine', author=self.other)
+        url = reverse('post-by-author', kwargs={'username': 'alice'})
+        tag_stats.cloud()
+        # Author with counts, posts count, page of posts, tags, archive months.
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        self.assertEqual([post.title for post in response.context['posts']], ['May post', 'March post'])
+        self.assertContains(response, '2 posts, 0 comments')
+        self.assertContains(response, reverse('post-by-author-month', kwargs={
+            'username': 'alice', 'year': 2024, 'month': 3,
+        }))
+        self.assertEqual(self.client.get(reverse('home')).content.count(url.encode()), 2)
+
+    def test_month_page_and_invalid_months(self):
+        self.create_post('March post', date=datetime(2024, 3, 31, 23, 59))
+        self.create_post('April post', date=datetime(2024, 4, 1))
+        self.create_post('December post', date=datetime(2023, 12, 31))
+        response = self.client.get(reverse('post-by-author-month', kwargs={
+            'username': 'alice', 'year': 2024, 'month': 3,
+        }))
+        self.assertEqual([post.title for post in response.context['posts']], ['March post'])
+        self.assertContains(response, 'Posts by alice in March 2024')
+        response = self.client.get(reverse('post-by-author-month', kwargs={
+            'username': 'alice', 'year': 2023, 'month': 12,
+        }))
+        self.assertEqual([post.title for post in response.context['posts']], ['December post'])
+        for kwargs in ({'username': 'alice', 'year': 2024, 'month': 13},
+                       {'username': 'nobody', 'year': 2024, 'month': 3}):
+            self.assertEqual(self.client.get(reverse('post-by-author-month', kwargs=kwargs)).status_code, 404)
+
+    def test_new_post_invalidates_author_page(self):
+        self.create_post('First')
+        url = reverse('post-by-author', kwargs={'username': 'alice'})
+        self.client.get(url)
+        self.create_post('Second')
+        self.assertContains(self.client.get(url), 'Second')
+
+    def test_author_query_uses_author_published_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN is SQLite specific.')
+        queryset = Post.objects.published().filter(author_id=1).order_by('-published_date')[:10]
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn('blog_post_author_live_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+from . import comment_queue
+
+@override_settings(COMMENT_QUEUE_FLUSH_INTERVAL=60, COMMENT_QUEUE_BATCH_SIZE=100)
+class CommentQueueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.post = Post.objects.create(title='Live post', content='Content', author=self.user)
+        self.url = reverse('add-comment-api', kwargs={'pk': self.post.pk})
+        self.client.login(username='testuser', password='password')
+
+    def tearDown(self):
+        # Drop anything a test left queued, and its timer.
+        comment_queue.flush()
+
+    def test_comments_are_queued_and_written_in_one_flush(self):
+        detail_url = reverse('post-detail', kwargs={'pk': self.post.pk})
+        self.client.get(detail_url)
+        for i in range(3):
+            response = self.client.post(self.url, {'content': 'Live comment %d' % i})
+            self.assertEqual(response.status_code, 202)
+            self.assertIn('Live comment %d' % i, response.json()['html'])
+        self.assertEqual((comment_queue.pending(), Comment.objects.count()), (3, 0))
+        self.assertEqual(comment_queue.flush(), 3)
+        comments = list(Comment.objects.order_by('path'))
+        self.assertEqual([c.content for c in comments], ['Live comment %d' % i for i in range(3)])
+        self.assertEqual([c.path for c in comments], [str(c.pk).zfill(10) for c in comments])
+        self.assertEqual(AuthorStat.objects.get(user=self.user).comment_count, 3)
+        self.assertContains(self.client.get(detail_url), 'Live comment 2')
+
+    def test_replies_get_thread_paths(self):
+        root = Comment.objects.create(post=self.post, author=self.user, content='root')
+        response = self.client.post(self.url, {'content': 'A reply', 'parent': root.pk})
+        self.assertEqual(response.status_code, 202)
+        comment_queue.flush()
+        reply = Comment.objects.get(content='A reply')
+        self.assertEqual((reply.parent, reply.depth), (root, 1))
+        self.assertEqual(reply.path, root.path + str(reply.pk).zfill(10))
+
+    def test_replies_past_max_depth_join_the_parent_thread(self):
+        from .models import MAX_DEPTH
+        comment = Comment.objects.create(post=self.post, author=self.user, content='root')
+        for i in range(MAX_DEPTH):
+            comment = Comment.objects.create(post=self.post, author=self.user, content='reply', parent=comment)
+        self.client.post(self.url, {'content': 'Too deep', 'parent': comment.pk})
+        comment_queue.flush()
+        reply = Comment.objects.get(content='Too deep')
+        self.assertEqual((reply.parent_id, reply.depth), (comment.parent_id, MAX_DEPTH))
+
+    @override_settings(COMMENT_QUEUE_FLUSH_INTERVAL=0)
+    def test_zero_interval_writes_immediately(self):
+        response = self.client.post(self.url, {'content': 'Right away'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['id'], Comment.objects.get(content='Right away').pk)
+
+    @override_settings(QUERY_BUDGET_RAISE=True)
+    def test_requests_stay_within_the_query_budget(self):
+        root = Comment.objects.create(post=self.post, author=self.user, content='root')
+        self.assertEqual(self.client.post(self.url, {'content': 'Queued'}).status_code, 202)
+        with override_settings(COMMENT_QUEUE_FLUSH_INTERVAL=0):
+            response = self.client.post(self.url, {'content': 'Reply', 'parent': root.pk})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Comment.objects.get(content='Reply').path, root.path + str(response.json()['id']).zfill(10))
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.post(self.url, {'content': ''}).status_code, 400)
+        self.assertEqual(self.client.post(self.url, {'content': 'Hi', 'parent': '999'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+        self.client.logout()
+        self.assertEqual(self.client.post(self.url, {'content': 'Hi'}).status_code, 401)
+        self.assertEqual(comment_queue.pending(), 0)
+
+from . import view_counts
+
+@override_settings(VIEW_COUNT_FLUSH_INTERVAL=60)
+class ViewCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Write out views left by other tests before this test's posts exist.
+        view_counts.flush()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.post = Post.objects.create(title='Popular post', content='Content', author=self.user)
+        self.other = Post.objects.create(title='Other post', content='Content', author=self.user)
+
+    def view(self, post):
+        return self.client.get(reverse('post-detail', kwargs={'pk': post.pk}))
+
+    def test_views_are_buffered_and_flushed_in_one_update(self):
+        for _ in range(3):
+            self.view(self.post)
+        self.view(self.other)
+        self.assertEqual(view_counts.pending(self.post.pk), 3)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 0)
+        self.assertEqual(view_counts.get(self.post), 3)
+        with self.assertNumQueries(1):
+            self.assertEqual(view_counts.flush(), 4)
+        self.assertEqual(dict(Post.objects.values_list('title', 'view_count')),
+                         {'Popular post': 3, 'Other post': 1})
+
+    def test_cached_pages_are_counted(self):
+        self.view(self.post)
+        with self.assertNumQueries(0):
+            self.view(self.post)
+        self.assertEqual(view_counts.pending(self.post.pk), 2)
+
+    def test_count_is_seeded_from_the_database(self):
+        Post.objects.filter(pk=self.post.pk).update(view_count=41)
+        self.post.refresh_from_db()
+        self.client.login(username='testuser', password='password')
+        self.assertContains(self.view(self.post), '41 views')
+        self.assertEqual(view_counts.get(self.post), 42)
+
+    def test_missing_posts_are_not_counted(self):
+        self.assertEqual(self.client.get(reverse('post-detail', kwargs={'pk': 999})).status_code, 404)
+        self.assertEqual(view_counts.flush(), 0)
+
+    @override_settings(VIEW_COUNT_FLUSH_INTERVAL=0)
+    def test_zero_interval_writes_immediately(self):
+        self.view(self.post)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 1)
+
+
+def tearDownModule():
+    # Nothing flushes the buffers at exit, so write out what these tests
+    # left while the test database still exists.
+    comment_queue.flush()
+    view_counts.flush()
+
+from . import autocomplete
+
+@override_settings(AUTOCOMPLETE_ASYNC=False)
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.post = Post.objects.create(title='Deploying Django', content='Content', author=self.user)
+        self.post.tags.add('Django', 'deployment')
+        Post.objects.create(title='Django tips', content='Content', author=self.user)
+        self.url = reverse('autocomplete')
+
+    def test_prefix_index_matches_word_prefixes(self):
+        index = autocomplete.PrefixIndex([('Deploying  Django', 1), ('django tips', 2), ('Docker', 3)])
+        self.assertEqual(index.search('DJA', 10), [1, 2])
+        self.assertEqual(index.search('d', 10), [1, 2, 3])
+        self.assertEqual(index.search('d', 2), [1, 2])
+        self.assertEqual(index.search('deploying dj', 10), [1])
+        self.assertEqual(index.search('  ', 10), [])
+
+    def test_suggestions_are_served_from_memory(self):
+        autocomplete.get_indexes()
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {'q': 'dep'})
+        data = response.json()
+        self.assertEqual([tag['name'] for tag in data['tags']], ['deployment'])
+        self.assertEqual([post['title'] for post in data['posts']], ['Deploying Django'])
+        self.assertEqual(data['posts'][0]['url'], reverse('post-detail', kwargs={'pk': self.post.pk}))
+        data = self.client.get(self.url, {'q': 'django', 'type': 'posts'}).json()
+        self.assertEqual(list(data), ['posts'])
+        self.assertEqual([post['title'] for post in data['posts']], ['Deploying Django', 'Django tips'])
+
+    def test_changes_refresh_the_index(self):
+        self.assertEqual(autocomplete.suggest('fl'), {'tags': [], 'posts': []})
+        post = Post.objects.create(title='Flask or Django', content='Content', author=self.user)
+        post.tags.add('flask')
+        self.assertEqual(autocomplete.suggest('fl'), {
+            'tags': [('flask', 'flask')], 'posts': [(post.pk, 'Flask or Django')],
+        })
+        Tag.objects.filter(name='flask').get().delete()
+        post.delete()
+        self.assertEqual(autocomplete.suggest('fl'), {'tags': [], 'posts': []})
+
+    def test_only_title_and_status_changes_invalidate(self):
+        version = autocomplete.current_version()
+        post = Post.objects.get(pk=self.post.pk)
+        post.content = 'New content'
+        post.save()
+        draft = Post.objects.create(title='Draft', content='Content', author=self.user, status=Post.Status.DRAFT)
+        draft.title = 'Still a draft'
+        draft.save()
+        self.assertEqual(autocomplete.current_version(), version)
+        post.title = 'Deploying Django 5'
+        post.save()
+        self.assertNotEqual(autocomplete.current_version(), version)
+        version = autocomplete.current_version()
+        draft.status = Post.Status.PUBLISHED
+        draft.save()
+        self.assertNotEqual(autocomplete.current_version(), version)
+
+    @override_settings(AUTOCOMPLETE_ASYNC=True)
+    def test_stale_indexes_are_rebuilt_in_the_background(self):
+        # A fresh process, with the worker thread run by hand; closing its
+        # connections would close the test's.
+        with mock.patch.object(autocomplete, '_indexes', None), \
+                mock.patch.object(autocomplete, 'connections'), \
+                mock.patch.object(autocomplete, '_executor') as executor:
+            with self.assertNumQueries(0):
+                self.assertEqual(autocomplete.suggest('dep'), {'tags': [], 'posts': []})
+            executor.submit.assert_called_once_with(autocomplete._rebuild)
+            autocomplete._rebuild()
+            self.assertEqual(autocomplete.suggest('dep')['posts'], [(self.post.pk, 'Deploying Django')])
+            autocomplete.invalidate()
+            with self.assertNumQueries(0):
+                self.assertEqual(autocomplete.suggest('dep')['posts'], [(self.post.pk, 'Deploying Django')])
+            self.assertEqual(executor.submit.call_count, 2)
+
+    def test_post_form_tag_widget_points_at_the_endpoint(self):
+        self.client.login(username='testuser', password='password')
+        response = self.client.get(reverse('post-create'))
+        self.assertContains(response, 'data-autocomplete="%s?type=tags"' % self.url)
+
+from importlib.util import find_spec
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.test import RequestFactory
+
+class StaticFilesTests(TestCase):
+    def test_unhashed_names_before_collectstatic(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(STATIC_ROOT=root):
+            self.assertEqual(staticfiles_storage.url('blog/styles.css'), '/static/blog/styles.css')
+
+    def test_collectstatic_hashes_and_precompresses(self):
+        from whitenoise.middleware import WhiteNoiseMiddleware
+        with tempfile.TemporaryDirectory() as root, override_settings(STATIC_ROOT=root):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            url = staticfiles_storage.url('blog/styles.css')
+            self.assertRegex(url, r'^/static/blog/styles\.[0-9a-f]{12}\.css$')
+            hashed = os.path.join(root, url[len('/static/'):])
+            self.assertTrue(os.path.exists(hashed + '.gz'))
+            if find_spec('brotli'):
+                self.assertTrue(os.path.exists(hashed + '.br'))
+
+            middleware = WhiteNoiseMiddleware(lambda request: None)
+            response = middleware(RequestFactory().get(url, HTTP_ACCEPT_ENCODING='gzip'))
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertIn('immutable', response['Cache-Control'])
+            self.assertIn('max-age=315360000', response['Cache-Control'])
+
+from . import sitemaps
+
+@override_settings(SITEMAP_CHUNK_SIZE=2)
+class SitemapTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.posts = [Post.objects.create(title='Post %d' % i, content='Content', author=self.user)
+                      for i in range(5)]
+        self.posts[0].tags.add('django')
+
+    def chunk_url(self, post):
+        return reverse('sitemap-posts', kwargs={'chunk': sitemaps.chunk_of(post.pk)})
+
+    def test_index_lists_every_chunk(self):
+        response = self.client.get(reverse('sitemap-index'))
+        self.assertEqual(response['Content-Type'], 'application/xml')
+        chunks = sorted({sitemaps.chunk_of(post.pk) for post in self.posts})
+        for chunk in chunks:
+            self.assertContains(response, 'http://testserver%s' % reverse('sitemap-posts', kwargs={'chunk': chunk}))
+        self.assertContains(response, '<sitemap>', count=len(chunks) + 1)
+
+    def test_chunk_lists_its_posts(self):
+        post = self.posts[2]
+        response = self.client.get(self.chunk_url(post))
+        in_chunk = [p for p in self.posts if sitemaps.chunk_of(p.pk) == sitemaps.chunk_of(post.pk)]
+        self.assertContains(response, '<url>', count=len(in_chunk))
+        for p in in_chunk:
+            self.assertContains(response, '<loc>http://testserver%s</loc>' % p.get_absolute_url())
+        response = self.client.get(reverse('sitemap-tags', kwargs={'chunk': 0}))
+        self.assertContains(response, reverse('post-by-tag', kwargs={'tag_slug': 'django'}))
+        self.assertEqual(self.client.get(reverse('sitemap-posts', kwargs={'chunk': 999})).status_code, 404)
+
+    def test_keyset_reads_a_chunk_in_batches(self):
+        with mock.patch.object(sitemaps, 'BATCH_SIZE', 1):
+            rows = list(sitemaps.keyset(Post.objects.values_list('id'), 'id', 0, 10 ** 9))
+        self.assertEqual([row[0] for row in rows], sorted(post.pk for post in self.posts))
+
+    def test_only_the_changed_chunk_is_rebuilt(self):
+        first, last = self.posts[0], self.posts[-1]
+        self.assertNotEqual(sitemaps.chunk_of(first.pk), sitemaps.chunk_of(last.pk))
+        first_etag = self.client.get(self.chunk_url(first))['ETag']
+        self.client.get(self.chunk_url(last))
+        with self.assertNumQueries(0):
+            response = self.client.get(self.chunk_url(first), HTTP_IF_NONE_MATCH=first_etag)
+        self.assertEqual(response.status_code, 304)
+        last.title = 'Edited'
+        last.save()
+        with self.assertNumQueries(0):
+            self.client.get(self.chunk_url(first))
+        with self.assertNumQueries(1):
+            self.client.get(self.chunk_url(last))
+
+
+from datetime import timedelta
+from django.contrib.sessions.models import Session
+from django_blog.sessions import SessionStore, is_cookie_key
+
+class SessionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='password')
+
+    def test_small_sessions_stay_in_the_cookie(self):
+        self.client.login(username='testuser', password='password')
+        self.assertTrue(is_cookie_key(self.client.session.session_key))
+        self.assertFalse(Session.objects.exists())
+        with self.assertNumQueries(1):  # The user; no session lookup.
+            response = self.client.get(reverse('profile'))
+        self.assertEqual(response.status_code, 200)
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 302)
+
+    def test_sessions_move_between_the_cookie_and_the_database(self):
+        session = SessionStore()
+        session['note'] = 'small'
+        session.save()
+        self.assertTrue(is_cookie_key(session.session_key))
+
+        session['note'] = os.urandom(2048).hex()
+        session.save()
+        key = session.session_key
+        self.assertFalse(is_cookie_key(key))
+        self.assertTrue(Session.objects.filter(session_key=key).exists())
+        with self.assertNumQueries(0):  # Read through the cache.
+            self.assertEqual(SessionStore(key)['note'], session['note'])
+
+        session['note'] = 'small again'
+        session.save()
+        self.assertTrue(is_cookie_key(session.session_key))
+        self.assertFalse(Session.objects.exists())
+        self.assertEqual(SessionStore(session.session_key)['note'], 'small again')
+
+    def test_custom_expiry_and_disabled_cookies_use_the_database(self):
+        session = SessionStore()
+        session.set_expiry(60)
+        session.save()
+        self.assertFalse(is_cookie_key(session.session_key))
+        with self.settings(SESSION_HYBRID_COOKIE_MAX_SIZE=0):
+            session = SessionStore()
+            session['note'] = 'small'
+            session.save()
+            self.assertFalse(is_cookie_key(session.session_key))
+
+    def test_tampered_cookie_starts_a_new_session(self):
+        session = SessionStore()
+        session['note'] = 'small'
+        session.save()
+        tampered = SessionStore(session.session_key[:-1] + ('A' if session.session_key[-1] != 'A' else 'B'))
+        self.assertNotIn('note', tampered)
+        self.assertIsNone(tampered.session_key)
+
+    def test_clear_expired_deletes_in_batches(self):
+        now = timezone.now()
+        Session.objects.bulk_create(
+            [Session(session_key='expired%025d' % i, session_data='', expire_date=now - timedelta(days=1))
+             for i in range(5)]
+            + [Session(session_key='live%028d' % i, session_data='', expire_date=now + timedelta(days=1))
+               for i in range(2)]
+        )
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(SessionStore.clear_expired(batch_size=2), 5)
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('DELETE')]), 3)
+        self.assertEqual(Session.objects.count(), 2)
+        out = StringIO()
+        call_command('purge_expired_sessions', stdout=out)
+        self.assertIn('Deleted 0 expired sessions', out.getvalue())
+
+from . import author_stats, publishing
+from .forms import PostForm
+
+class PublishingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.live = Post.objects.create(title='Live post', content='Content', author=self.user)
+        self.live.tags.add('django')
+        self.draft = Post.objects.create(title='Draft post', content='Content', author=self.user,
+                                         status=Post.Status.DRAFT)
+        self.draft.tags.add('django')
+        self.scheduled = Post.objects.create(title='Scheduled post', content='Content', author=self.user,
+                                             status=Post.Status.SCHEDULED,
+                                             published_date=timezone.now() - timedelta(minutes=1))
+        self.scheduled.tags.add('django', 'news')
+
+    def assertCounts(self, posts, django_posts):
+        self.assertEqual(AuthorStat.objects.get(user=self.user).post_count, posts)
+        self.assertEqual(TagStat.objects.get(tag__slug='django').post_count, django_posts)
+
+    @override_settings(AUTOCOMPLETE_ASYNC=False)
+    def test_readers_only_see_published_posts(self):
+        autocomplete.get_indexes()
+        for url in (reverse('home'), reverse('post-by-tag', kwargs={'tag_slug': 'django'}),
+                    reverse('post-by-author', kwargs={'username': 'testuser'}),
+                    reverse('post-feed-rss'), reverse('sitemap-posts', kwargs={'chunk': 0}),
+                    reverse('search') + '?q=post', reverse('autocomplete') + '?q=post'):
+            response = self.client.get(url)
+            self.assertContains(response, 'Live post' if 'sitemap' not in url else self.live.get_absolute_url())
+            self.assertNotContains(response, 'Draft post')
+            self.assertNotContains(response, 'Scheduled post')
+        self.assertEqual(self.client.get(self.draft.get_absolute_url()).status_code, 404)
+        self.client.login(username='testuser', password='password')
+        self.assertContains(self.client.get(self.draft.get_absolute_url()), 'Draft')
+        self.assertContains(self.client.get(reverse('post-drafts')), 'Scheduled post')
+
+    def test_drafts_take_no_comments(self):
+        comment = Comment.objects.create(post=self.draft, author=self.user, content='Early note')
+        self.client.login(username='testuser', password='password')
+        for url in (reverse('add-comment', kwargs={'pk': self.draft.pk}),
+                    reverse('comment-reply', kwargs={'pk': comment.pk})):
+            self.assertEqual(self.client.post(url, {'content': 'Hi'}).status_code, 404)
+        self.assertEqual(self.client.get(reverse('comment-thread', kwargs={'pk': comment.pk})).status_code, 404)
+        self.assertEqual(Comment.objects.count(), 1)
+        response = self.client.post(reverse('add-comment', kwargs={'pk': self.live.pk}), {'content': 'Hi'})
+        self.assertEqual(response.status_code, 302)
+
+    def test_only_published_posts_are_counted(self):
+        self.assertCounts(1, 1)
+        self.draft.status = Post.Status.PUBLISHED
+        self.draft.save()
+        self.assertCounts(2, 2)
+        self.draft.status = Post.Status.DRAFT
+        self.draft.save()
+        self.assertCounts(1, 1)
+        self.draft.delete()
+        self.assertCounts(1, 1)
+        tag_stats.rebuild()
+        author_stats.rebuild()
+        self.assertCounts(1, 1)
+
+    def test_publish_due_posts_in_batches(self):
+        later = Post.objects.create(title='Later post', content='Content', author=self.user,
+                                    status=Post.Status.SCHEDULED,
+                                    published_date=timezone.now() + timedelta(hours=1))
+        others = [Post.objects.create(title='Due %d' % i, content='Content', author=self.user,
+                                      status=Post.Status.SCHEDULED,
+                                      published_date=timezone.now() - timedelta(minutes=2))
+                  for i in range(2)]
+        others[0].tags.add('django')
+        self.client.get(reverse('home'))
+        with mock.patch.object(publishing.page_cache, 'invalidate',
+                               wraps=publishing.page_cache.invalidate) as invalidate:
+            self.assertEqual([post.pk for post in publishing.publish_due(batch_size=2)],
+                             [post.pk for post in others])
+        invalidate.assert_called_once()
+        self.assertIn('tag:django', invalidate.call_args.args)
+        self.assertContains(self.client.get(reverse('home')), 'Due 1')
+        self.assertCounts(3, 2)
+
+        out = StringIO()
+        call_command('publish_scheduled', stdout=out)
+        self.assertIn('Published 1 scheduled posts', out.getvalue())
+        self.assertCounts(4, 3)
+        self.assertEqual(TagStat.objects.get(tag__slug='news').post_count, 1)
+        self.assertContains(self.client.get(reverse('search') + '?q=scheduled'), 'Scheduled post')
+        later.refresh_from_db()
+        self.assertEqual(later.status, Post.Status.SCHEDULED)
+
+    def test_form_schedules_and_dates_publication(self):
+        data = {'title': 'New', 'content': 'Content', 'tags': 'django', 'status': Post.Status.SCHEDULED}
+        self.assertIn('publish_at', PostForm(data).errors)
+        past = (timezone.now() - timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M')
+        self.assertIn('publish_at', PostForm({**data, 'publish_at': past}).errors)
+        publish_at = timezone.now().replace(microsecond=0, second=0) + timedelta(days=1)
+        form = PostForm({**data, 'publish_at': timezone.localtime(publish_at).strftime('%Y-%m-%dT%H:%M')},
+                        instance=Post(author=self.user))
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.save().published_date, publish_at)
+
+        started = timezone.now()
+        form = PostForm({**data, 'status': Post.Status.PUBLISHED}, instance=self.draft)
+        self.assertTrue(form.is_valid())
+        self.assertGreaterEqual(form.save().published_date, started)
+
+import shutil
+from io import BytesIO
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from . import images
+from .models import PostImage
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, POST_IMAGE_ASYNC=False, POST_IMAGE_FORMATS=('webp', 'jpeg'))
+class PostImageTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.post = Post.objects.create(title='Photo post', content='Content', author=self.user)
+        self.image = PostImage.objects.create(post=self.post, image=self.make_image(), alt='A red square')
+
+    def make_image(self, name='photo.png', size=(1500, 1000), fmt='PNG', exif=None):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, fmt, **({'exif': exif} if exif else {}))
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/%s' % fmt.lower())
+
+    def variant_url(self, width, fmt='webp', image=None):
+        return reverse('post-image', kwargs={'pk': (image or self.image).pk, 'width': width, 'fmt': fmt})
+
+    def test_detail_page_has_lazy_srcset(self):
+        self.assertEqual((self.image.width, self.image.height), (1500, 1000))
+        response = self.client.get(self.post.get_absolute_url())
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, '%s 1500w' % self.variant_url(1500, 'jpeg'))
+        self.assertContains(response, '%s 320w' % self.variant_url(320))
+        self.assertNotContains(response, self.variant_url(1920))
+        self.assertContains(response, 'width="1500" height="1000"')
+        self.assertContains(response, 'loading="lazy"')
+        # Nothing is rendered until a browser asks for it.
+        self.assertFalse(os.path.exists(os.path.join(MEDIA_ROOT, os.path.dirname(
+            images.variant_name(self.image.image.name, 640, 'webp')))))
+
+    def test_variant_is_rendered_once_then_served_from_disk(self):
+        response = self.client.get(self.variant_url(640))
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('public', response['Cache-Control'])
+        with Image.open(BytesIO(b''.join(response.streaming_content))) as variant:
+            self.assertEqual(variant.size, (640, 427))
+        with mock.patch.object(images, 'render_variant') as render:
+            self.assertEqual(self.client.get(self.variant_url(640)).status_code, 200)
+        render.assert_not_called()
+
+    def test_variants_are_moved_into_place_whole(self):
+        name = images.variant_name(self.image.image.name, 320, 'jpeg')
+        storage = self.image.image.storage
+        with mock.patch.object(images.os, 'replace', side_effect=OSError):
+            with self.assertRaises(OSError):
+                images.generate_variant(self.image, 320, 'jpeg')
+        # Neither the variant nor the temporary file is left behind.
+        directory = os.path.dirname(storage.path(name))
+        self.assertFalse(storage.exists(name))
+        self.assertFalse([entry for entry in os.listdir(directory) if entry.startswith('.tmp-')])
+        images.generate_variant(self.image, 320, 'jpeg')
+        self.assertTrue(storage.exists(name))
+        self.assertFalse([entry for entry in os.listdir(directory) if entry.startswith('.tmp-')])
+
+    @override_settings(POST_IMAGE_FORMATS=())
+    def test_original_is_shown_without_formats(self):
+        response = self.client.get(self.post.get_absolute_url())
+        self.assertContains(response, 'src="%s"' % self.image.image.url)
+        self.assertNotContains(response, 'srcset')
+
+    @override_settings(POST_IMAGE_ASYNC=True)
+    def test_original_is_served_while_the_variant_renders(self):
+        with mock.patch.object(images._executor, 'submit') as submit:
+            response = self.client.get(self.variant_url(960, 'jpeg'))
+            self.client.get(self.variant_url(960, 'jpeg'))
+        self.assertIn('no-cache', response['Cache-Control'])
+        with Image.open(BytesIO(b''.join(response.streaming_content))) as original:
+            self.assertEqual(original.size, (1500, 1000))
+        # A second request while it renders does not queue it again.
+        submit.assert_called_once()
+        function, *args = submit.call_args.args
+        function(*args)
+        response = self.client.get(self.variant_url(960, 'jpeg'))
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_unknown_sizes_and_draft_images_are_hidden(self):
+        for url in (self.variant_url(1920), self.variant_url(333), self.variant_url(640, 'gif')):
+            self.assertEqual(self.client.get(url).status_code, 404)
+        self.post.status = Post.Status.DRAFT
+        self.post.save()
+        self.assertEqual(self.client.get(self.variant_url(640)).status_code, 404)
+        self.client.login(username='testuser', password='password')
+        response = self.client.get(self.variant_url(640))
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_upload_through_form_and_files_removed_with_post(self):
+        form = PostForm({'title': 'New', 'content': 'Content', 'tags': 'photos', 'status': Post.Status.PUBLISHED},
+                        {'images': [self.make_image('one.png'), self.make_image('two.png', (300, 200))]},
+                        instance=Post(author=self.user))
+        self.assertTrue(form.is_valid(), form.errors)
+        post = form.save()
+        uploaded = list(post.images.order_by('position'))
+        self.assertEqual([(image.position, image.width) for image in uploaded], [(0, 1500), (1, 300)])
+        self.client.get(self.variant_url(320, image=uploaded[0]))
+        storage = uploaded[0].image.storage
+        names = [uploaded[0].image.name, images.variant_name(uploaded[0].image.name, 320, 'webp')]
+        self.assertTrue(all(storage.exists(name) for name in names))
+        with self.captureOnCommitCallbacks(execute=True):
+            post.delete()
+        self.assertFalse(any(storage.exists(name) for name in names))
+
+    def test_rotated_photos_report_displayed_size(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        image = PostImage.objects.create(post=self.post, image=self.make_image('rotated.jpg', (400, 300), 'JPEG', exif))
+        self.assertEqual((image.width, image.height), (300, 400))
+        response = self.client.get(self.variant_url(300, 'jpeg', image))
+        with Image.open(BytesIO(b''.join(response.streaming_content))) as variant:
+            self.assertEqual(variant.size, (300, 400))
+
+    def test_rotated_photos_decode_at_a_large_enough_scale(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        # Stored wide, so scaling for its stored width would leave it narrower than asked.
+        image = PostImage.objects.create(post=self.post, image=self.make_image('wide.jpg', (2400, 400), 'JPEG', exif))
+        self.assertEqual((image.width, image.height), (400, 2400))
+        response = self.client.get(self.variant_url(320, 'jpeg', image))
+        with Image.open(BytesIO(b''.join(response.streaming_content))) as variant:
+            self.assertEqual(variant.size, (320, 1920))
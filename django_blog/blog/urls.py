@@ -1,6 +1,6 @@
 from django.urls import path
 from django.contrib.auth import views as auth_views
-from . import views
+from . import feeds, sitemaps, views
 
 urlpatterns = [
     path('login/', auth_views.LoginView.as_view(template_name='blog/login.html'), name='login'),
@@ -10,12 +10,29 @@ urlpatterns = [
     path('posts/', views.PostListView.as_view(), name='post-list'),
     path('post/<int:pk>/', views.PostDetailView.as_view(), name='post-detail'),
     path('post/new/', views.PostCreateView.as_view(), name='post-create'),
+    path('drafts/', views.PostDraftListView.as_view(), name='post-drafts'),
     path('post/<int:pk>/update/', views.PostUpdateView.as_view(), name='post-update'),
     path('post/<int:pk>/delete/', views.PostDeleteView.as_view(), name='post-delete'),
+    path('author/<str:username>/', views.PostByAuthorListView.as_view(), name='post-by-author'),
+    path('author/<str:username>/<int:year>/<int:month>/', views.PostByAuthorMonthListView.as_view(),
+         name='post-by-author-month'),
+    path('images/<int:pk>/<int:width>.<str:fmt>', views.post_image, name='post-image'),
     path('search/', views.search, name='search'),
+    path('autocomplete/', views.autocomplete, name='autocomplete'),
+    path('tags/', views.TagListView.as_view(), name='tag-list'),
     path('tags/<slug:tag_slug>/', views.PostByTagListView.as_view(), name='post-by-tag'),
+    path('tags/<slug:tag_slug>/feed/rss/', feeds.cached_feed(feeds.TagFeed, 'tag:{tag_slug}'), name='tag-feed-rss'),
+    path('tags/<slug:tag_slug>/feed/atom/', feeds.cached_feed(feeds.TagAtomFeed, 'tag:{tag_slug}'), name='tag-feed-atom'),
+    path('feed/rss/', feeds.cached_feed(feeds.LatestPostsFeed, 'posts'), name='post-feed-rss'),
+    path('feed/atom/', feeds.cached_feed(feeds.LatestPostsAtomFeed, 'posts'), name='post-feed-atom'),
     path('post/<int:pk>/comments/new/', views.CommentCreateView.as_view(), name='add-comment'),
+    path('post/<int:pk>/comments/api/', views.comment_create_api, name='add-comment-api'),
+    path('comment/<int:pk>/', views.CommentThreadView.as_view(), name='comment-thread'),
+    path('comment/<int:pk>/reply/', views.CommentReplyView.as_view(), name='comment-reply'),
     path('comment/<int:pk>/update/', views.CommentUpdateView.as_view(), name='comment-update'),
     path('comment/<int:pk>/delete/', views.CommentDeleteView.as_view(), name='comment-delete'),
+    path('sitemap.xml', sitemaps.index, name='sitemap-index'),
+    path('sitemap-posts-<int:chunk>.xml', sitemaps.section, {'section': 'posts'}, name='sitemap-posts'),
+    path('sitemap-tags-<int:chunk>.xml', sitemaps.section, {'section': 'tags'}, name='sitemap-tags'),
     path('', views.PostListView.as_view(), name='home'),
 ]
@@ -0,0 +1,117 @@
+"""
+Buffered post view counts.
+
+An ``UPDATE ... SET view_count = view_count + 1`` per detail page hit makes
+every view of a hot post a write on the same row, and on SQLite a write
+lock on the whole database. Instead record() only adds to an in-process
+counter, and flush() writes the summed deltas of every post viewed since
+the last flush as a single UPDATE. The first view recorded
+VIEW_COUNT_FLUSH_INTERVAL seconds or more after a flush runs the next one,
+so each process writes at most once per interval and needs no thread. A
+quiet process keeps its last views until its next view.
+
+Nothing flushes on its own when a process exits, because by then the
+connection may lead elsewhere (in tests, to the project database once the
+test database is gone). Whatever runs the process flushes explicitly: the
+gunicorn worker_exit hook in gunicorn.conf.py, and the blog tests'
+tearDownModule. Views still buffered when a process stops without it are
+lost.
+
+Pages read counts with get(), which does not touch the database: each
+post's approximate count lives in the cache, seeded from Post.view_count
+and incremented on every view by every process, so it runs ahead of the
+database by the unflushed views. Anonymous visitors get whole cached pages
+(see blog.page_cache), so the count they see is as old as the page.
+
+Settings:
+    VIEW_COUNT_FLUSH_INTERVAL  seconds views are buffered, default 10;
+                               0 writes every view straight away
+    VIEW_COUNT_CACHE_TIMEOUT   seconds to keep a cached count, default 3600
+"""
+
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.db.models import Case, F, Value, When
+
+from .models import Post
+
+CACHE_PREFIX = 'blog:views:'
+UPDATE_BATCH_SIZE = 500
+
+_lock = threading.Lock()
+_deltas = Counter()
+_last_flush = time.monotonic()
+
+
+def get_flush_interval():
+    return getattr(settings, 'VIEW_COUNT_FLUSH_INTERVAL', 10)
+
+
+def record(post_id):
+    """
+    Count one view of a post.
+    """
+    try:
+        cache.incr(CACHE_PREFIX + str(post_id))
+    except ValueError:
+        # Not cached yet; get() seeds it from the database and the buffer.
+        pass
+    with _lock:
+        _deltas[post_id] += 1
+        due = time.monotonic() - _last_flush >= get_flush_interval()
+    if due:
+        flush()
+
+
+def pending(post_id):
+    """
+    Views of a post buffered in this process.
+    """
+    with _lock:
+        return _deltas[post_id]
+
+
+def get(post):
+    """
+    Return the approximate view count of a post.
+    """
+    key = CACHE_PREFIX + str(post.pk)
+    count = cache.get(key)
+    if count is None:
+        count = post.view_count + pending(post.pk)
+        if not cache.add(key, count, getattr(settings, 'VIEW_COUNT_CACHE_TIMEOUT', 3600)):
+            # Another request seeded it first; its value has seen more views.
+            count = cache.get(key, count)
+    return count
+
+
+def flush():
+    """
+    Write the buffered views, one UPDATE per UPDATE_BATCH_SIZE posts.
+    Returns how many views were written.
+    """
+    global _last_flush
+    with _lock:
+        deltas = dict(_deltas)
+        _deltas.clear()
+        _last_flush = time.monotonic()
+    post_ids = list(deltas)
+    for start in range(0, len(post_ids), UPDATE_BATCH_SIZE):
+        batch = post_ids[start:start + UPDATE_BATCH_SIZE]
+        try:
+            # update() leaves updated_at alone, so views do not count as edits.
+            Post.objects.filter(pk__in=batch).update(view_count=F('view_count') + Case(
+                *(When(pk=post_id, then=Value(deltas[post_id])) for post_id in batch),
+                default=Value(0),
+            ))
+        except DatabaseError:
+            # Keep the unwritten views for the next flush rather than dropping them.
+            with _lock:
+                _deltas.update({post_id: deltas[post_id] for post_id in post_ids[start:]})
+            raise
+    return sum(deltas.values())
@@ -1,9 +1,22 @@
-from django.shortcuts import render, redirect
+from datetime import MAXYEAR, datetime
+
+from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
+from django.db.models import Q
+from django.http import FileResponse, Http404, JsonResponse
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.views.decorators.http import require_POST
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
-from .models import Post
-from .forms import CustomUserCreationForm, UserUpdateForm
+from django_blog.query_budget import query_budget
+from . import comment_queue, images, view_counts
+from .models import MAX_DEPTH, AuthorStat, Post, PostImage, RelatedPost, TagStat
+from .forms import CustomUserCreationForm, PostForm, UserUpdateForm
+from .keyset import KeysetPage
+from .page_cache import PageCacheMixin
 
 def register(request):
     if request.method == 'POST':
@@ -26,18 +39,79 @@ def profile(request):
         form = UserUpdateForm(instance=request.user)
     return render(request, 'blog/profile.html', {'form': form})
 
-class PostListView(ListView):
+def comment_page(request, comments, per_page):
+    after = request.GET.get('after', '')
+    return KeysetPage(comments, 'path', after if after.isdigit() else None, per_page)
+
+class PostListView(PageCacheMixin, ListView):
     model = Post
+    queryset = Post.objects.published()
     template_name = 'blog/post_list.html'  # <app>/<model>_<viewtype>.html
     context_object_name = 'posts'
     ordering = ['-published_date']
+    paginate_by = 10
+    # count + page of posts with authors + tags, session and user lookups,
+    # plus the tag cloud when it is not cached.
+    query_budget = 6
+    page_cache_namespaces = ('posts', 'tags')
+
+    def get_queryset(self):
+        # The list shows the stored excerpt, so skip loading the bodies.
+        return (super().get_queryset().select_related('author').prefetch_related('tags')
+                .defer('content', 'content_html'))
 
-class PostDetailView(DetailView):
+class PostDetailView(PageCacheMixin, DetailView):
     model = Post
+    page_cache_namespaces = ('post:{pk}',)
+
+    def get_queryset(self):
+        queryset = super().get_queryset().select_related('author')
+        # Drafts and scheduled posts are only shown to their authors.
+        if self.request.user.is_authenticated:
+            return queryset.filter(Q(status=Post.Status.PUBLISHED) | Q(author=self.request.user))
+        return queryset.published()
+
+    comments_paginate_by = 50
+    # Off for the internal renders of export_static and warm_page_cache.
+    count_views = True
+
+    def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        # Counted here so that views served from the page cache count too.
+        if self.count_views and request.method == 'GET' and response.status_code == 200:
+            view_counts.record(kwargs['pk'])
+        return response
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Only evaluated when the comments fragment is not cached.
+        context['comment_page'] = comment_page(
+            self.request, self.object.comments.select_related('author'), self.comments_paginate_by,
+        )
+        context['view_count'] = view_counts.get(self.object)
+        context['images'] = self.object.images.order_by('position', 'pk')
+        context['related_posts'] = (
+            RelatedPost.objects.filter(post=self.object, related__status=Post.Status.PUBLISHED)
+            .select_related('related')
+            .only('rank', 'related__title').order_by('rank')
+        )
+        return context
+
+class PostDraftListView(LoginRequiredMixin, ListView):
+    """
+    The current user's scheduled posts, next due first, then their drafts.
+    """
+    template_name = 'blog/post_drafts.html'
+    context_object_name = 'posts'
+    paginate_by = 20
+
+    def get_queryset(self):
+        return (Post.objects.filter(author=self.request.user).exclude(status=Post.Status.PUBLISHED)
+                .defer('content', 'content_html').order_by('-status', 'published_date'))
 
 class PostCreateView(LoginRequiredMixin, CreateView):
     model = Post
-    fields = ['title', 'content', 'tags']
+    form_class = PostForm
 
     def form_valid(self, form):
         form.instance.author = self.request.user
@@ -45,7 +119,7 @@ class PostCreateView(LoginRequiredMixin, CreateView):
 
 class PostUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     model = Post
-    fields = ['title', 'content', 'tags']
+    form_class = PostForm
 
     def form_valid(self, form):
         form.instance.author = self.request.user
@@ -69,12 +143,17 @@ class PostDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
 
 from .models import Comment
 from .forms import CommentForm
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 
 class CommentCreateView(LoginRequiredMixin, CreateView):
     model = Comment
     form_class = CommentForm
 
+    def dispatch(self, request, *args, **kwargs):
+        # Drafts and scheduled posts take no comments.
+        get_object_or_404(Post.objects.published().only('pk'), pk=kwargs['pk'])
+        return super().dispatch(request, *args, **kwargs)
+
     def form_valid(self, form):
         form.instance.author = self.request.user
         form.instance.post_id = self.kwargs['pk']
@@ -83,6 +162,77 @@ class CommentCreateView(LoginRequiredMixin, CreateView):
     def get_success_url(self):
         return reverse_lazy('post-detail', kwargs={'pk': self.kwargs['pk']})
 
+class CommentReplyView(CommentCreateView):
+    def dispatch(self, request, *args, **kwargs):
+        self.parent = get_object_or_404(Comment.objects.filter(post__status=Post.Status.PUBLISHED),
+                                        pk=kwargs['pk'])
+        return super(CommentCreateView, self).dispatch(request, *args, **kwargs)
+
+    def form_valid(self, form):
+        form.instance.parent = self.parent
+        form.instance.author = self.request.user
+        form.instance.post_id = self.parent.post_id
+        return super(CommentCreateView, self).form_valid(form)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['parent'] = self.parent
+        return context
+
+    def get_success_url(self):
+        return reverse_lazy('comment-thread', kwargs={'pk': self.parent.pk})
+
+class CommentThreadView(DetailView):
+    model = Comment
+    template_name = 'blog/comment_thread.html'
+    comments_paginate_by = 50
+
+    def get_queryset(self):
+        # Threads of drafts would show their titles.
+        return super().get_queryset().filter(post__status=Post.Status.PUBLISHED).select_related('post')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['comment_page'] = comment_page(
+            self.request, self.object.subtree().select_related('author'), self.comments_paginate_by,
+        )
+        return context
+
+# Two queries when the comment is queued. Writing it straight away
+# (COMMENT_QUEUE_FLUSH_INTERVAL = 0) adds the insert, its path, the
+# author's count and the statements opening and closing the transaction
+# or savepoint around them, and a reply adds reading its parent.
+@require_POST
+@query_budget(9)
+def comment_create_api(request, pk):
+    """
+    Queue a comment from the AJAX form and return it rendered as JSON.
+
+    The comment is written by the next flush of blog.comment_queue, so the
+    response is 202 with the rendered fragment but no comment id yet.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Log in to comment.'}, status=401)
+    post = get_object_or_404(Post.objects.published().only('pk'), pk=pk)
+    form = CommentForm(request.POST)
+    if not form.is_valid():
+        errors = form.errors.get_json_data()
+        return JsonResponse({'error': errors['content'][0]['message'], 'errors': errors}, status=400)
+    comment = form.save(commit=False)
+    comment.post = post
+    comment.author = request.user
+    comment.created_at = timezone.now()
+    parent_id = request.POST.get('parent', '')
+    if parent_id:
+        comment.parent = (Comment.objects.only('path', 'depth').filter(pk=parent_id, post=post).first()
+                          if parent_id.isdigit() else None)
+        if comment.parent is None:
+            return JsonResponse({'error': 'No such comment to reply to.'}, status=400)
+        comment.depth = min(comment.parent.depth + 1, MAX_DEPTH)
+    comment_queue.enqueue(comment)
+    html = render_to_string('blog/comment.html', {'comment': comment}, request=request)
+    return JsonResponse({'html': html, 'id': comment.pk}, status=201 if comment.pk else 202)
+
 class CommentUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     model = Comment
     form_class = CommentForm
@@ -114,30 +264,128 @@ class CommentDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     def get_success_url(self):
         return reverse_lazy('post-detail', kwargs={'pk': self.object.post.pk})
 
-from django.db.models import Q
+from django.core.paginator import Paginator
+from .autocomplete import KINDS, suggest
+from .search import SearchResults
 
 def search(request):
-    query = request.GET.get('q')
-    results = []
-    if query:
-        results = Post.objects.filter(
-            Q(title__icontains=query) | 
-            Q(content__icontains=query) |
-            Q(tags__name__icontains=query)
-        ).distinct()
-    
-    return render(request, 'blog/search_results.html', {'results': results, 'query': query})
+    query = request.GET.get('q', '')
+    paginator = Paginator(SearchResults(query), 10)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    return render(request, 'blog/search_results.html', {
+        'results': page_obj.object_list,
+        'page_obj': page_obj,
+        'is_paginated': page_obj.has_other_pages(),
+        'query': query,
+    })
 
-class PostByTagListView(ListView):
-    model = Post
-    template_name = 'blog/post_list.html'
-    context_object_name = 'posts'
-    ordering = ['-published_date']
+@query_budget(0)
+def autocomplete(request):
+    """
+    Return tag and post title suggestions for the prefix in ?q as JSON.
+    ?type=tags or ?type=posts limits them to one kind.
+    """
+    kind = request.GET.get('type')
+    suggestions = suggest(request.GET.get('q', ''), [kind] if kind in KINDS else KINDS)
+    data = {}
+    if 'tags' in suggestions:
+        data['tags'] = [{'name': name, 'slug': slug, 'url': reverse('post-by-tag', kwargs={'tag_slug': slug})}
+                        for name, slug in suggestions['tags']]
+    if 'posts' in suggestions:
+        data['posts'] = [{'id': pk, 'title': title, 'url': reverse('post-detail', kwargs={'pk': pk})}
+                         for pk, title in suggestions['posts']]
+    return JsonResponse(data)
+
+@query_budget(2)
+def post_image(request, pk, width, fmt):
+    """
+    Serve one size of a post image, rendering it on first request.
+
+    Until the variant is on disk the original is served, uncached, so the
+    next request gets the variant (see blog.images).
+    """
+    image = get_object_or_404(
+        PostImage.objects.select_related('post').only('image', 'width', 'post__status', 'post__author_id'), pk=pk,
+    )
+    published = image.post.is_published()
+    if not published and image.post.author_id != request.user.id:
+        raise Http404('No such image.')
+    if fmt not in images.get_formats() or width not in images.available_widths(image):
+        raise Http404('No such image size.')
+
+    storage = image.image.storage
+    name = images.variant_name(image.image.name, width, fmt)
+    if not storage.exists(name):
+        name = images.schedule_variant(image, width, fmt)
+    if name is None:
+        response = FileResponse(image.image.open('rb'))
+        patch_cache_control(response, no_cache=True)
+        return response
+    response = FileResponse(storage.open(name, 'rb'), content_type=images.CONTENT_TYPES[fmt])
+    # Drafts' images must not end up in shared caches.
+    patch_cache_control(response, max_age=365 * 24 * 60 * 60, immutable=True,
+                        **{'public' if published else 'private': True})
+    return response
+
+class PostByTagListView(PostListView):
+    page_cache_namespaces = ('tag:{tag_slug}', 'tags')
 
     def get_queryset(self):
-        return Post.objects.filter(tags__slug=self.kwargs.get('tag_slug'))
+        return super().get_queryset().filter(tags__slug=self.kwargs.get('tag_slug'))
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['tag'] = self.kwargs.get('tag_slug')
-        return context
\ No newline at end of file
+        return context
+
+class PostByAuthorListView(PostListView):
+    page_cache_namespaces = ('author:{username}', 'tags')
+    # As PostListView, plus the author with their counts and the archive months.
+    query_budget = 8
+
+    def get_queryset(self):
+        self.author = get_object_or_404(
+            User.objects.select_related('author_stat'), username=self.kwargs['username'],
+        )
+        return super().get_queryset().filter(author=self.author)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['author'] = self.author
+        try:
+            context['author_stat'] = self.author.author_stat
+        except AuthorStat.DoesNotExist:
+            context['author_stat'] = None
+        # Only evaluated when the archive fragment is not cached.
+        context['archive_months'] = (Post.objects.published().filter(author=self.author)
+                                     .datetimes('published_date', 'month', order='DESC'))
+        return context
+
+class PostByAuthorMonthListView(PostByAuthorListView):
+    def get_queryset(self):
+        year, month = self.kwargs['year'], self.kwargs['month']
+        if not (1 <= month <= 12 and 1 <= year < MAXYEAR):
+            raise Http404('No such month.')
+        # A date range rather than __year/__month lookups, so the
+        # (author, published_date) index bounds the scan.
+        self.month_start = timezone.make_aware(datetime(year, month, 1))
+        month_end = timezone.make_aware(datetime(year + month // 12, month % 12 + 1, 1))
+        return super().get_queryset().filter(
+            published_date__gte=self.month_start, published_date__lt=month_end,
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['archive_month'] = self.month_start
+        return context
+
+class TagListView(ListView):
+    model = TagStat
+    template_name = 'blog/tag_list.html'
+    context_object_name = 'tags'
+    paginate_by = 50
+    query_budget = 5
+
+    def get_queryset(self):
+        return (TagStat.objects.filter(post_count__gt=0).select_related('tag')
+                .order_by('-post_count', 'tag__name'))
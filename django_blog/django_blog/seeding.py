@@ -0,0 +1,46 @@
+"""
+Sampling helpers for the seed management command.
+
+Authorship, tag use and comment counts on a real blog follow power laws,
+so the seeded rows are drawn with Zipf weights and Pareto degrees rather
+than uniformly.
+"""
+
+import itertools
+import random
+
+
+def zipf_cum_weights(n, s=1.1):
+    """
+    Cumulative Zipf weights for ranks 1..n, for use with random.choices().
+    """
+    return list(itertools.accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+
+
+def power_law_degree(mean, maximum, alpha=2.0):
+    """
+    Draw a Pareto distributed degree with the given mean, capped at maximum.
+    """
+    xm = mean * (alpha - 1) / alpha
+    return min(maximum, int(random.paretovariate(alpha) * xm))
+
+
+def sample_distinct(population, cum_weights, k):
+    """
+    Draw up to k distinct items from population, weighted by cum_weights.
+    """
+    chosen = set()
+    attempts = 0
+    while len(chosen) < k and attempts < 4:
+        chosen.update(random.choices(population, cum_weights=cum_weights, k=k - len(chosen)))
+        attempts += 1
+    return chosen
+
+
+def batched(iterable, size):
+    """
+    Yield lists of up to size items from iterable.
+    """
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
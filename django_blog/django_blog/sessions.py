@@ -0,0 +1,116 @@
+"""
+Hybrid session engine: signed cookies for small sessions, cached database
+rows for the rest.
+
+With the database backend every request from a logged-in user reads its
+django_session row. Most sessions here hold nothing but the login (user
+id, backend and password hash, about 200 bytes), which fits in the cookie
+itself. So a session whose signed, compressed data is at most
+SESSION_HYBRID_COOKIE_MAX_SIZE bytes is kept in the cookie, as with
+Django's signed_cookies backend, and costs no query or cache lookup to
+load. Larger sessions, and sessions with a custom expiry (which signed
+cookies cannot honour), are stored like the cached_db backend: in the
+database, read through the cache. A session moves between the two as it
+grows or shrinks, and the key tells them apart: signed values contain
+':', database keys never do.
+
+Cookie sessions cannot be revoked on the server. Logging out clears the
+cookie in that browser, but a copy of it stays valid until it expires
+(SESSION_COOKIE_AGE), although changing the password still ends it. Set
+SESSION_HYBRID_COOKIE_MAX_SIZE to 0 to keep every session in the database.
+
+Expired rows are deleted SESSION_CLEANUP_BATCH_SIZE at a time, so
+``manage.py clearsessions`` and ``manage.py purge_expired_sessions --loop``
+never hold a long lock on the sessions table.
+
+Install with SESSION_ENGINE = 'django_blog.sessions'.
+
+Settings:
+    SESSION_HYBRID_COOKIE_MAX_SIZE  largest cookie session in bytes, default 2048
+    SESSION_CLEANUP_BATCH_SIZE      expired rows deleted per query, default 1000
+"""
+
+import time
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.core import signing
+from django.utils import timezone
+
+SALT = 'django_blog.sessions'
+
+
+def is_cookie_key(session_key):
+    return bool(session_key) and ':' in session_key
+
+
+class SessionStore(CachedDBStore):
+    def _signed(self, data):
+        """
+        Return data signed for the cookie, or None when it belongs in the database.
+        """
+        max_size = getattr(settings, 'SESSION_HYBRID_COOKIE_MAX_SIZE', 2048)
+        if not max_size or '_session_expiry' in data:
+            return None
+        value = signing.dumps(data, compress=True, salt=SALT, serializer=self.serializer)
+        return value if len(value) <= max_size else None
+
+    def load(self):
+        if not is_cookie_key(self.session_key):
+            return super().load()
+        try:
+            return signing.loads(self.session_key, salt=SALT, serializer=self.serializer,
+                                 max_age=self.get_session_cookie_age())
+        except Exception:
+            # Bad signature, expired or undecodable: start a new session.
+            self._session_key = None
+            return {}
+
+    def exists(self, session_key):
+        return not is_cookie_key(session_key) and super().exists(session_key)
+
+    def create(self):
+        signed = self._signed(self._session_cache if hasattr(self, '_session_cache') else {})
+        if signed is None:
+            super().create()
+        else:
+            self._session_key = signed
+            self.modified = True
+
+    def save(self, must_create=False):
+        data = self._get_session(no_load=must_create)
+        signed = self._signed(data)
+        if signed is not None:
+            if self.session_key and not is_cookie_key(self.session_key):
+                # The session shrank; drop its row.
+                super().delete(self.session_key)
+            self._session_key = signed
+            return
+        if is_cookie_key(self.session_key):
+            # The session outgrew the cookie; give it a database key.
+            self._session_key = None
+        super().save(must_create)
+
+    def delete(self, session_key=None):
+        if not is_cookie_key(self.session_key if session_key is None else session_key):
+            super().delete(session_key)
+
+    @classmethod
+    def clear_expired(cls, batch_size=None, pause=0.0):
+        """
+        Delete expired rows in batches, each its own short statement.
+        Returns how many were deleted.
+        """
+        batch_size = batch_size or getattr(settings, 'SESSION_CLEANUP_BATCH_SIZE', 1000)
+        model = cls.get_model_class()
+        now = timezone.now()
+        deleted = 0
+        while True:
+            keys = list(model.objects.filter(expire_date__lt=now)
+                        .values_list('session_key', flat=True)[:batch_size])
+            if not keys:
+                return deleted
+            model.objects.filter(session_key__in=keys).delete()
+            deleted += len(keys)
+            if pause:
+                time.sleep(pause)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,7 +43,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'django_blog.query_budget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -84,6 +87,31 @@ DATABASES = {
 }
 
 
+# Cache
+# The page cache generation tokens, feeds, sitemaps, autocomplete version,
+# buffered view counts and cached_db sessions all live in the default cache,
+# and invalidations only reach every worker process when that cache is
+# shared. Set REDIS_URL (e.g. redis://127.0.0.1:6379/0, needs the redis
+# package) wherever more than one process serves the site. Without it each
+# process has a private LocMemCache, which only suits runserver and tests.
+
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -120,6 +148,44 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'blog/static']
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Content-hashed, gzip/brotli precompressed files served with far-future
+# immutable cache headers, see django_blog/static_files.py.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django_blog.static_files.StaticFilesStorage'},
+}
+
+# Media files (post images)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Post image variants, rendered on first request, see blog/images.py
+POST_IMAGE_WIDTHS = (320, 640, 960, 1280, 1920)
+POST_IMAGE_FORMATS = ('webp', 'jpeg')
+POST_IMAGE_SIZES = '(max-width: 800px) 100vw, 800px'
+POST_IMAGE_ASYNC = True
+
+# Query budgets
+# Per-request SQL instrumentation, see django_blog/query_budget.py.
+# QUERY_BUDGETS maps URL names to the maximum number of queries allowed.
+# QUERY_BUDGET_RAISE makes over-budget views raise; tests enable it
+# with override_settings.
+
+QUERY_BUDGETS = {}
+QUERY_BUDGET_DEFAULT = None
+QUERY_BUDGET_RAISE = False
+
+# Sessions
+# Small sessions live in a signed cookie, larger ones in cached database
+# rows, see django_blog/sessions.py. Cookie sessions cannot be revoked
+# server-side; set SESSION_HYBRID_COOKIE_MAX_SIZE = 0 to disable them.
+# Expired rows are deleted in batches by purge_expired_sessions.
+
+SESSION_ENGINE = 'django_blog.sessions'
+SESSION_HYBRID_COOKIE_MAX_SIZE = 2048
+SESSION_CLEANUP_BATCH_SIZE = 1000
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -0,0 +1,14 @@
+"""
+gunicorn settings for the blog: ``gunicorn django_blog.wsgi`` run from this
+directory picks them up.
+"""
+
+
+def worker_exit(server, worker):
+    # Write out the comments and views buffered in the worker's memory (see
+    # blog/comment_queue.py and blog/view_counts.py), which nothing else
+    # flushes when a process exits.
+    from blog import comment_queue, view_counts
+
+    comment_queue.flush()
+    view_counts.flush()
@@ -0,0 +1,31 @@
+"""
+Generate missing or outdated profile picture thumbnails synchronously.
+
+Useful after changing PROFILE_PICTURE_SIZES or for pictures uploaded before
+the thumbnail pipeline existed.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from accounts.thumbnails import generate_variants
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Generate profile picture thumbnails for users that lack them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Regenerate thumbnails even when they are up to date.')
+
+    def handle(self, *args, **options):
+        users = User.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True)
+        count = 0
+        for user in users.only('id', 'profile_picture', 'profile_picture_variants').iterator():
+            if not options['all'] and user.profile_picture_variants.get('source') == user.profile_picture.name:
+                continue
+            generate_variants(user.pk)
+            count += 1
+        self.stdout.write('Generated thumbnails for %d users.' % count)
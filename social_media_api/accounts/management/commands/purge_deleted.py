@@ -0,0 +1,109 @@
+"""
+Hard delete soft-deleted posts and users together with their dependents.
+
+Requests only flag rows (see social_media_api/soft_delete.py); this command
+does the expensive cascade afterwards. Dependents are deleted in batches of
+--batch-size rows, each in its own short transaction, so a prolific user
+never holds a long write lock. Run it from cron or as a worker:
+
+    python manage.py purge_deleted --loop --interval 60
+"""
+
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from notifications.models import Notification
+from posts.models import Post, Comment, Like
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Purge soft-deleted posts and users and their dependents in bounded batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--grace-seconds', type=int, default=0,
+                            help='Only purge rows deleted at least this long ago.')
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Seconds to sleep between batches.')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running, purging every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=60.0)
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.pause = options['pause']
+        self.post_type = ContentType.objects.get_for_model(Post)
+        self.user_type = ContentType.objects.get_for_model(User)
+        while True:
+            cutoff = timezone.now() - timedelta(seconds=options['grace_seconds'])
+            posts, users = self.purge(cutoff)
+            if posts or users or options['verbosity'] > 1:
+                self.stdout.write('Purged %d posts and %d users.' % (posts, users))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
+
+    def purge(self, cutoff):
+        post_ids = list(
+            Post._base_manager.filter(deleted_at__lte=cutoff).values_list('id', flat=True)
+        )
+        for post_id in post_ids:
+            self.purge_post(post_id)
+        user_ids = list(
+            User._base_manager.filter(deleted_at__lte=cutoff).values_list('id', flat=True)
+        )
+        for user_id in user_ids:
+            self.purge_user(user_id)
+        return len(post_ids), len(user_ids)
+
+    def delete_in_batches(self, queryset):
+        """
+        Delete the rows matched by queryset batch_size at a time.
+        """
+        model = queryset.model
+        total = 0
+        while True:
+            with transaction.atomic():
+                ids = list(queryset.values_list('pk', flat=True)[:self.batch_size])
+                if not ids:
+                    return total
+                model._base_manager.filter(pk__in=ids).delete()
+            total += len(ids)
+            if self.pause:
+                time.sleep(self.pause)
+
+    def purge_post(self, post_id):
+        self.delete_in_batches(Comment._base_manager.filter(post_id=post_id))
+        self.delete_in_batches(Like._base_manager.filter(post_id=post_id))
+        self.delete_in_batches(Notification._base_manager.filter(
+            target_content_type=self.post_type, target_object_id=post_id,
+        ))
+        with transaction.atomic():
+            Post._base_manager.filter(pk=post_id).delete()
+
+    def purge_user(self, user_id):
+        post_ids = list(Post._base_manager.filter(author_id=user_id).values_list('id', flat=True))
+        for post_id in post_ids:
+            self.purge_post(post_id)
+        self.delete_in_batches(Comment._base_manager.filter(author_id=user_id))
+        self.delete_in_batches(Like._base_manager.filter(user_id=user_id))
+        self.delete_in_batches(Notification._base_manager.filter(
+            Q(recipient_id=user_id) | Q(actor_id=user_id)
+            | Q(target_content_type=self.user_type, target_object_id=user_id)
+        ))
+        Follow = User.following.through
+        self.delete_in_batches(Follow.objects.filter(
+            Q(from_customuser_id=user_id) | Q(to_customuser_id=user_id)
+        ))
+        # What is left (token, group and permission rows) is small.
+        with transaction.atomic():
+            User._base_manager.filter(pk=user_id).delete()
@@ -0,0 +1,194 @@
+"""
+Seed the database with synthetic users, follows, posts, likes and notifications.
+
+Follower counts and post authorship follow a power law so a handful of users
+are very popular, which is what the feed and notification queries have to
+cope with in practice. Rows are inserted with bulk_create in batches, each
+batch in its own transaction, and the follow M2M through rows are inserted
+directly.
+
+    python manage.py seed --users 10000 --posts 100000 --follows 200000 --likes 500000
+"""
+
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from notifications.models import Notification
+from posts.models import Post, Like
+from social_media_api.seeding import zipf_cum_weights, power_law_degree, sample_distinct, batched
+
+User = get_user_model()
+
+WORDS = (
+    'django api feed post like follow social network python data query index '
+    'cache page user profile comment share update story photo travel food music '
+    'code design coffee weekend launch team build test deploy release'
+).split()
+
+
+def sentence(words):
+    return ' '.join(random.choices(WORDS, k=words)).capitalize()
+
+
+class Command(BaseCommand):
+    help = 'Seed the database with synthetic social data for benchmarking.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--follows', type=int, default=20000,
+                            help='Approximate number of follow edges.')
+        parser.add_argument('--likes', type=int, default=20000,
+                            help='Approximate number of likes.')
+        parser.add_argument('--no-notifications', action='store_true',
+                            help='Skip the notifications created for follows and likes.')
+        parser.add_argument('--prefix', default='seed',
+                            help='Username prefix; users are named <prefix>_<n>.')
+        parser.add_argument('--password', default='password123',
+                            help='Password set on every seeded user.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--random-seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        random.seed(options['random_seed'])
+        self.batch_size = options['batch_size']
+        self.notify = not options['no_notifications']
+        started = time.perf_counter()
+
+        user_ids = self.create_users(options['users'], options['prefix'], options['password'])
+        # Shuffle so popularity rank is unrelated to id order.
+        random.shuffle(user_ids)
+        user_weights = zipf_cum_weights(len(user_ids))
+
+        self.create_follows(user_ids, user_weights, options['follows'])
+        post_ids = self.create_posts(user_ids, user_weights, options['posts'])
+        self.create_likes(user_ids, post_ids, options['likes'])
+
+        self.stdout.write(self.style.SUCCESS(
+            'Seeded in %.1fs.' % (time.perf_counter() - started)
+        ))
+
+    def insert(self, items, build, label):
+        """
+        Insert rows built from items in batches, one transaction per batch.
+
+        build(batch) returns (model, objects, bulk_create kwargs) tuples so
+        rows that belong together (a like and its notification) share a
+        transaction. The count reported is that of the first model's rows.
+        """
+        count = 0
+        for batch in batched(items, self.batch_size):
+            with transaction.atomic():
+                rows = build(batch)
+                for model, objects, kwargs in rows:
+                    model.objects.bulk_create(objects, batch_size=self.batch_size, **kwargs)
+            count += len(rows[0][1])
+        self.stdout.write('  %s: %d' % (label, count))
+        return count
+
+    def create_users(self, count, prefix, password):
+        # Hashing is deliberately slow, so every seeded user shares one hash.
+        password_hash = make_password(password)
+        # Soft-deleted users still hold their usernames.
+        start = User.all_objects.filter(username__startswith=prefix + '_').count()
+        self.insert(range(start, start + count), lambda batch: [(User, [
+            User(
+                username='%s_%d' % (prefix, i),
+                email='%s_%d@example.com' % (prefix, i),
+                password=password_hash,
+                bio=sentence(8),
+            )
+            for i in batch
+        ], {})], 'users')
+        return list(
+            User.objects.filter(username__startswith=prefix + '_').values_list('id', flat=True)
+        )
+
+    def new_pairs(self, model, source_field, target_field, batch):
+        """
+        Return the (source, target) pairs of batch that are not rows of model
+        yet, so a re-run only notifies about the rows it inserts.
+        """
+        existing = set(model._base_manager.filter(**{
+            source_field + '__in': {pair[0] for pair in batch},
+            target_field + '__in': {pair[1] for pair in batch},
+        }).values_list(source_field, target_field))
+        return [pair for pair in batch if pair[:2] not in existing]
+
+    def edges(self, sources, targets, cum_weights, total, exclude_self=False):
+        """
+        Yield up to total (source, target) pairs with power-law out-degrees
+        and Zipf-weighted targets, distinct per source.
+        """
+        mean = total / max(len(sources), 1)
+        emitted = 0
+        for source in sources:
+            degree = power_law_degree(mean, len(targets) - 1)
+            exclude = source if exclude_self else None
+            for target in sample_distinct(targets, cum_weights, degree, exclude=exclude):
+                yield source, target
+                emitted += 1
+                if emitted >= total:
+                    return
+
+    def create_follows(self, user_ids, user_weights, total):
+        Follow = User.following.through
+        user_type = ContentType.objects.get_for_model(User)
+
+        def build(batch):
+            batch = self.new_pairs(Follow, 'from_customuser_id', 'to_customuser_id', batch)
+            rows = [(Follow, [
+                Follow(from_customuser_id=follower, to_customuser_id=followed)
+                for follower, followed in batch
+            ], {'ignore_conflicts': True})]
+            if self.notify:
+                rows.append((Notification, [
+                    Notification(
+                        recipient_id=followed, actor_id=follower, verb='followed',
+                        target_content_type=user_type, target_object_id=followed,
+                    )
+                    for follower, followed in batch
+                ], {}))
+            return rows
+
+        self.insert(self.edges(user_ids, user_ids, user_weights, total, exclude_self=True),
+                    build, 'follows')
+
+    def create_posts(self, user_ids, user_weights, total):
+        authors = random.choices(user_ids, cum_weights=user_weights, k=total)
+        last_id = Post.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        self.insert(authors, lambda batch: [(Post, [
+            Post(author_id=author, title=sentence(6), content=sentence(60))
+            for author in batch
+        ], {})], 'posts')
+        return list(Post.objects.filter(id__gt=last_id).values_list('id', 'author_id'))
+
+    def create_likes(self, user_ids, posts, total):
+        if not posts:
+            return
+        post_type = ContentType.objects.get_for_model(Post)
+        post_weights = zipf_cum_weights(len(posts), s=0.9)
+
+        def build(batch):
+            batch = [(user, post_id, author_id) for user, (post_id, author_id) in batch]
+            batch = self.new_pairs(Like, 'user_id', 'post_id', batch)
+            rows = [(Like, [
+                Like(user_id=user, post_id=post_id) for user, post_id, _ in batch
+            ], {'ignore_conflicts': True})]
+            if self.notify:
+                rows.append((Notification, [
+                    Notification(
+                        recipient_id=author_id, actor_id=user, verb='liked',
+                        target_content_type=post_type, target_object_id=post_id,
+                    )
+                    for user, post_id, author_id in batch
+                ], {}))
+            return rows
+
+        self.insert(self.edges(user_ids, posts, post_weights, total), build, 'likes')
@@ -1,10 +1,39 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
+from django.utils import timezone
+from social_media_api.soft_delete import HideDeletedMixin, SoftDeleteModel, SoftDeleteQuerySet
 
-class CustomUser(AbstractUser):
+class CustomUserQuerySet(SoftDeleteQuerySet):
+    def delete(self):
+        """
+        Soft delete and deactivate every user in the queryset, as
+        CustomUser.delete() does for one.
+        """
+        return self.update(deleted_at=timezone.now(), is_active=False)
+
+class CustomUserManager(HideDeletedMixin, UserManager.from_queryset(CustomUserQuerySet)):
+    deleted_lookups = ('deleted_at',)
+
+    def get_by_natural_key(self, username):
+        # Deleted users keep their username, so createsuperuser must still
+        # see them; authentication rejects them because they are inactive.
+        return self.model.all_objects.db_manager(self.db).get_by_natural_key(username)
+
+class CustomUser(AbstractUser, SoftDeleteModel):
     bio = models.TextField(blank=True, null=True)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+    # Thumbnail names filled in by accounts.thumbnails after an upload.
+    profile_picture_variants = models.JSONField(default=dict, blank=True, editable=False)
     following = models.ManyToManyField('self', symmetrical=False, related_name='followers', blank=True)
 
+    objects = CustomUserManager()
+    all_objects = UserManager()
+
     def __str__(self):
         return self.username
+
+    def delete(self, using=None, keep_parents=False):
+        # Deactivating also stops token and session authentication.
+        self.is_active = False
+        self.deleted_at = timezone.now()
+        self.save(using=using, update_fields=['is_active', 'deleted_at'])
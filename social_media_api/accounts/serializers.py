@@ -1,13 +1,36 @@
 from rest_framework import serializers
 from rest_framework.authtoken.models import Token
+from rest_framework.validators import UniqueValidator
 from django.contrib.auth import get_user_model
+from .thumbnails import variant_urls
 
 User = get_user_model()
 
+# Soft-deleted users keep their usernames, so uniqueness is checked against
+# every row rather than the default manager, which hides them.
+_username = User._meta.get_field('username')
+USERNAME_KWARGS = {'validators': [
+    *_username.validators,
+    UniqueValidator(queryset=User.all_objects.all(), message=_username.error_messages['unique']),
+]}
+
 class UserSerializer(serializers.ModelSerializer):
+    profile_picture_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'bio', 'profile_picture', 'followers']
+        fields = ['id', 'username', 'email', 'bio', 'profile_picture', 'profile_picture_variants', 'followers']
+        extra_kwargs = {'username': USERNAME_KWARGS}
+
+    def get_profile_picture_variants(self, obj):
+        urls = variant_urls(obj)
+        request = self.context.get('request')
+        if request is None:
+            return urls
+        return {
+            size: {fmt: request.build_absolute_uri(url) for fmt, url in formats.items()}
+            for size, formats in urls.items()
+        }
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField()
@@ -15,7 +38,7 @@ class RegisterSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['username', 'email', 'password', 'bio', 'profile_picture']
-        extra_kwargs = {'password': {'write_only': True}}
+        extra_kwargs = {'password': {'write_only': True}, 'username': USERNAME_KWARGS}
 
     def create(self, validated_data):
         user = get_user_model().objects.create_user(
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .models import CustomUser
+from .thumbnails import schedule_variants
+
+
+@receiver(post_save, sender=CustomUser)
+def generate_profile_picture_variants(sender, instance, update_fields=None, **kwargs):
+    """
+    Queue thumbnail generation when a user's profile picture changes.
+    """
+    if update_fields is not None and 'profile_picture' not in update_fields:
+        return
+    if not instance.profile_picture:
+        return
+    if (instance.profile_picture_variants or {}).get('source') == instance.profile_picture.name:
+        return
+    schedule_variants(instance)
@@ -2,6 +2,7 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
+from rest_framework.authtoken.models import Token
 
 User = get_user_model()
 
@@ -26,3 +27,117 @@ class FollowAPITests(APITestCase):
         response = self.client.post(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertFalse(self.user2 in self.user1.following.all())
+
+from django.core.management import call_command
+from io import StringIO
+from notifications.models import Notification
+from posts.models import Post, Like
+
+class SeedCommandTests(APITestCase):
+    def test_seed_creates_rows(self):
+        call_command('seed', users=30, posts=60, follows=100, likes=100,
+                     random_seed=1, stdout=StringIO())
+        self.assertEqual(User.objects.filter(username__startswith='seed_').count(), 30)
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertTrue(Like.objects.exists())
+        self.assertTrue(User.following.through.objects.exists())
+        user = User.objects.get(username='seed_0')
+        self.assertTrue(user.check_password('password123'))
+
+    def test_rerun_notifies_only_new_rows(self):
+        for _ in range(2):
+            call_command('seed', users=20, posts=40, follows=100, likes=100,
+                         random_seed=1, stdout=StringIO())
+        notifications = Notification.objects.all()
+        self.assertEqual(notifications.filter(verb='followed').count(),
+                         User.following.through.objects.count())
+        self.assertEqual(notifications.filter(verb='liked').count(), Like.objects.count())
+
+class ProfileDeleteTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='user1', password='password')
+        self.client.force_authenticate(user=self.user)
+
+    def test_delete_profile_soft_deletes(self):
+        response = self.client.delete(reverse('profile'))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(User.objects.filter(username='user1').exists())
+        user = User.all_objects.get(username='user1')
+        self.assertIsNotNone(user.deleted_at)
+        self.assertFalse(user.is_active)
+
+    def test_bulk_delete_revokes_token(self):
+        token = Token.objects.create(user=self.user)
+        self.client.force_authenticate(user=None)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        self.assertEqual(self.client.get(reverse('profile')).status_code, status.HTTP_200_OK)
+        User.objects.filter(pk=self.user.pk).delete()
+        self.assertFalse(User.all_objects.get(pk=self.user.pk).is_active)
+        self.assertEqual(self.client.get(reverse('profile')).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.client.get(reverse('post_feed')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_username_stays_taken(self):
+        self.user.delete()
+        response = self.client.post(reverse('register'), {'username': 'user1', 'password': 'password'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('username', response.data)
+        other = User.objects.create_user(username='user2', password='password')
+        self.client.force_authenticate(user=other)
+        response = self.client.put(reverse('profile'), {'username': 'user1'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+import shutil
+import tempfile
+from io import BytesIO
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, PROFILE_PICTURE_ASYNC=False)
+class ProfilePictureTests(APITestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def make_image(self, name='avatar.png', size=(900, 600)):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def test_upload_generates_variants(self):
+        user = User.objects.create_user(username='user1', password='password')
+        self.client.force_authenticate(user=user)
+        response = self.client.put(reverse('profile'), {'profile_picture': self.make_image()}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        variants = user.profile_picture_variants
+        self.assertEqual(variants['source'], user.profile_picture.name)
+        self.assertEqual(sorted(variants['sizes']), ['128', '48', '512'])
+        with user.profile_picture.storage.open(variants['sizes']['48']['webp']) as thumb:
+            self.assertEqual(Image.open(thumb).size, (48, 48))
+
+        response = self.client.get(reverse('profile'))
+        urls = response.data['profile_picture_variants']
+        self.assertTrue(urls['128']['jpeg'].startswith('/media/profile_pics/thumbs/'))
+
+    def test_replacing_picture_removes_old_variants(self):
+        user = User.objects.create_user(username='user1', password='password')
+        user.profile_picture = self.make_image('first.png')
+        user.save()
+        user.refresh_from_db()
+        old_name = user.profile_picture_variants['sizes']['48']['jpeg']
+        user.profile_picture = self.make_image('second.png')
+        user.save()
+        user.refresh_from_db()
+        storage = user.profile_picture.storage
+        self.assertFalse(storage.exists(old_name))
+        self.assertTrue(storage.exists(user.profile_picture_variants['sizes']['48']['jpeg']))
+
+    def test_no_picture_has_no_variants(self):
+        user = User.objects.create_user(username='user1', password='password')
+        self.client.force_authenticate(user=user)
+        response = self.client.get(reverse('profile'))
+        self.assertEqual(response.data['profile_picture_variants'], {})
@@ -0,0 +1,139 @@
+"""
+Profile picture thumbnail variants.
+
+Avatars are shown at a few fixed sizes, so instead of serving the uploaded
+original everywhere we render each size once, in WebP and JPEG, and store
+the resulting names on the user. Generation runs on a small background
+thread pool after the upload's transaction commits, so the request that
+uploads a picture never pays for the resizing.
+
+Settings:
+    PROFILE_PICTURE_SIZES    square sizes in pixels, default (48, 128, 512)
+    PROFILE_PICTURE_FORMATS  output formats, default ('webp', 'jpeg')
+    PROFILE_PICTURE_ASYNC    generate in the background, default True
+"""
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+SAVE_OPTIONS = {
+    'webp': {'quality': 80, 'method': 4},
+    'jpeg': {'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='thumbnails')
+
+
+def get_sizes():
+    return sorted(getattr(settings, 'PROFILE_PICTURE_SIZES', (48, 128, 512)), reverse=True)
+
+
+def get_formats():
+    formats = getattr(settings, 'PROFILE_PICTURE_FORMATS', ('webp', 'jpeg'))
+    return [fmt for fmt in formats if fmt != 'webp' or features.check('webp')]
+
+
+def variant_name(source_name, size, fmt):
+    directory, filename = os.path.split(source_name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, 'thumbs', '%s_%d.%s' % (stem, size, EXTENSIONS[fmt]))
+
+
+def render_variants(image_file):
+    """
+    Yield (size, format, bytes) for every configured size and format.
+
+    The source is decoded once, largest size first, and each smaller size
+    is resized from the previous one rather than from the original.
+    """
+    sizes = get_sizes()
+    formats = get_formats()
+    with Image.open(image_file) as source:
+        # JPEG can decode at a reduced scale, which saves most of the work.
+        source.draft('RGB', (sizes[0] * 2, sizes[0] * 2))
+        image = ImageOps.exif_transpose(source).convert('RGB')
+    image = ImageOps.fit(image, (sizes[0], sizes[0]), Image.LANCZOS)
+    for size in sizes:
+        if image.width != size:
+            image = image.resize((size, size), Image.LANCZOS)
+        for fmt in formats:
+            buffer = BytesIO()
+            image.save(buffer, fmt.upper(), **SAVE_OPTIONS[fmt])
+            yield size, fmt, buffer.getvalue()
+
+
+def generate_variants(user_id):
+    """
+    Render and store the thumbnails for a user's current profile picture.
+    """
+    from .models import CustomUser
+
+    user = CustomUser._base_manager.filter(pk=user_id).first()
+    if user is None or not user.profile_picture:
+        return
+    source_name = user.profile_picture.name
+    storage = user.profile_picture.storage
+    variants = {}
+    with storage.open(source_name, 'rb') as image_file:
+        for size, fmt, data in render_variants(image_file):
+            name = variant_name(source_name, size, fmt)
+            if storage.exists(name):
+                storage.delete(name)
+            variants.setdefault(str(size), {})[fmt] = storage.save(name, ContentFile(data))
+
+    old_variants = user.profile_picture_variants or {}
+    # Only record the variants if the picture was not replaced meanwhile.
+    updated = CustomUser._base_manager.filter(pk=user_id, profile_picture=source_name).update(
+        profile_picture_variants={'source': source_name, 'sizes': variants},
+    )
+    if updated and old_variants.get('source') != source_name:
+        for formats in old_variants.get('sizes', {}).values():
+            for name in formats.values():
+                storage.delete(name)
+
+
+def _generate_in_background(user_id):
+    try:
+        generate_variants(user_id)
+    except Exception:
+        logger.exception('Thumbnail generation failed for user %s', user_id)
+    finally:
+        # The worker thread opened its own connections.
+        connections.close_all()
+
+
+def schedule_variants(user):
+    """
+    Queue thumbnail generation for user once the current transaction commits.
+    """
+    if not getattr(settings, 'PROFILE_PICTURE_ASYNC', True):
+        generate_variants(user.pk)
+        return
+    user_id = user.pk
+    transaction.on_commit(lambda: _executor.submit(_generate_in_background, user_id))
+
+
+def variant_urls(user):
+    """
+    Return {size: {format: url}} for the user's generated thumbnails.
+
+    Empty until the background job has finished for the current picture.
+    """
+    variants = user.profile_picture_variants or {}
+    if not user.profile_picture or variants.get('source') != user.profile_picture.name:
+        return {}
+    storage = user.profile_picture.storage
+    return {
+        size: {fmt: storage.url(name) for fmt, name in formats.items()}
+        for size, formats in variants.get('sizes', {}).items()
+    }
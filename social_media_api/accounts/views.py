@@ -41,6 +41,11 @@ class ProfileView(APIView):
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def delete(self, request):
+        # Soft delete: the account disappears at once, purge_deleted removes its data later.
+        request.user.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 from notifications.models import Notification
 
 class FollowUserView(generics.GenericAPIView):
@@ -0,0 +1,295 @@
+"""
+Load test for the social_media_api endpoints.
+
+Drives the register, login, feed, like and notifications flows with
+concurrent clients and writes requests per second plus p50/p95/p99
+latencies per flow to a JSON file, so runs can be compared against a
+stored baseline.
+
+Seed the database first, then either point the script at a running server
+or let it start one:
+
+    python manage.py seed --users 10000 --posts 100000 --follows 200000 --likes 500000
+    python loadtest.py --start-server --clients 32 --duration 60 --output results.json
+    python loadtest.py --start-server --baseline results.json
+
+Only the standard library is used so the script runs anywhere the project does.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlencode, urlsplit
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_MIX = 'feed=5,like=2,notifications=2,login=1,register=0.2'
+
+
+def percentile(sorted_values, pct):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+class Stats:
+    """
+    Thread-safe latency and error collection per flow.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, flow, latency, ok):
+        with self.lock:
+            self.latencies.setdefault(flow, []).append(latency)
+            if not ok:
+                self.errors[flow] = self.errors.get(flow, 0) + 1
+
+    def summary(self, elapsed):
+        flows = {}
+        all_latencies = []
+        for flow, values in sorted(self.latencies.items()):
+            values.sort()
+            all_latencies.extend(values)
+            flows[flow] = self.describe(values, self.errors.get(flow, 0), elapsed)
+        all_latencies.sort()
+        return {
+            'total': self.describe(all_latencies, sum(self.errors.values()), elapsed),
+            'flows': flows,
+        }
+
+    @staticmethod
+    def describe(values, errors, elapsed):
+        ms = lambda seconds: round(seconds * 1000, 2) if seconds is not None else None
+        return {
+            'requests': len(values),
+            'errors': errors,
+            'rps': round(len(values) / elapsed, 2) if elapsed else 0,
+            'mean_ms': ms(sum(values) / len(values)) if values else None,
+            'p50_ms': ms(percentile(values, 50)),
+            'p95_ms': ms(percentile(values, 95)),
+            'p99_ms': ms(percentile(values, 99)),
+            'max_ms': ms(values[-1]) if values else None,
+        }
+
+
+class Client:
+    """
+    One simulated user holding a keep-alive connection and an auth token.
+    """
+
+    def __init__(self, base_url, stats, username, password, max_post_id):
+        parts = urlsplit(base_url)
+        connection_class = (
+            http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        )
+        self.connection = connection_class(parts.hostname, parts.port, timeout=30)
+        self.stats = stats
+        self.username = username
+        self.password = password
+        self.max_post_id = max_post_id
+        self.token = None
+
+    def request(self, flow, method, path, data=None, expected=(200,)):
+        headers = {'Accept': 'application/json'}
+        body = None
+        if data is not None:
+            body = urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if self.token:
+            headers['Authorization'] = 'Token %s' % self.token
+        start = time.perf_counter()
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            payload = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            payload, status = b'', 0
+        self.stats.record(flow, time.perf_counter() - start, status in expected)
+        return status, payload
+
+    def login(self):
+        status, payload = self.request('login', 'POST', '/accounts/login/', {
+            'username': self.username, 'password': self.password,
+        })
+        if status == 200:
+            self.token = json.loads(payload)['token']
+
+    def register(self):
+        username = 'bench_%s' % uuid.uuid4().hex[:12]
+        self.request('register', 'POST', '/accounts/register/', {
+            'username': username, 'email': '%s@example.com' % username, 'password': 'password123',
+        }, expected=(201,))
+
+    def feed(self):
+        self.request('feed', 'GET', '/api/feed/')
+
+    def like(self):
+        post_id = random.randint(1, self.max_post_id)
+        # Liking an already liked post is a normal 400; a missing post is 404.
+        self.request('like', 'POST', '/api/posts/%d/like/' % post_id, expected=(200, 400, 404))
+
+    def notifications(self):
+        self.request('notifications', 'GET', '/notifications/')
+
+    def run(self, mix, deadline):
+        self.login()
+        flows, weights = zip(*mix)
+        while time.monotonic() < deadline:
+            getattr(self, random.choices(flows, weights=weights)[0])()
+        self.connection.close()
+
+
+def parse_mix(value):
+    mix = []
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        if name not in ('feed', 'like', 'notifications', 'login', 'register'):
+            raise argparse.ArgumentTypeError('unknown flow %r' % name)
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+def wait_for_server(base_url, timeout):
+    parts = urlsplit(base_url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=2)
+            connection.request('GET', '/api/posts/')
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit('Server at %s did not come up within %ss' % (base_url, timeout))
+
+
+def start_server(args):
+    parts = urlsplit(args.base_url)
+    env = dict(os.environ, ALLOWED_HOSTS='localhost,127.0.0.1')
+    bind = '%s:%s' % (parts.hostname, parts.port)
+    if args.server == 'gunicorn':
+        command = ['gunicorn', 'social_media_api.wsgi', '--bind', bind,
+                   '--workers', str(args.workers), '--log-level', 'warning']
+    else:
+        command = [sys.executable, 'manage.py', 'runserver', bind, '--noreload']
+    return subprocess.Popen(command, cwd=BASE_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def discover_max_post_id(base_url):
+    parts = urlsplit(base_url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=10)
+    connection.request('GET', '/api/posts/', headers={'Accept': 'application/json'})
+    results = json.loads(connection.getresponse().read()).get('results') or []
+    return max((post['id'] for post in results), default=1)
+
+
+def compare(results, baseline_path, tolerance):
+    """
+    Print per-flow changes against a baseline file and return the number of
+    flows whose p95 latency regressed by more than tolerance percent.
+    """
+    with open(baseline_path) as handle:
+        baseline = json.load(handle)
+    regressions = 0
+    for flow, current in results['summary']['flows'].items():
+        previous = baseline['summary']['flows'].get(flow)
+        if not previous or not previous['p95_ms'] or current['p95_ms'] is None:
+            continue
+        change = (current['p95_ms'] - previous['p95_ms']) / previous['p95_ms'] * 100
+        flag = ''
+        if change > tolerance:
+            regressions += 1
+            flag = '  REGRESSION'
+        print('%-14s p95 %8.2fms -> %8.2fms (%+.1f%%), rps %8.2f -> %8.2f%s' % (
+            flow, previous['p95_ms'], current['p95_ms'], change,
+            previous['rps'], current['rps'], flag,
+        ))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--base-url', default='http://localhost:8000')
+    parser.add_argument('--start-server', action='store_true',
+                        help='Start a local server for the duration of the run.')
+    parser.add_argument('--server', choices=['runserver', 'gunicorn'], default='runserver')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers.')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run.')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help='Weighted flows, default %s.' % DEFAULT_MIX)
+    parser.add_argument('--prefix', default='seed', help='Prefix used by manage.py seed.')
+    parser.add_argument('--users', type=int, default=1000,
+                        help='Number of seeded users clients log in as.')
+    parser.add_argument('--password', default='password123')
+    parser.add_argument('--output', default='loadtest-results.json')
+    parser.add_argument('--baseline', help='Previous results file to compare against.')
+    parser.add_argument('--tolerance', type=float, default=10.0,
+                        help='Allowed p95 regression in percent before failing.')
+    args = parser.parse_args(argv)
+
+    server = start_server(args) if args.start_server else None
+    try:
+        wait_for_server(args.base_url, timeout=30)
+        max_post_id = discover_max_post_id(args.base_url)
+        stats = Stats()
+        deadline = time.monotonic() + args.duration
+        clients = [
+            Client(args.base_url, stats, '%s_%d' % (args.prefix, random.randrange(args.users)),
+                   args.password, max_post_id)
+            for _ in range(args.clients)
+        ]
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=args.clients) as pool:
+            for future in [pool.submit(client.run, args.mix, deadline) for client in clients]:
+                future.result()
+        elapsed = time.monotonic() - started
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    results = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'base_url': args.base_url,
+        'server': args.server if args.start_server else 'external',
+        'clients': args.clients,
+        'duration_s': round(elapsed, 2),
+        'mix': dict(args.mix),
+        'summary': stats.summary(elapsed),
+    }
+    with open(args.output, 'w') as handle:
+        json.dump(results, handle, indent=2)
+
+    total = results['summary']['total']
+    print('%d requests, %d errors, %.1f req/s, p50 %sms, p95 %sms, p99 %sms -> %s' % (
+        total['requests'], total['errors'], total['rps'],
+        total['p50_ms'], total['p95_ms'], total['p99_ms'], args.output,
+    ))
+    if args.baseline and compare(results, args.baseline, args.tolerance):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
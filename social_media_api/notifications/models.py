@@ -2,6 +2,10 @@ from django.db import models
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from social_media_api.soft_delete import HideDeletedManager
+
+class NotificationManager(HideDeletedManager):
+    deleted_lookups = ('recipient__deleted_at', 'actor__deleted_at')
 
 class Notification(models.Model):
     recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notifications')
@@ -13,5 +17,7 @@ class Notification(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     read = models.BooleanField(default=False)
 
+    objects = NotificationManager()
+
     def __str__(self):
         return f"{self.actor} {self.verb} {self.target} for {self.recipient}"
@@ -1,13 +1,26 @@
 from django.db import models
 from django.conf import settings
+from social_media_api.soft_delete import HideDeletedManager, SoftDeleteManager, SoftDeleteModel
 
-class Post(models.Model):
+class PostManager(SoftDeleteManager):
+    deleted_lookups = ('deleted_at', 'author__deleted_at')
+
+class CommentManager(HideDeletedManager):
+    deleted_lookups = ('author__deleted_at', 'post__deleted_at', 'post__author__deleted_at')
+
+class LikeManager(HideDeletedManager):
+    deleted_lookups = ('user__deleted_at', 'post__deleted_at', 'post__author__deleted_at')
+
+class Post(SoftDeleteModel):
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='posts')
     title = models.CharField(max_length=255)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PostManager()
+    all_objects = models.Manager()
+
     def __str__(self):
         return self.title
 
@@ -18,6 +31,8 @@ class Comment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CommentManager()
+
     def __str__(self):
         return f"Comment by {self.author.username} on {self.post.title}"
 
@@ -25,6 +40,8 @@ class Like(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='likes')
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='likes')
 
+    objects = LikeManager()
+
     class Meta:
         unique_together = ('user', 'post')
 
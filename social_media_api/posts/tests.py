@@ -100,3 +100,105 @@ class FeedAPITests(APITestCase):
         # Ordering is -created_at
         self.assertEqual(response.data['results'][0]['id'], post_user2_new.id)
 
+
+from django.test import override_settings
+from social_media_api.query_budget import QueryBudgetExceeded, QueryBudgetTestMixin, record_queries
+
+class QueryBudgetTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username='user1', password='password')
+        self.client.force_authenticate(user=self.user1)
+        self.post = Post.objects.create(author=self.user1, title='Post', content='Content')
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('post-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+    @override_settings(QUERY_BUDGETS={'post-list': 1}, QUERY_BUDGET_RAISE=True)
+    def test_over_budget_raises(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('post-list'))
+
+    def test_duplicates_recorded(self):
+        with record_queries() as recorder:
+            Post.objects.get(pk=self.post.pk)
+            Post.objects.get(pk=self.post.pk)
+        self.assertEqual(recorder.count, 2)
+        self.assertEqual(recorder.duplicate_count(), 1)
+
+from django.core.management import call_command
+from io import StringIO
+from .models import Like
+from notifications.models import Notification
+
+class SoftDeleteTests(APITestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username='user1', password='password')
+        self.user2 = User.objects.create_user(username='user2', password='password')
+        self.client.force_authenticate(user=self.user1)
+        self.post = Post.objects.create(author=self.user1, title='Post', content='Content')
+        Comment.objects.create(post=self.post, author=self.user2, content='Comment')
+        Like.objects.create(post=self.post, user=self.user2)
+        Notification.objects.create(recipient=self.user1, actor=self.user2, verb='liked', target=self.post)
+
+    def test_delete_post_is_soft(self):
+        response = self.client.delete(reverse('post-detail', args=[self.post.id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(Like.objects.exists())
+        self.assertEqual(Post.all_objects.count(), 1)
+        self.assertEqual(Comment._base_manager.count(), 1)
+        response = self.client.get(reverse('post-detail', args=[self.post.id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_deleted_author_hides_posts(self):
+        self.user1.delete()
+        self.assertFalse(User.objects.filter(pk=self.user1.pk).exists())
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(Notification.objects.exists())
+        self.assertFalse(User.all_objects.get(pk=self.user1.pk).is_active)
+
+    def test_related_managers_hide_deleted_rows(self):
+        self.user1.following.add(self.user2)
+        self.user2.following.add(self.user1)
+        deleted_post = Post.objects.create(author=self.user1, title='Deleted', content='Content')
+        deleted_post.delete()
+        self.assertEqual(list(self.user1.posts.all()), [self.post])
+        self.user2.delete()
+        self.assertFalse(self.user1.following.exists())
+        self.assertFalse(self.user1.followers.exists())
+        self.assertFalse(self.post.comments.exists())
+        self.assertFalse(self.post.likes.exists())
+        self.assertFalse(self.user1.notifications.exists())
+
+    def test_serializers_hide_deleted_rows(self):
+        self.user2.following.add(self.user1)
+        self.user2.delete()
+        response = self.client.get(reverse('post-detail', args=[self.post.id]))
+        self.assertEqual(response.data['comments'], [])
+        response = self.client.get(reverse('profile'))
+        self.assertEqual(response.data['followers'], [])
+
+    def test_purge_deleted_post(self):
+        self.post.delete()
+        call_command('purge_deleted', batch_size=1, stdout=StringIO())
+        self.assertEqual(Post.all_objects.count(), 0)
+        self.assertEqual(Comment._base_manager.count(), 0)
+        self.assertEqual(Like._base_manager.count(), 0)
+        self.assertEqual(Notification._base_manager.count(), 0)
+
+    def test_purge_deleted_user(self):
+        self.user2.following.add(self.user1)
+        self.user1.delete()
+        call_command('purge_deleted', stdout=StringIO())
+        self.assertFalse(User.all_objects.filter(pk=self.user1.pk).exists())
+        self.assertEqual(Post.all_objects.count(), 0)
+        self.assertFalse(self.user2.following.exists())
+        self.assertTrue(User.objects.filter(pk=self.user2.pk).exists())
+
+    def test_purge_respects_grace_period(self):
+        self.post.delete()
+        call_command('purge_deleted', grace_seconds=3600, stdout=StringIO())
+        self.assertEqual(Post.all_objects.count(), 1)
@@ -49,6 +49,7 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = 'accounts.CustomUser'
 
 MIDDLEWARE = [
+    'social_media_api.query_budget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -127,12 +128,46 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Content-hashed, gzip/brotli precompressed files served with far-future
+# immutable cache headers, see social_media_api/static_files.py.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'social_media_api.static_files.StaticFilesStorage'},
+}
+
+# Media files (User uploads)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Stream every upload to a temporary file in chunks instead of holding
+# small ones in memory, so a burst of avatar uploads has a flat memory cost.
+FILE_UPLOAD_HANDLERS = ['django.core.files.uploadhandler.TemporaryFileUploadHandler']
+
+# Profile picture thumbnails, see accounts/thumbnails.py
+PROFILE_PICTURE_SIZES = (48, 128, 512)
+PROFILE_PICTURE_FORMATS = ('webp', 'jpeg')
+PROFILE_PICTURE_ASYNC = True
+
+# Query budgets
+# Per-request SQL instrumentation, see social_media_api/query_budget.py.
+# QUERY_BUDGETS maps URL names to the maximum number of queries allowed.
+# QUERY_BUDGET_RAISE makes over-budget views raise; tests enable it
+# with override_settings.
+
+QUERY_BUDGETS = {}
+QUERY_BUDGET_DEFAULT = None
+QUERY_BUDGET_RAISE = False
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.TokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': ['rest_framework.filters.SearchFilter'],
@@ -0,0 +1,68 @@
+"""
+Soft delete support shared by the accounts and posts apps.
+
+Deleting a SoftDeleteModel instance (or a queryset of them) only stamps
+``deleted_at``; the row and everything that depends on it stays in place
+until ``manage.py purge_deleted`` removes it in small batches. Default
+managers built on HideDeletedMixin hide soft-deleted rows as well as rows
+that point at soft-deleted rows, so the rest of the code never sees them.
+``all_objects`` on each model and ``_base_manager`` still see everything.
+"""
+
+from django.db import models
+from django.utils import timezone
+
+
+class SoftDeleteQuerySet(models.QuerySet):
+    def delete(self):
+        """
+        Soft delete every row in the queryset with a single UPDATE.
+        """
+        return self.update(deleted_at=timezone.now())
+
+    def hard_delete(self):
+        return super().delete()
+
+
+class HideDeletedMixin:
+    """
+    Manager mixin filtering out rows where any of the ``deleted_at`` lookups
+    in ``deleted_lookups`` is set, e.g. ('deleted_at', 'post__deleted_at').
+
+    The lookups are a class attribute of a manager subclass per model, not
+    constructor arguments, because Django builds related managers
+    (user.posts, post.comments, user.following) by subclassing the default
+    manager's class and calling it without arguments.
+    """
+
+    deleted_lookups = ()
+
+    def get_queryset(self):
+        return super().get_queryset().filter(
+            **{'%s__isnull' % lookup: True for lookup in self.deleted_lookups}
+        )
+
+
+class HideDeletedManager(HideDeletedMixin, models.Manager):
+    pass
+
+
+class SoftDeleteManager(HideDeletedMixin, models.Manager.from_queryset(SoftDeleteQuerySet)):
+    pass
+
+
+class SoftDeleteModel(models.Model):
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False, db_index=True)
+
+    class Meta:
+        abstract = True
+
+    def delete(self, using=None, keep_parents=False):
+        """
+        Flag the row as deleted instead of cascading over its dependents.
+        """
+        self.deleted_at = timezone.now()
+        self.save(using=using, update_fields=['deleted_at'])
+
+    def hard_delete(self, using=None, keep_parents=False):
+        return super().delete(using=using, keep_parents=keep_parents)